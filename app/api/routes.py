@@ -1,21 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Body, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List, Optional, Dict, Any
-from app.db.db_config import get_db
-from app.db.models import User, Chatbot, APIKey, UserSession
-from app.services.auth_service import AuthService
+from typing import List, Optional, Dict, Any, Tuple
+from app.db.db_config import AsyncSessionLocal, get_db
+from app.db.unit_of_work import UnitOfWork, get_unit_of_work
+from app.db.models import User, Chatbot, APIKey, UserSession, IngestionJob, KnowledgeChunk
+from app.services.auth_service import AuthService, api_key_cache, context_lines, new_context_lines
+from app.services.activity_buffer import activity_buffer
+from app.services.cache_invalidation import cache_invalidation
+from app.services.session_sweeper import session_sweeper
+from app.services.rate_limiter import rate_limiter
+from app.services.widget_tokens import issue_widget_token, verify_widget_token
+from app.services.chatbot_runtime import ChatbotRuntime, chatbot_runtime_cache
+from app.services.context_cache import pending_context, user_context_cache
+from app.services.details_fingerprint import user_details_fingerprints
+from app.services.faq_search import FAQ_MIN_CONFIDENCE, FAQ_FUZZY_MIN_SIMILARITY, faq_index_cache
+from app.services.knowledge_ingestion import copy_upload, knowledge_ingestion
+from app.services.embeddings import embedding_store
+from app.services.response_cache import response_cache
+from app.services.llm import LLMError, build_messages, build_system_prompt, llm_service
+from app.services.context_budget import (
+    CONTEXT_TOKEN_BUDGET, apply_token_budget, should_summarize, summarize_older_turns
+)
+import asyncio
 import json
+import math
 from fastapi import UploadFile, File, Form, Request
 from datetime import datetime
+import uuid
 from fastapi import Request
 from app.api.schemas import (
     CreateChatbotRequest,
     CreateChatbotResponse,
     ChatRequest,
     ChatResponse,
+    ChatMeta,
     BusinessInfo,
     ChatbotInfo,
+    FAQ,
+    FAQEditResponse,
+    FAQMatchRequest,
+    FAQMatchResponse,
+    SemanticSearchRequest,
+    SemanticSearchResponse,
+    IngestionJobResponse,
+    WidgetSessionRequest,
+    WidgetSessionResponse,
 )
 
 router = APIRouter()
@@ -45,84 +75,352 @@ async def authenticate_api_key(
     
     return api_key
 
-# Main chatbot query endpoint - YOUR RESPONSIBILITY
-@router.post("/chatbot/{chatbot_id}/query")
-async def chatbot_query(
+async def enforce_rate_limit(scope: str, key: str) -> None:
+    """Consume one request from the scope's bucket or fail with 429"""
+    result = await rate_limiter.hit(scope, key)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))}
+        )
+
+# Authentication + chatbot fetch dependency for the query endpoint
+async def authenticate_chatbot_request(
     chatbot_id: str,
-    query: Dict[str, Any],  # {"message": "user message", "user_details": {...}, "context": "..."}
-    api_key: APIKey = Depends(authenticate_api_key),
+    x_api_key: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
-):
+) -> Tuple[APIKey, ChatbotRuntime]:
     """
-    Main chatbot query endpoint - YOUR RESPONSIBILITY
-    Handles:
-    1. Authentication (API key validation)
-    2. User details storage
-    3. Context preparation for LLM integration
+    Authenticate the API key, check it belongs to chatbot_id, apply its
+    per-key rate limit and return (api_key, chatbot) from one DB round trip
     """
+    if not x_api_key:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="API key required"
+        )
+    
+    auth = await AuthService.validate_api_key_with_chatbot(x_api_key, db)
+    if not auth:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or revoked API key"
+        )
     
-    # Verify the API key belongs to the requested chatbot
+    api_key, chatbot = auth
     if api_key.chatbot_id != chatbot_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="API key does not have access to this chatbot"
         )
-    
-    # Fetch chatbot details
-    chatbot = await AuthService.get_chatbot_by_id(chatbot_id, db)
     if not chatbot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chatbot not found"
         )
     
+    await enforce_rate_limit("api_key", str(api_key.id))
+    return api_key, chatbot
+
+# Main chatbot query endpoint - YOUR RESPONSIBILITY
+@router.post("/chatbot/{chatbot_id}/query")
+async def chatbot_query(
+    chatbot_id: str,
+    query: Dict[str, Any],  # {"message": "...", "visitor_id": "...", "user_details": {...}, "context": "...", "reset_context": false}
+    background_tasks: BackgroundTasks,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request),
+    uow: UnitOfWork = Depends(get_unit_of_work)
+):
+    """
+    Main chatbot query endpoint - YOUR RESPONSIBILITY
+    Handles:
+    1. Authentication (API key validation)
+    2. User details storage
+    3. Context preparation for LLM integration
+    """
+    
+    # API key and chatbot were fetched together by the dependency
+    api_key, chatbot = auth
+    db = uow.session
+    
     # Extract data from query
     user_message = query.get("message", "")
     user_details = query.get("user_details", {})
     conversation_context = query.get("context", "")
+    visitor_ref = query.get("visitor_id")
     
     if not user_message:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Message is required"
         )
+    if visitor_ref is not None and not (isinstance(visitor_ref, str) and 0 < len(visitor_ref) <= 128):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="visitor_id must be a non-empty string of at most 128 characters"
+        )
+    
+    # Widget visitors get their own profile and sessions; requests without a
+    # visitor_id fall back to the chatbot owner
+    visitor = visitor_ref is not None
+    if visitor:
+        user_id = await AuthService.find_visitor(chatbot.chatbot_id, visitor_ref, db)
+    else:
+        user_id = chatbot.owner_id
+    
+    # YOUR RESPONSIBILITY 3: Prepare user context for LLM integration
+    # Nothing is written before the LLM call: a write would hold the user's
+    # row and session locks (and a pooled connection) while the provider
+    # thinks. The context is read as committed and this request's details
+    # and turns are applied to it in memory.
+    stored_context = await AuthService.get_user_context_for_llm(user_id, db, visitor=visitor) if user_id else {}
+    # "context" is the client's whole conversation: lines the session does
+    # not have yet are new turns ("reset_context": true replaces it instead);
+    # the message itself is logged as the newest turn
+    reset_context = bool(query.get("reset_context"))
+    lines = context_lines(conversation_context)
+    stored_turns = [
+        m["content"] for m in (stored_context.get("conversation_messages") or []) if m["role"] == "user"
+    ]
+    pending = lines if reset_context else new_context_lines(stored_turns, lines)
+    if lines[-1:] != [user_message]:
+        pending = pending + [user_message]
+    if reset_context:
+        stored_context = dict(stored_context, conversation_messages=[], conversation_summary="")
+    user_context = pending_context(
+        stored_context,
+        user_details if isinstance(user_details, dict) else {},
+        [{"role": "user", "content": content} for content in pending],
+    )
+    user_context, keep_from_id = apply_token_budget(
+        user_context, chatbot.context_token_budget or CONTEXT_TOKEN_BUDGET
+    )
+    # Turns that no longer fit are folded into the session summary after the response
+    session_id = user_context.get("session_id") if user_context else None
+    if keep_from_id is not None and should_summarize(session_id):
+        background_tasks.add_task(summarize_older_turns, user_id, session_id, keep_from_id)
+    
+    # Answer with the chatbot's LLM provider; a failed call still saves the
+    # request's details and turns below
+    llm_reply, llm_error = None, None
+    # Don't hold a pooled DB connection while the provider thinks
+    await uow.release()
+    try:
+        llm_reply = await llm_service.complete(
+            chatbot,
+            build_system_prompt(chatbot, user_context),
+            build_messages(user_message, user_context),
+        )
+    except LLMError as e:
+        print(f"Error answering for chatbot {chatbot.chatbot_id}: {e}")
+        llm_error = str(e)
+    
+    # Every write of the request is staged below and committed once
+    if visitor and user_id is None:
+        user_id = await AuthService.get_or_create_visitor(chatbot.chatbot_id, visitor_ref, db, uow=uow)
     
     # YOUR RESPONSIBILITY 1: Save user details if provided
     if user_details:
-        # Get user ID from chatbot owner
-        user_id = chatbot.owner_id
-        success = await AuthService.save_user_details(user_id, user_details, db)
+        success = await AuthService.save_user_details(user_id, user_details, db, uow=uow, visitor=visitor)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to save user details"
             )
     
-    # YOUR RESPONSIBILITY 2: Update conversation context
+    # YOUR RESPONSIBILITY 2: Update conversation context, then log the
+    # message and the reply after it so the next query sees both
+    success = True
     if conversation_context:
-        user_id = chatbot.owner_id
-        await AuthService.update_conversation_context(user_id, conversation_context, db)
-    
-    # YOUR RESPONSIBILITY 3: Prepare user context for LLM integration
-    user_id = chatbot.owner_id
-    user_context = await AuthService.get_user_context_for_llm(user_id, db)
+        success = await AuthService.update_conversation_context(
+            user_id, conversation_context, db, uow=uow, visitor=visitor, reset=reset_context
+        )
+    if success and lines[-1:] != [user_message]:
+        success = await AuthService.append_conversation_message(
+            user_id, user_message, db, uow=uow, visitor=visitor
+        )
+    if success and llm_reply and llm_reply.text:
+        success = await AuthService.append_conversation_message(
+            user_id, llm_reply.text, db, role="assistant", uow=uow, visitor=visitor
+        )
+    if not success:
+        # The unit of work was rolled back, user details included
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update conversation context"
+        )
+    await uow.commit()
     
-    # Prepare response for LLM integration team
     response_data = {
         "chatbot_id": chatbot_id,
         "chatbot_name": chatbot.name,
         "user_message": user_message,
         "user_context": user_context,  # This goes to your LLM team
-        "chatbot_config": chatbot.chatbot_config or {},
+        "chatbot_config": dict(chatbot.config),
         "api_key_info": {
             "key_id": api_key.id,
             "last_used": api_key.last_used.isoformat() if api_key.last_used else None
         },
-        "timestamp": "2025-08-09T12:00:00Z"
+        "reply": llm_reply.text if llm_reply else None,
+        "llm": {
+            "provider": llm_reply.provider,
+            "model": llm_reply.model,
+            "latency_ms": llm_reply.latency_ms,
+        } if llm_reply else {"error": llm_error},
+        "timestamp": datetime.utcnow().isoformat()
     }
     
     return response_data
 
+# Batch FAQ scoring, e.g. to evaluate a chatbot's FAQs against logged messages
+@router.post("/chatbot/{chatbot_id}/faq/match", response_model=FAQMatchResponse)
+async def match_faqs(
+    chatbot_id: str,
+    payload: FAQMatchRequest,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request)
+):
+    """Score many messages against the chatbot's FAQs in one call"""
+    _, chatbot = auth
+    if len(payload.messages) > 1000 or not 1 <= payload.top_k <= 10:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At most 1000 messages and a top_k between 1 and 10 are allowed"
+        )
+
+    matches = faq_index_cache.get(chatbot).search_batch(payload.messages, top_k=payload.top_k)
+    return {
+        "matcher": chatbot.faq_matcher,
+        "results": [
+            [{"q": m.question, "a": m.answer, "confidence": round(m.confidence, 4)} for m in row]
+            for row in matches
+        ],
+    }
+
+async def edit_faqs(db: AsyncSession, chatbot_id: str, edit) -> Tuple[int, int]:
+    """
+    Apply edit(faqs) -> position to the chatbot's FAQ list under a row lock
+    and sync the cached FAQ indexes in place instead of rebuilding them
+    """
+    # populate_existing: the row may already be in the session, loaded
+    # before the lock was taken
+    result = await db.execute(
+        select(Chatbot).where(Chatbot.id == chatbot_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )
+    row = result.scalar_one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    # Edit the normalized list so positions match FAQ match results
+    faqs = [{"q": q, "a": a} for q, a in ChatbotRuntime(row).faqs]
+    position = edit(faqs)
+    row.chatbot_config = {**(row.chatbot_config or {}), "faqs": faqs}
+    await db.commit()
+    await db.refresh(row)
+    faq_index_cache.refresh(chatbot_runtime_cache.put(row))
+    return position, len(faqs)
+
+def _faq_position(faqs: List[Dict[str, str]], position: int) -> int:
+    if not 0 <= position < len(faqs):
+        raise HTTPException(status_code=404, detail="FAQ not found")
+    return position
+
+def _faq_entry(faq: FAQ) -> Dict[str, str]:
+    question, answer = " ".join(faq.q.split()), faq.a.strip()
+    if not question or not answer:
+        raise HTTPException(status_code=400, detail="Both q and a are required")
+    return {"q": question, "a": answer}
+
+@router.post("/chatbot/{chatbot_id}/faqs", response_model=FAQEditResponse)
+async def add_faq(
+    chatbot_id: str,
+    payload: FAQ,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request),
+    db: AsyncSession = Depends(get_db)
+):
+    """Append one FAQ"""
+    entry = _faq_entry(payload)
+
+    def append(faqs):
+        faqs.append(entry)
+        return len(faqs) - 1
+
+    position, count = await edit_faqs(db, chatbot_id, append)
+    return {"position": position, "count": count}
+
+@router.put("/chatbot/{chatbot_id}/faqs/{position}", response_model=FAQEditResponse)
+async def update_faq(
+    chatbot_id: str,
+    position: int,
+    payload: FAQ,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request),
+    db: AsyncSession = Depends(get_db)
+):
+    """Replace the FAQ at position"""
+    entry = _faq_entry(payload)
+
+    def replace(faqs):
+        faqs[_faq_position(faqs, position)] = entry
+        return position
+
+    position, count = await edit_faqs(db, chatbot_id, replace)
+    return {"position": position, "count": count}
+
+@router.delete("/chatbot/{chatbot_id}/faqs/{position}", response_model=FAQEditResponse)
+async def delete_faq(
+    chatbot_id: str,
+    position: int,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request),
+    db: AsyncSession = Depends(get_db)
+):
+    """Remove the FAQ at position; later FAQs move up by one"""
+    def remove(faqs):
+        del faqs[_faq_position(faqs, position)]
+        return position
+
+    position, count = await edit_faqs(db, chatbot_id, remove)
+    return {"position": position, "count": count}
+
+@router.post("/chatbot/{chatbot_id}/search", response_model=SemanticSearchResponse)
+async def semantic_search(
+    chatbot_id: str,
+    payload: SemanticSearchRequest,
+    auth: Tuple[APIKey, ChatbotRuntime] = Depends(authenticate_chatbot_request),
+    db: AsyncSession = Depends(get_db)
+):
+    """Top-k semantic search over the chatbot's knowledge chunks or FAQ questions"""
+    _, chatbot = auth
+    if payload.source not in ("knowledge", "faqs") or not 1 <= payload.top_k <= 50:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='source must be "knowledge" or "faqs" and top_k between 1 and 50'
+        )
+
+    if payload.source == "faqs":
+        index = await embedding_store.faq_index(chatbot) if chatbot.faqs else None
+    else:
+        index = embedding_store.open(chatbot.chatbot_id, "knowledge")
+    if index is None:
+        return {"source": payload.source, "results": []}
+
+    query = embedding_store.embedder.embed([payload.query])[0]
+    hits = [(row_id, score) for row_id, score in index.search(query, payload.top_k) if score > 0]
+    if payload.source == "faqs":
+        texts = {row_id: chatbot.faqs[row_id][0] for row_id, _ in hits}
+    else:
+        result = await db.execute(
+            select(KnowledgeChunk.id, KnowledgeChunk.content)
+            .where(KnowledgeChunk.id.in_([row_id for row_id, _ in hits]))
+        ) if hits else None
+        texts = dict(result.all()) if result else {}
+    return {
+        "source": payload.source,
+        "results": [
+            {"id": row_id, "text": texts[row_id], "score": round(score, 4)}
+            for row_id, score in hits if row_id in texts
+        ],
+    }
+
 # User management endpoints
 @router.post("/users/{user_id}/details")
 async def save_user_details(
@@ -149,10 +447,14 @@ async def get_user_context(user_id: str, db: AsyncSession = Depends(get_db)):
 async def update_user_context(
     user_id: str,
     context_data: str = Body(...),
+    reset: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Update conversation context"""
-    success = await AuthService.update_conversation_context(user_id, context_data, db)
+    """
+    Update the conversation context of the user's active session: new lines
+    are appended, or with ?reset=true the context replaces the stored one
+    """
+    success = await AuthService.update_conversation_context(user_id, context_data, db, reset=reset)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -220,17 +522,16 @@ async def get_chatbots(db: AsyncSession = Depends(get_db)):
 @router.get("/chatbot/{chatbot_id}", response_model=ChatbotInfo)
 async def get_chatbot(chatbot_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific chatbot by ID (frontend format)"""
-    chatbot = await AuthService.get_chatbot_by_id(chatbot_id, db)
+    chatbot = await chatbot_runtime_cache.get(chatbot_id, db)
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
 
-    cfg = chatbot.chatbot_config or {}
     return ChatbotInfo(
-        chatbot_id=chatbot.id,
-        name=cfg.get("name") or chatbot.name,
-        description=cfg.get("description") or "",
-        tone=cfg.get("tone") or "friendly",
-        faqs=cfg.get("faqs") or [],
+        chatbot_id=chatbot.chatbot_id,
+        name=chatbot.display_name,
+        description=chatbot.description,
+        tone=chatbot.tone,
+        faqs=chatbot.faq_dicts(),
     )
 
 @router.get("/users/{user_id}/chatbots", response_model=List[dict])
@@ -268,6 +569,66 @@ async def get_chatbot_api_keys(chatbot_id: str, db: AsyncSession = Depends(get_d
         for api_key in api_keys
     ]
 
+@router.post("/chatbots/{chatbot_id}/api-keys", response_model=dict)
+async def create_chatbot_api_key(chatbot_id: str, db: AsyncSession = Depends(get_db)):
+    """Create an API key for a chatbot (the raw key is only returned here)"""
+    chatbot = await AuthService.get_chatbot_by_id(chatbot_id, db)
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+
+    api_key, raw_key = await AuthService.create_api_key(chatbot_id, db)
+    return {
+        "id": api_key.id,
+        "chatbot_id": api_key.chatbot_id,
+        "api_key": raw_key,
+        "created_at": api_key.created_at
+    }
+
+@router.post("/api-keys/{api_key_id}/revoke", response_model=dict)
+async def revoke_api_key(api_key_id: int, db: AsyncSession = Depends(get_db)):
+    """Revoke an API key (takes effect immediately, including cached keys)"""
+    api_key = await AuthService.revoke_api_key(api_key_id, db)
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return {"id": api_key.id, "revoked": api_key.revoked}
+
+@router.delete("/api-keys/{api_key_id}", response_model=dict)
+async def delete_api_key(api_key_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete an API key"""
+    deleted = await AuthService.delete_api_key(api_key_id, db)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return {"message": "API key deleted successfully"}
+
+# Metrics endpoint
+@router.get("/metrics")
+def get_metrics():
+    """In-process cache and counter statistics for this worker"""
+    return {
+        "api_key_cache": api_key_cache.stats(),
+        "cache_invalidation": cache_invalidation.stats(),
+        "activity_buffer": activity_buffer.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "chatbot_runtime_cache": chatbot_runtime_cache.stats(),
+        "user_context_cache": user_context_cache.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "unit_of_work": UnitOfWork.stats(),
+        "user_details_fingerprints": user_details_fingerprints.stats(),
+        "faq_index_cache": faq_index_cache.stats(),
+        "knowledge_ingestion": knowledge_ingestion.stats(),
+        "embedding_store": embedding_store.stats(),
+        "response_cache": response_cache.stats(),
+        "llm": llm_service.stats(),
+    }
+
+@router.get("/metrics/chatbots/{chatbot_id}")
+def get_chatbot_metrics(chatbot_id: str):
+    """Per-chatbot counters for this worker"""
+    return {
+        "chatbot_id": chatbot_id,
+        "response_cache": response_cache.chatbot_stats(chatbot_id),
+    }
+
 # Database status endpoint
 @router.get("/db-status")
 async def get_db_status(db: AsyncSession = Depends(get_db)):
@@ -351,8 +712,30 @@ async def create_chatbot(
         },
     )
     db.add(chatbot)
+
+    # Browsers send an empty part when no file was picked
+    uploads = [upload for upload in knowledge_files or [] if upload.filename]
+    job = None
+    files = []
+    if uploads:
+        # The framework closes the uploads once the response is sent: the
+        # background job reads from copies of its own
+        for upload in uploads:
+            copy = await asyncio.to_thread(copy_upload, upload.file)
+            files.append((upload.filename, upload.content_type, copy))
+        await db.flush()
+        job = IngestionJob(
+            chatbot_id=chatbot.id,
+            files=[{"name": upload.filename, "content_type": upload.content_type} for upload in uploads],
+        )
+        db.add(job)
+
     await db.commit()
     await db.refresh(chatbot)
+    chatbot_runtime_cache.put(chatbot)
+
+    if job:
+        knowledge_ingestion.submit(job.id, chatbot.id, files)
 
     # Compute embed script URL from request host if possible
     base_url = str(request.base_url).rstrip("/") if request else ""
@@ -370,24 +753,137 @@ async def create_chatbot(
             faqs=faqs_list,
             bot_display_name=name,
         ),
+        ingestion_job_id=job.id if job else None,
     )
     return response
 
 
-@router.post("/chatbot/respond", response_model=ChatResponse)
-async def chatbot_respond(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
-    # Validate chatbot exists
-    result = await db.execute(select(Chatbot).where(Chatbot.id == payload.chatbot_id))
-    chatbot = result.scalar_one_or_none()
+@router.get("/chatbot/{chatbot_id}/ingestion/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(chatbot_id: str, job_id: str, db: AsyncSession = Depends(get_db)):
+    """Progress of a knowledge_files ingestion job started by /chatbot/create"""
+    result = await db.execute(
+        select(IngestionJob).where(IngestionJob.id == job_id, IngestionJob.chatbot_id == chatbot_id)
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return IngestionJobResponse(
+        job_id=job.id,
+        chatbot_id=job.chatbot_id,
+        status=job.status,
+        files=job.files or [],
+        chunks=job.chunks,
+        bytes_read=job.bytes_read,
+        error=job.error,
+        created_at=job.created_at.isoformat() if job.created_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+    )
+
+
+@router.post("/chatbot/{chatbot_id}/session", response_model=WidgetSessionResponse)
+async def create_widget_session(
+    chatbot_id: str,
+    payload: Optional[WidgetSessionRequest] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Issue a short-lived signed token binding a widget visitor to a chatbot"""
+    chatbot = await chatbot_runtime_cache.get(chatbot_id, db)
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
 
-    # For now, return a placeholder response. LLM team will replace.
+    visitor_id = (payload.visitor_id if payload else None) or str(uuid.uuid4())
+    token, expires_at = issue_widget_token(chatbot.chatbot_id, visitor_id)
+    return WidgetSessionResponse(
+        token=token,
+        chatbot_id=chatbot.chatbot_id,
+        visitor_id=visitor_id,
+        expires_at=expires_at,
+    )
+
+
+@router.post("/chatbot/respond", response_model=ChatResponse)
+async def chatbot_respond(
+    payload: ChatRequest,
+    x_widget_token: Optional[str] = Header(None),
+):
+    claims = None
+    if x_widget_token:
+        claims = verify_widget_token(x_widget_token, payload.chatbot_id)
+        if not claims:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired widget token"
+            )
+
+    # A signed token already vouches for the chatbot id: serve the cached
+    # runtime even if it is due for revalidation (that happens in the
+    # background)
+    runtime = chatbot_runtime_cache.peek(payload.chatbot_id, stale_ok=claims is not None)
+
+    # Repeated questions are answered from memory before anything touches
+    # the database: no rate limit upsert, no chatbot lookup, no FAQ
+    # matching, no LLM
     text = payload.message.strip()
+    cache_key = response_cache.key(text)
+    if cache_key and runtime is not None:
+        cached = response_cache.get(payload.chatbot_id, runtime.version, cache_key)
+        if cached is not None:
+            return cached
+
+    # Validate chatbot exists through the runtime cache; the session is
+    # only needed for a cold or stale entry and is closed before any LLM call
+    chatbot = runtime
+    if chatbot is None:
+        async with AsyncSessionLocal() as db:
+            chatbot = await chatbot_runtime_cache.get(payload.chatbot_id, db)
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+
+    # Only ids of existing chatbots get a bucket; a widget visitor also has
+    # their own, so one visitor cannot use up the whole chatbot's limit
+    await enforce_rate_limit("chatbot", chatbot.chatbot_id)
+    if claims is not None:
+        await enforce_rate_limit("visitor", f"{chatbot.chatbot_id}:{claims.get('vid')}")
+
     if not text:
         return ChatResponse(reply="Please enter a message.")
 
-    if "hello" in text.lower():
-        return ChatResponse(reply=f"Hello! I'm {chatbot.name}. How can I help you today?")
+    response = None
+    # Answer from the chatbot's FAQs when one matches well enough
+    match = faq_index_cache.get(chatbot).best(text)
+    confidence = round(match.confidence, 4) if match else None
+    if match and match.confidence >= FAQ_MIN_CONFIDENCE:
+        response = ChatResponse(reply=match.answer, meta=ChatMeta(confidence=confidence))
+
+    # Typos defeat token matching: retry on character trigrams
+    if response is None and chatbot.faq_matcher != "trigram":
+        fuzzy = faq_index_cache.fuzzy(chatbot).best(text)
+        if fuzzy and fuzzy.confidence >= FAQ_FUZZY_MIN_SIMILARITY:
+            response = ChatResponse(reply=fuzzy.answer, meta=ChatMeta(confidence=round(fuzzy.confidence, 4)))
 
-    return ChatResponse(reply=f"You said: {payload.message}")
+    # No FAQ fits: ask the chatbot's LLM provider, which costs money per
+    # call, so only for visitors holding a widget token. Callers without
+    # one get the greeting / echo fallback, not cached so that token
+    # holders asking the same thing still reach the LLM
+    if response is None and claims is None:
+        if "hello" in text.lower():
+            return ChatResponse(
+                reply=f"Hello! I'm {chatbot.display_name}. How can I help you today?",
+                meta=ChatMeta(confidence=confidence),
+            )
+        return ChatResponse(reply=f"You said: {payload.message}", meta=ChatMeta(confidence=confidence))
+    if response is None:
+        try:
+            reply = await llm_service.complete(chatbot, build_system_prompt(chatbot), build_messages(text))
+        except LLMError as e:
+            print(f"Error answering for chatbot {chatbot.chatbot_id}: {e}")
+            # Not cached: the next attempt may succeed
+            return ChatResponse(
+                reply="Sorry, I can't answer that right now. Please try again in a moment.",
+                meta=ChatMeta(confidence=confidence),
+            )
+        response = ChatResponse(reply=reply.text, meta=ChatMeta(confidence=confidence))
+
+    if cache_key:
+        response_cache.set(payload.chatbot_id, chatbot.version, cache_key, response)
+    return response
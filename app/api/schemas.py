@@ -83,6 +83,19 @@ class CreateChatbotResponse(BaseModel):
     embed_script_url: str
     created_at: str
     config: BusinessInfo
+    ingestion_job_id: Optional[str] = None  # Set when knowledge_files were uploaded
+
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    chatbot_id: str
+    status: str
+    files: List[dict]
+    chunks: int
+    bytes_read: int
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 
 class ChatRequest(BaseModel):
@@ -90,6 +103,17 @@ class ChatRequest(BaseModel):
     message: str
 
 
+class WidgetSessionRequest(BaseModel):
+    visitor_id: Optional[str] = None
+
+
+class WidgetSessionResponse(BaseModel):
+    token: str
+    chatbot_id: str
+    visitor_id: str
+    expires_at: int
+
+
 class ChatMeta(BaseModel):
     confidence: Optional[float] = None
 
@@ -99,6 +123,44 @@ class ChatResponse(BaseModel):
     meta: Optional[ChatMeta] = None
 
 
+class FAQMatchRequest(BaseModel):
+    messages: List[str]
+    top_k: int = 1
+
+
+class FAQMatchResult(BaseModel):
+    q: str
+    a: str
+    confidence: float
+
+
+class FAQMatchResponse(BaseModel):
+    matcher: str
+    results: List[List[FAQMatchResult]]
+
+
+class FAQEditResponse(BaseModel):
+    position: int  # Position of the added / updated / removed FAQ
+    count: int  # FAQs after the edit
+
+
+class SemanticSearchRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    source: str = "knowledge"  # "knowledge" (uploaded files) or "faqs"
+
+
+class SemanticSearchResult(BaseModel):
+    id: int  # knowledge_chunks.id, or the FAQ's position
+    text: str
+    score: float
+
+
+class SemanticSearchResponse(BaseModel):
+    source: str
+    results: List[SemanticSearchResult]
+
+
 class ChatbotInfo(BaseModel):
     chatbot_id: str
     name: str
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Integer, Text, JSON
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Integer, BigInteger, Text, JSON, Float, Index
 from sqlalchemy.orm import declarative_base, relationship
 import uuid
 from datetime import datetime
@@ -16,6 +16,7 @@ class User(Base):
     role = Column(String, nullable=True)
     preferences = Column(JSON, nullable=True)  # Store user preferences as JSON
     profile_data = Column(Text, nullable=True)  # Additional profile information
+    details_fingerprint = Column(String(64), nullable=True)  # Digest of the last payload save_user_details wrote
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -37,11 +38,34 @@ class Chatbot(Base):
     api_keys = relationship("APIKey", back_populates="chatbot")
 
 
+class Visitor(Base):
+    __tablename__ = "visitors"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), nullable=False)
+    external_id = Column(String, nullable=False)  # Visitor id sent by the widget, unique per chatbot
+    email = Column(String, nullable=True)
+    first_name = Column(String, nullable=True)
+    last_name = Column(String, nullable=True)
+    company = Column(String, nullable=True)
+    role = Column(String, nullable=True)
+    preferences = Column(JSON, nullable=True)
+    profile_data = Column(Text, nullable=True)
+    details_fingerprint = Column(String(64), nullable=True)  # Digest of the last payload save_user_details wrote
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user_sessions = relationship("UserSession", back_populates="visitor")
+
+    __table_args__ = (
+        Index("uq_visitors_chatbot_id_external_id", chatbot_id, external_id, unique=True),
+    )
+
+
 class APIKey(Base):
     __tablename__ = "api_keys"
     id = Column(Integer, primary_key=True, autoincrement=True)
     chatbot_id = Column(String, ForeignKey("chatbots.id"))
-    key_hash = Column(String, nullable=False)
+    key_hash = Column(String(64), nullable=False, unique=True, index=True)  # SHA-256 hex digest of the raw key
     revoked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     last_used = Column(DateTime, nullable=True)
@@ -53,10 +77,99 @@ class UserSession(Base):
     __tablename__ = "user_sessions"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"))
+    visitor_id = Column(String, ForeignKey("visitors.id"), nullable=True)  # Set instead of user_id for widget visitors
     session_data = Column(JSON, nullable=True)  # Store session-specific data
-    context_data = Column(Text, nullable=True)  # Store conversation context
+    context_data = Column(Text, nullable=True)  # Legacy conversation blob, superseded by conversation_messages
     created_at = Column(DateTime, default=datetime.utcnow)
     last_activity = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    summary = Column(Text, nullable=True)  # Rolling summary of turns that fell out of the context window
+    summary_through_id = Column(BigInteger, nullable=True)  # Last conversation_messages.id folded into summary
 
     user = relationship("User", back_populates="user_sessions")
+    visitor = relationship("Visitor", back_populates="user_sessions")
+    messages = relationship("ConversationMessage", back_populates="session", passive_deletes=True)
+
+    __table_args__ = (
+        # At most one active session per user / visitor; also the conflict
+        # targets of the upsert in the conversation context writes
+        Index("uq_user_sessions_active_user_id", user_id, unique=True, postgresql_where=is_active),
+        Index("uq_user_sessions_active_visitor_id", visitor_id, unique=True, postgresql_where=is_active),
+        # Idle / expired sessions for the session sweeper
+        Index("ix_user_sessions_is_active_last_activity", is_active, last_activity),
+    )
+
+
+class UserSessionArchive(Base):
+    __tablename__ = "user_sessions_archive"
+    id = Column(String, primary_key=True)  # Same id the session had in user_sessions
+    user_id = Column(String, index=True)
+    visitor_id = Column(String, index=True)
+    session_data = Column(JSON, nullable=True)
+    context_data = Column(Text, nullable=True)
+    summary = Column(Text, nullable=True)
+    messages = Column(JSON, nullable=True)  # The session's conversation_messages, oldest first
+    created_at = Column(DateTime)
+    last_activity = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    session_id = Column(String, ForeignKey("user_sessions.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String, nullable=False, default="user")
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    session = relationship("UserSession", back_populates="messages")
+
+    __table_args__ = (
+        # Last N turns of a session: ORDER BY id DESC LIMIT N
+        Index("ix_conversation_messages_session_id_id", session_id, id),
+    )
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    bucket_key = Column(String, primary_key=True)  # "<scope>:<key>", e.g. "api_key:42"
+    tat = Column(Float, nullable=False)  # GCRA theoretical arrival time (epoch seconds)
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    files = Column(JSON, nullable=True)  # Per-file name, content type, bytes, chunks and skip reason
+    chunks = Column(Integer, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow)  # Bumped while a worker process holds the job
+
+    __table_args__ = (
+        # Unfinished jobs whose process stopped bumping heartbeat_at
+        Index(
+            "ix_ingestion_jobs_unfinished_heartbeat_at", heartbeat_at,
+            postgresql_where=status.in_(["queued", "running"]),
+        ),
+    )
+
+
+class KnowledgeChunk(Base):
+    __tablename__ = "knowledge_chunks"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), nullable=False)
+    job_id = Column(String, ForeignKey("ingestion_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    source = Column(String, nullable=False)  # Uploaded file name
+    chunk_index = Column(Integer, nullable=False)  # Position within the source
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A chatbot's chunks in ingestion order
+        Index("ix_knowledge_chunks_chatbot_id_id", chatbot_id, id),
+    )
@@ -0,0 +1,70 @@
+from typing import Any, Callable, Dict, List, Tuple
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db_config import get_db
+
+
+class UnitOfWork:
+    """
+    Request-scoped transaction: AuthService write methods stage their
+    statements on the session and register cache updates with after_commit;
+    the route commits once. Anything still staged when the request fails is
+    rolled back by get_unit_of_work.
+    """
+
+    commits = 0
+    rollbacks = 0
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._after_commit: List[Tuple[Callable[..., Any], tuple]] = []
+
+    def after_commit(self, callback: Callable[..., Any], *args: Any) -> None:
+        """
+        Run callback(*args) once the transaction has been committed
+        """
+        self._after_commit.append((callback, args))
+
+    async def commit(self) -> None:
+        await self.session.commit()
+        UnitOfWork.commits += 1
+        callbacks, self._after_commit = self._after_commit, []
+        for callback, args in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in after-commit callback: {e}")
+
+    async def release(self) -> None:
+        """
+        End the current read-only transaction so the pooled connection goes
+        back before a slow await (e.g. an LLM call). Nothing may be staged,
+        so it is ended with a ROLLBACK rather than counted as a commit; the
+        session stays usable and checks out a connection on its next
+        statement.
+        """
+        if self._after_commit or self.session.new or self.session.dirty or self.session.deleted:
+            raise RuntimeError("release() with staged changes: commit or roll back first")
+        await self.session.rollback()
+
+    async def rollback(self) -> None:
+        self._after_commit = []
+        await self.session.rollback()
+        UnitOfWork.rollbacks += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {"commits": cls.commits, "rollbacks": cls.rollbacks}
+
+
+async def get_unit_of_work(db: AsyncSession = Depends(get_db)):
+    """
+    Shares the request's session (get_db is cached per request), so the
+    auth dependencies and the route work in the same transaction
+    """
+    uow = UnitOfWork(db)
+    try:
+        yield uow
+    except Exception:
+        await uow.rollback()
+        raise
@@ -3,9 +3,36 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from app.api import routes
+from app.services.activity_buffer import activity_buffer
+from app.services.cache_invalidation import cache_invalidation
+from app.services.session_sweeper import session_sweeper
+from app.services.knowledge_ingestion import knowledge_ingestion
+from app.services.llm import llm_service
 
-app = FastAPI(title="Chatbot Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background write-behind flush for api_keys.last_used
+    activity_buffer.start()
+    # Cross-worker cache invalidation (revoked / deleted API keys)
+    cache_invalidation.start()
+    # Periodic expiry / archiving of idle user sessions
+    session_sweeper.start()
+    # Workers for knowledge_files uploads
+    knowledge_ingestion.start()
+    yield
+    await knowledge_ingestion.stop()
+    await session_sweeper.stop()
+    await cache_invalidation.stop()
+    # Pooled LLM connections
+    await llm_service.aclose()
+    # Flush pending bookkeeping writes before the process exits
+    await activity_buffer.stop()
+
+
+app = FastAPI(title="Chatbot Backend", lifespan=lifespan)
 
 # CORS (allow frontend dev server)
 app.add_middleware(
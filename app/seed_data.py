@@ -2,6 +2,7 @@
 import asyncio
 from app.db.db_config import AsyncSessionLocal  # match what's in db_config.py
 from app.db.models import User, Chatbot, APIKey
+from app.services.auth_service import AuthService
 
 
 async def seed():
@@ -25,10 +26,10 @@ async def seed():
         session.add(chatbot)
         await session.flush()
 
-        # Add an API key
+        # Add an API key (only its digest is stored)
         api_key = APIKey(
             chatbot_id=chatbot.id,
-            key_hash="sample_api_key_123",
+            key_hash=AuthService.hash_api_key("sample_api_key_123"),
             revoked=False
         )
         session.add(api_key)
@@ -0,0 +1,144 @@
+from typing import Any, Dict, Optional
+from sqlalchemy import update, bindparam, or_
+from app.db.db_config import engine
+from app.db.models import APIKey
+from datetime import datetime
+import asyncio
+import os
+
+
+class ActivityBuffer:
+    """
+    Write-behind coalescer for api_keys.last_used
+
+    Only the newest timestamp per API key is kept in memory. Pending values
+    are written with one bulk UPDATE every flush_interval seconds, as soon as
+    max_pending rows are waiting, and on shutdown.
+    (user_sessions.last_activity is bumped by the session upsert that logs
+    each conversation turn, so it needs no separate write.)
+    """
+
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._api_keys: Dict[int, datetime] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pending_flush: Optional[asyncio.Task] = None
+        self.touches = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failed_flushes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._api_keys)
+
+    def touch_api_key(self, api_key_id: int, when: Optional[datetime] = None) -> None:
+        """
+        Record that an API key was used
+        """
+        self._record(self._api_keys, api_key_id, when or datetime.utcnow())
+
+    def _record(self, pending: Dict[Any, datetime], key: Any, when: datetime) -> None:
+        self.touches += 1
+        _keep_newest(pending, key, when)
+
+        if self.pending >= self.max_pending and (
+            self._pending_flush is None or self._pending_flush.done()
+        ):
+            try:
+                self._pending_flush = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                # No running loop (e.g. called from a script); the next flush picks it up
+                pass
+
+    async def flush(self) -> int:
+        """
+        Write all pending timestamps and return the number of rows sent
+        """
+        async with self._lock:
+            api_keys, self._api_keys = self._api_keys, {}
+            if not api_keys:
+                return 0
+
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        _bulk_touch(APIKey.__table__, APIKey.__table__.c.last_used),
+                        [{"b_id": key, "b_ts": ts} for key, ts in api_keys.items()],
+                    )
+            except Exception as e:
+                # Put the values back (without clobbering newer ones) and retry next time
+                self.failed_flushes += 1
+                for key, ts in api_keys.items():
+                    _keep_newest(self._api_keys, key, ts)
+                print(f"Error flushing activity buffer: {e}")
+                return 0
+
+            rows = len(api_keys)
+            self.flushes += 1
+            self.rows_flushed += rows
+            return rows
+
+    def start(self) -> None:
+        """
+        Start the periodic flush loop (called from the app lifespan)
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the flush loop and write whatever is still pending
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending_flush is not None and not self._pending_flush.done():
+            await self._pending_flush
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "touches": self.touches,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "failed_flushes": self.failed_flushes,
+            "flush_interval_seconds": self.flush_interval,
+            "max_pending": self.max_pending,
+        }
+
+
+def _keep_newest(pending: Dict[Any, datetime], key: Any, when: datetime) -> None:
+    current = pending.get(key)
+    if current is None or when > current:
+        pending[key] = when
+
+
+def _bulk_touch(table, column):
+    """
+    executemany-style UPDATE that only ever moves the timestamp forward
+    """
+    return (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .where(or_(column.is_(None), column < bindparam("b_ts")))
+        .values({column.name: bindparam("b_ts")})
+    )
+
+
+activity_buffer = ActivityBuffer(
+    flush_interval=float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5")),
+    max_pending=int(os.getenv("ACTIVITY_FLUSH_MAX_PENDING", "1000")),
+)
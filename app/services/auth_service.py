@@ -1,9 +1,176 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from app.db.models import User, APIKey, UserSession, Chatbot
+from sqlalchemy import select, update, insert, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+from app.db.models import User, Visitor, APIKey, UserSession, Chatbot, ConversationMessage
+from app.db.unit_of_work import UnitOfWork
+from app.services.cache import TTLCache
+from app.services.activity_buffer import activity_buffer
+from app.services.cache_invalidation import cache_invalidation
+from app.services.details_fingerprint import user_details_fingerprints
+from app.services.chatbot_runtime import ChatbotRuntime, chatbot_runtime_cache
+from app.services.context_cache import (
+    user_context_cache,
+    window_messages,
+    join_messages,
+    CONTEXT_MAX_MESSAGES,
+)
 from datetime import datetime
+import hashlib
 import json
+import os
+import secrets
+import uuid
+
+# Validated API keys, keyed by the SHA-256 digest of the X-API-Key value.
+# Revoking or deleting a key through AuthService drops it here and, via
+# cache_invalidation, in every other worker once the change commits; a
+# lookup already in flight does not re-cache it. The TTL bounds how long a
+# change the listener misses (disconnected, manual SQL) can go unseen.
+api_key_cache = TTLCache(
+    maxsize=int(os.getenv("API_KEY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("API_KEY_CACHE_TTL", "60")),
+)
+cache_invalidation.subscribe("api_key", api_key_cache.invalidate, api_key_cache.clear)
+cache_invalidation.subscribe(
+    "user_details", user_details_fingerprints.written_elsewhere, user_details_fingerprints.clear
+)
+
+# Visitor row ids, keyed by (chatbot_id, widget visitor id). The mapping
+# never changes once the row exists.
+visitor_cache = TTLCache(
+    maxsize=int(os.getenv("VISITOR_CACHE_SIZE", "50000")),
+    ttl=float(os.getenv("VISITOR_CACHE_TTL", "3600")),
+)
+
+async def _commit(db: AsyncSession, uow: Optional[UnitOfWork], after_commit, *args) -> None:
+    """
+    Commit now, or leave the commit (and the cache update) to the unit of work
+    """
+    if uow is not None:
+        uow.after_commit(after_commit, *args)
+        return
+    await db.commit()
+    after_commit(*args)
+
+
+def _details_saved(
+    user_id: str,
+    key: str,
+    changed: Dict[str, Any],
+    details: Dict[str, Any],
+    fingerprint: str,
+    generation: int,
+) -> None:
+    user_context_cache.update_profile(user_id, changed)
+    user_details_fingerprints.remember(key, details, fingerprint, since=generation)
+    user_details_fingerprints.record_write(len(details) - len(changed))
+
+
+def _details_unchanged(key: str, details: Dict[str, Any], fingerprint: str, generation: int) -> None:
+    user_details_fingerprints.remember(key, details, fingerprint, since=generation)
+    user_details_fingerprints.record_skip(len(details))
+
+
+def _subject(visitor: bool):
+    """
+    Profile model and user_sessions owner column for a user id or a visitor id
+    """
+    return (Visitor, "visitor_id") if visitor else (User, "user_id")
+
+
+async def _rollback(db: AsyncSession, uow: Optional[UnitOfWork]) -> None:
+    if uow is not None:
+        await uow.rollback()
+    else:
+        await db.rollback()
+
+
+def context_lines(context_data: str) -> List[str]:
+    """
+    A whole conversation context as messages: one per non-empty line, the
+    same split the conversation_messages migration applied to context_data
+    """
+    return [line for line in (context_data or "").split("\n") if line.strip()]
+
+
+def new_context_lines(stored: List[str], lines: List[str]) -> List[str]:
+    """
+    The lines not already logged: the longest head of lines that repeats
+    the tail of stored (the session's user turns) is dropped
+    """
+    overlap = next(k for k in range(min(len(stored), len(lines)), -1, -1) if stored[len(stored) - k:] == lines[:k])
+    return lines[overlap:]
+
+
+def _upsert_active_session(owner_column: str, user_id: str, now: datetime, **reset):
+    """
+    INSERT ... ON CONFLICT DO UPDATE on the partial unique index (user_id /
+    visitor_id WHERE is_active) returning the active session's id; reset
+    holds extra columns to overwrite when the session already exists
+    """
+    return (
+        pg_insert(UserSession)
+        .values(id=str(uuid.uuid4()), is_active=True, created_at=now, last_activity=now, **{owner_column: user_id})
+        .on_conflict_do_update(
+            index_elements=[getattr(UserSession, owner_column)],
+            index_where=UserSession.is_active,
+            set_={"last_activity": func.greatest(UserSession.last_activity, now), **reset},
+        )
+        .returning(UserSession.id)
+    )
+
+
+async def _replace_messages(db: AsyncSession, session_id: str, context_data: str, now: datetime) -> None:
+    await db.execute(delete(ConversationMessage).where(ConversationMessage.session_id == session_id))
+    lines = context_lines(context_data)
+    if lines:
+        await db.execute(
+            insert(ConversationMessage),
+            [{"session_id": session_id, "role": "user", "content": line, "created_at": now} for line in lines],
+        )
+
+
+async def _append_new_lines(
+    db: AsyncSession,
+    session_id: str,
+    context_data: str,
+    now: datetime
+) -> List[Dict[str, Any]]:
+    """
+    Log the lines of context_data the session does not have yet and return
+    them as messages. The longest head of the lines that repeats the tail of
+    the session's user turns is already stored and skipped, so a client
+    resending its whole conversation only costs the new suffix (the read is
+    bounded by the number of lines, not by the conversation).
+    """
+    lines = context_lines(context_data)
+    if not lines:
+        return []
+    result = await db.execute(
+        select(ConversationMessage.content)
+        .where(ConversationMessage.session_id == session_id, ConversationMessage.role == "user")
+        .order_by(ConversationMessage.id.desc())
+        .limit(len(lines))
+    )
+    new_lines = new_context_lines(result.scalars().all()[::-1], lines)
+    if not new_lines:
+        return []
+    result = await db.execute(
+        insert(ConversationMessage)
+        .values([
+            {"session_id": session_id, "role": "user", "content": line, "created_at": now} for line in new_lines
+        ])
+        .returning(ConversationMessage.id, ConversationMessage.content)
+    )
+    return [{"id": row[0], "role": "user", "content": row[1]} for row in sorted(result.all())]
+
+
+def _messages_appended(user_id: str, session_id: str, messages: List[Dict[str, Any]]) -> None:
+    for message in messages:
+        user_context_cache.append_message(user_id, session_id, message)
+
 
 class AuthService:
     """
@@ -12,28 +179,140 @@ class AuthService:
     """
     
     @staticmethod
-    async def validate_api_key(api_key_hash: str, db: AsyncSession) -> Optional[APIKey]:
+    def hash_api_key(raw_key: str) -> str:
+        """
+        Fixed-length digest stored in api_keys.key_hash (64 hex chars)
+        """
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    async def create_api_key(chatbot_id: str, db: AsyncSession) -> tuple:
+        """
+        Create a new API key for a chatbot
+        Returns (api_key, raw_key); only the digest is stored, so the raw key
+        can be shown to the caller exactly once
+        """
+        raw_key = secrets.token_urlsafe(32)
+        api_key = APIKey(
+            chatbot_id=chatbot_id,
+            key_hash=AuthService.hash_api_key(raw_key),
+            revoked=False
+        )
+        db.add(api_key)
+        await db.commit()
+        await db.refresh(api_key)
+        return api_key, raw_key
+    
+    @staticmethod
+    async def validate_api_key(raw_key: str, db: AsyncSession) -> Optional[APIKey]:
         """
         Validate API key and return the API key object if valid
+        Served from api_key_cache when possible, otherwise a single point
+        lookup on the unique key_hash index
         """
-        result = await db.execute(
-            select(APIKey).where(APIKey.key_hash == api_key_hash)
+        key_hash = AuthService.hash_api_key(raw_key)
+        api_key = api_key_cache.get(key_hash)
+        if api_key is None:
+            generation = api_key_cache.generation()
+            result = await db.execute(
+                select(APIKey).where(APIKey.key_hash == key_hash)
+            )
+            api_key = result.scalar_one_or_none()
+            
+            if not api_key or api_key.revoked:
+                return None
+            
+            api_key_cache.set(key_hash, AuthService._detached_api_key(api_key), since=generation)
+        
+        # Record last used timestamp (written in bulk by the activity buffer)
+        activity_buffer.touch_api_key(api_key.id)
+        
+        return api_key
+    
+    @staticmethod
+    async def validate_api_key_with_chatbot(
+        raw_key: str,
+        db: AsyncSession
+    ) -> Optional[Tuple[APIKey, Optional[ChatbotRuntime]]]:
+        """
+        Validate an API key and fetch its chatbot in one go
+        Returns (api_key, chatbot runtime) or None if the key is invalid/revoked;
+        the runtime is None if the key points at a missing chatbot.
+        Both come from memory when cached, otherwise from a single
+        api_keys LEFT JOIN chatbots statement.
+        """
+        key_hash = AuthService.hash_api_key(raw_key)
+        api_key = api_key_cache.get(key_hash)
+        chatbot = chatbot_runtime_cache.peek(api_key.chatbot_id) if api_key is not None else None
+        
+        if api_key is None or chatbot is None:
+            generation = api_key_cache.generation()
+            result = await db.execute(
+                select(APIKey, Chatbot)
+                .outerjoin(Chatbot, Chatbot.id == APIKey.chatbot_id)
+                .where(APIKey.key_hash == key_hash)
+            )
+            row = result.first()
+            if not row or row[0].revoked:
+                api_key_cache.pop(key_hash)
+                return None
+            
+            api_key = AuthService._detached_api_key(row[0])
+            api_key_cache.set(key_hash, api_key, since=generation)
+            chatbot = chatbot_runtime_cache.put(row[1]) if row[1] is not None else None
+        
+        # Record last used timestamp (written in bulk by the activity buffer)
+        activity_buffer.touch_api_key(api_key.id)
+        
+        return api_key, chatbot
+    
+    @staticmethod
+    def _detached_api_key(api_key: APIKey) -> APIKey:
+        """
+        Copy of an API key that is not bound to any session, safe to share
+        between requests (a rollback in the loading session cannot expire it)
+        """
+        return APIKey(
+            id=api_key.id,
+            chatbot_id=api_key.chatbot_id,
+            key_hash=api_key.key_hash,
+            revoked=api_key.revoked,
+            created_at=api_key.created_at,
+            last_used=api_key.last_used,
         )
+    
+    @staticmethod
+    async def revoke_api_key(api_key_id: int, db: AsyncSession) -> Optional[APIKey]:
+        """
+        Revoke an API key and drop it from the validation cache of every worker
+        """
+        result = await db.execute(select(APIKey).where(APIKey.id == api_key_id))
         api_key = result.scalar_one_or_none()
-        
-        if not api_key or api_key.revoked:
+        if not api_key:
             return None
         
-        # Update last used timestamp
-        await db.execute(
-            update(APIKey)
-            .where(APIKey.id == api_key.id)
-            .values(last_used=datetime.utcnow())
-        )
+        api_key.revoked = True
+        await cache_invalidation.publish(db, "api_key", api_key.key_hash)
         await db.commit()
-        
+        api_key_cache.invalidate(api_key.key_hash)
         return api_key
     
+    @staticmethod
+    async def delete_api_key(api_key_id: int, db: AsyncSession) -> bool:
+        """
+        Delete an API key and drop it from the validation cache of every worker
+        """
+        result = await db.execute(select(APIKey).where(APIKey.id == api_key_id))
+        api_key = result.scalar_one_or_none()
+        if not api_key:
+            return False
+        
+        await db.delete(api_key)
+        await cache_invalidation.publish(db, "api_key", api_key.key_hash)
+        await db.commit()
+        api_key_cache.invalidate(api_key.key_hash)
+        return True
+    
     @staticmethod
     async def get_user_by_id(user_id: str, db: AsyncSession) -> Optional[User]:
         """
@@ -42,6 +321,66 @@ class AuthService:
         result = await db.execute(select(User).where(User.id == user_id))
         return result.scalar_one_or_none()
     
+    @staticmethod
+    async def find_visitor(chatbot_id: str, external_id: str, db: AsyncSession) -> Optional[str]:
+        """
+        The Visitor id for a widget visitor of a chatbot, or None if the
+        visitor was never seen; read-only
+        """
+        key = (chatbot_id, external_id)
+        visitor_id = visitor_cache.get(key)
+        if visitor_id is None:
+            result = await db.execute(
+                select(Visitor.id).where(Visitor.chatbot_id == chatbot_id, Visitor.external_id == external_id)
+            )
+            visitor_id = result.scalar()
+            if visitor_id is not None:
+                visitor_cache.set(key, visitor_id)
+        return visitor_id
+    
+    @staticmethod
+    async def get_or_create_visitor(
+        chatbot_id: str,
+        external_id: str,
+        db: AsyncSession,
+        uow: Optional[UnitOfWork] = None
+    ) -> str:
+        """
+        Return the Visitor id for a widget visitor of a chatbot, creating the
+        row on first sight. Concurrent first requests of the same visitor are
+        resolved by the unique (chatbot_id, external_id) index.
+        With a unit of work the insert is only staged; uow.commit() applies it
+        """
+        key = (chatbot_id, external_id)
+        visitor_id = visitor_cache.get(key)
+        if visitor_id is not None:
+            return visitor_id
+        
+        lookup = select(Visitor.id).where(
+            Visitor.chatbot_id == chatbot_id, Visitor.external_id == external_id
+        )
+        result = await db.execute(lookup)
+        visitor_id = result.scalar()
+        if visitor_id is not None:
+            visitor_cache.set(key, visitor_id)
+            return visitor_id
+        
+        now = datetime.utcnow()
+        result = await db.execute(
+            pg_insert(Visitor)
+            .values(id=str(uuid.uuid4()), chatbot_id=chatbot_id, external_id=external_id,
+                    created_at=now, updated_at=now)
+            .on_conflict_do_nothing(index_elements=[Visitor.chatbot_id, Visitor.external_id])
+            .returning(Visitor.id)
+        )
+        visitor_id = result.scalar()
+        if visitor_id is None:
+            # Lost the race to a concurrent request: its row is committed now
+            result = await db.execute(lookup)
+            visitor_id = result.scalar_one()
+        await _commit(db, uow, visitor_cache.set, key, visitor_id)
+        return visitor_id
+    
     @staticmethod
     async def get_chatbot_by_id(chatbot_id: str, db: AsyncSession) -> Optional[Chatbot]:
         """
@@ -59,16 +398,28 @@ class AuthService:
     ) -> UserSession:
         """
         Create a new user session
+        It replaces the user's active session, if any: only one session per
+        user can be active
         """
+        await db.execute(
+            update(UserSession)
+            .where(UserSession.user_id == user_id, UserSession.is_active == True)
+            .values(is_active=False)
+        )
         session = UserSession(
             user_id=user_id,
             session_data=session_data or {},
-            context_data=context_data or "",
             last_activity=datetime.utcnow()
         )
         db.add(session)
+        if context_data:
+            await db.flush()
+            db.add_all(
+                ConversationMessage(session_id=session.id, content=line) for line in context_lines(context_data)
+            )
         await db.commit()
         await db.refresh(session)
+        user_context_cache.invalidate(user_id)
         return session
     
     @staticmethod
@@ -76,10 +427,14 @@ class AuthService:
         session_id: str,
         session_data: Dict[str, Any] = None,
         context_data: str = None,
-        db: AsyncSession = None
+        db: AsyncSession = None,
+        reset: bool = False
     ) -> Optional[UserSession]:
         """
         Update an existing user session
+        context_data is the session's whole conversation: only the lines it
+        does not have yet are logged, or, with reset=True, it replaces the
+        stored messages and summary
         """
         result = await db.execute(select(UserSession).where(UserSession.id == session_id))
         session = result.scalar_one_or_none()
@@ -89,36 +444,77 @@ class AuthService:
         
         if session_data is not None:
             session.session_data = session_data
-        if context_data is not None:
-            session.context_data = context_data
+        if context_data is not None and reset:
+            await _replace_messages(db, session.id, context_data, datetime.utcnow())
+            session.summary = None
+            session.summary_through_id = None
+        elif context_data is not None:
+            await _append_new_lines(db, session.id, context_data, datetime.utcnow())
         
         session.last_activity = datetime.utcnow()
         await db.commit()
         await db.refresh(session)
+        user_context_cache.invalidate(session.user_id)
         return session
     
     @staticmethod
-    async def get_user_context_for_llm(user_id: str, db: AsyncSession) -> Dict[str, Any]:
+    async def get_user_context_for_llm(
+        user_id: str,
+        db: AsyncSession,
+        visitor: bool = False
+    ) -> Dict[str, Any]:
         """
         Get all user context data that will be sent to LLM integration
         This is the data your team members will use for LLM processing
+        Served from user_context_cache when the user's context is cached
+        With visitor=True, user_id is a Visitor id
         """
-        # Get user details
-        user = await AuthService.get_user_by_id(user_id, db)
-        if not user:
-            return {}
+        cached = user_context_cache.get(user_id)
+        if cached is not None:
+            return cached
+        generation = user_context_cache.generation()
         
-        # Get active session
-        result = await db.execute(
+        # One indexed round trip: the user, its newest active session (LATERAL
+        # ... LIMIT 1) and that session's last N messages (LATERAL ... LIMIT N)
+        model, owner_column = _subject(visitor)
+        active_session = aliased(
+            UserSession,
             select(UserSession)
-            .where(UserSession.user_id == user_id, UserSession.is_active == True)
+            .where(getattr(UserSession, owner_column) == model.id, UserSession.is_active == True)
             .order_by(UserSession.last_activity.desc())
+            .limit(1)
+            .lateral("active_session")
         )
-        active_session = result.scalar_one_or_none()
+        recent_message = aliased(
+            ConversationMessage,
+            select(ConversationMessage)
+            .where(ConversationMessage.session_id == active_session.id)
+            .order_by(ConversationMessage.id.desc())
+            .limit(CONTEXT_MAX_MESSAGES)
+            .lateral("recent_messages")
+        )
+        result = await db.execute(
+            select(model, active_session, recent_message)
+            .select_from(model)
+            .outerjoin(active_session, getattr(active_session, owner_column) == model.id)
+            .outerjoin(recent_message, recent_message.session_id == active_session.id)
+            .where(model.id == user_id)
+            .order_by(recent_message.id)
+        )
+        rows = result.all()
+        if not rows:
+            return {}
+        user, active_session = rows[0][0], rows[0][1]
+        messages = window_messages([
+            {"id": message.id, "role": message.role, "content": message.content}
+            for _, _, message in rows
+            if message is not None
+        ])
         
         # Prepare context data for LLM
         context = {
             "user_id": user.id,
+            "visitor_id": user.external_id if visitor else None,
             "user_profile": {
                 "email": user.email,
                 "first_name": user.first_name,
@@ -128,23 +524,32 @@ class AuthService:
                 "preferences": user.preferences or {},
                 "profile_data": user.profile_data
             },
+            "session_id": active_session.id if active_session else None,
             "session_data": active_session.session_data if active_session else {},
-            "conversation_context": active_session.context_data if active_session else "",
+            "conversation_summary": (active_session.summary if active_session else None) or "",
+            "conversation_context": join_messages(messages),
+            "conversation_messages": messages,
             "timestamp": datetime.utcnow().isoformat()
         }
         
+        user_context_cache.set(user_id, active_session.id if active_session else None, context, since=generation)
         return context
     
     @staticmethod
     async def save_user_details(
         user_id: str,
         details: Dict[str, Any],
-        db: AsyncSession
+        db: AsyncSession,
+        uow: Optional[UnitOfWork] = None,
+        visitor: bool = False
     ) -> bool:
         """
         Save or update user details
+        With a unit of work the update is only staged; uow.commit() applies it
+        With visitor=True, user_id is a Visitor id
         """
         try:
+            model, _ = _subject(visitor)
             # Update user with new details
             update_data = {}
             
@@ -161,19 +566,55 @@ class AuthService:
             if "profile_data" in details:
                 update_data["profile_data"] = details["profile_data"]
             
-            if update_data:
-                update_data["updated_at"] = datetime.utcnow()
-                
-                await db.execute(
-                    update(User)
-                    .where(User.id == user_id)
-                    .values(**update_data)
-                )
-                await db.commit()
+            if not update_data:
+                return True
             
+            # Unchanged since this worker last persisted it: no round trip.
+            # Otherwise only the differing fields are written, provided the
+            # row still has the fingerprint remembered here; if another
+            # worker wrote in between, the whole payload is written unless
+            # the row already holds it
+            key = user_details_fingerprints.key(user_id, visitor)
+            fingerprint = user_details_fingerprints.fingerprint(update_data)
+            generation = user_details_fingerprints.generation()
+            known = user_details_fingerprints.known(key)
+            changed = update_data
+            rowcount = 0
+            if known is not None:
+                changed = user_details_fingerprints.changed_fields(known, update_data)
+                if not changed:
+                    user_details_fingerprints.record_skip(len(update_data))
+                    return True
+                result = await db.execute(
+                    update(model)
+                    .where(model.id == user_id, model.details_fingerprint == known["fingerprint"])
+                    .values(**changed, updated_at=datetime.utcnow(), details_fingerprint=fingerprint)
+                )
+                rowcount = result.rowcount
+            if not rowcount:
+                changed = update_data
+                result = await db.execute(
+                    update(model)
+                    .where(model.id == user_id, model.details_fingerprint.is_distinct_from(fingerprint))
+                    .values(**update_data, updated_at=datetime.utcnow(), details_fingerprint=fingerprint)
+                )
+                rowcount = result.rowcount
+            if rowcount:
+                await cache_invalidation.publish(db, "user_details", f"{key}:{fingerprint}")
+                await _commit(
+                    db, uow, _details_saved,
+                    user_id, key, changed, update_data, fingerprint, generation,
+                )
+            else:
+                await _commit(
+                    db, uow, _details_unchanged,
+                    key, update_data, fingerprint, generation,
+                )
             return True
         except Exception as e:
-            await db.rollback()
+            await _rollback(db, uow)
+            user_context_cache.invalidate(user_id)
+            user_details_fingerprints.forget(user_details_fingerprints.key(user_id, visitor))
             print(f"Error saving user details: {e}")
             return False
     
@@ -181,35 +622,84 @@ class AuthService:
     async def update_conversation_context(
         user_id: str,
         context_data: str,
-        db: AsyncSession
+        db: AsyncSession,
+        uow: Optional[UnitOfWork] = None,
+        visitor: bool = False,
+        reset: bool = False
     ) -> bool:
         """
-        Update conversation context for the user's active session
+        Bring the conversation of the user's active session in line with
+        context_data, the client's whole conversation (one message per
+        non-empty line)
+        The active session is upserted as in append_conversation_message and
+        only the lines it does not have yet are inserted; stored messages are
+        never rewritten. With reset=True the session's messages and summary
+        are dropped and context_data replaces them. Use
+        append_conversation_message to log a single turn.
+        With a unit of work the writes are only staged; uow.commit() applies them
+        With visitor=True, user_id is a Visitor id
         """
         try:
-            # Get active session
-            result = await db.execute(
-                select(UserSession)
-                .where(UserSession.user_id == user_id, UserSession.is_active == True)
-                .order_by(UserSession.last_activity.desc())
-            )
-            session = result.scalar_one_or_none()
-            
-            if session:
-                session.context_data = context_data
-                session.last_activity = datetime.utcnow()
-            else:
-                # Create new session if none exists
-                session = UserSession(
-                    user_id=user_id,
-                    context_data=context_data,
-                    last_activity=datetime.utcnow()
+            _, owner_column = _subject(visitor)
+            now = datetime.utcnow()
+            if reset:
+                result = await db.execute(
+                    _upsert_active_session(owner_column, user_id, now, summary=None, summary_through_id=None)
                 )
-                db.add(session)
-            
-            await db.commit()
+                await _replace_messages(db, result.scalar_one(), context_data, now)
+                await _commit(db, uow, user_context_cache.invalidate, user_id)
+                return True
+
+            result = await db.execute(_upsert_active_session(owner_column, user_id, now))
+            session_id = result.scalar_one()
+            messages = await _append_new_lines(db, session_id, context_data, now)
+            await _commit(db, uow, _messages_appended, user_id, session_id, messages)
             return True
         except Exception as e:
-            await db.rollback()
+            await _rollback(db, uow)
+            user_context_cache.invalidate(user_id)
             print(f"Error updating conversation context: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+    @staticmethod
+    async def append_conversation_message(
+        user_id: str,
+        content: str,
+        db: AsyncSession,
+        role: str = "user",
+        uow: Optional[UnitOfWork] = None,
+        visitor: bool = False
+    ) -> bool:
+        """
+        Append a conversation turn to the user's active session
+        One statement: the active session is upserted on the partial unique
+        index (user_id / visitor_id WHERE is_active), which also bumps
+        last_activity, and the message is inserted against whichever session
+        that returned. Concurrent calls for the same user can never open two
+        sessions.
+        With a unit of work the insert is only staged; uow.commit() applies it
+        With visitor=True, user_id is a Visitor id
+        """
+        try:
+            _, owner_column = _subject(visitor)
+            now = datetime.utcnow()
+            active_session = _upsert_active_session(owner_column, user_id, now).cte("active_session")
+            result = await db.execute(
+                insert(ConversationMessage)
+                .from_select(
+                    ["session_id", "role", "content", "created_at"],
+                    select(active_session.c.id, literal(role), literal(content), literal(now)),
+                )
+                .returning(ConversationMessage.id, ConversationMessage.session_id)
+            )
+            message_id, session_id = result.one()
+            await _commit(
+                db, uow, user_context_cache.append_message,
+                user_id, session_id, {"id": message_id, "role": role, "content": content}
+            )
+            return True
+        except Exception as e:
+            await _rollback(db, uow)
+            user_context_cache.invalidate(user_id)
+            print(f"Error appending conversation message: {e}")
+            return False
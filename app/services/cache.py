@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import time
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with a per-entry time-to-live
+    Keeps hit/miss/eviction counters so the size can be tuned from /metrics
+
+    A value loaded from the DB can be outdated by the time it is stored, if
+    the row changed while the query was in flight. Loaders take
+    generation() before querying and pass it to set(since=...): the value is
+    dropped if the key was invalidated (or the cache cleared) since then.
+    Invalidations are remembered per key for the last maxsize keys; older
+    ones fall back to a cache-wide floor, which only ever drops more.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generation = 0
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()  # key -> generation
+        self._invalidated_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_sets = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached value, or default if missing or expired
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self) -> int:
+        """
+        Token for a load about to start, see set(since=...)
+        """
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, since: Optional[int] = None) -> None:
+        """
+        Insert or replace an entry, evicting the least recently used one when full
+        With since (a generation() token), nothing is stored if the key was
+        invalidated after the token was taken
+        """
+        if self.maxsize <= 0:
+            return
+        if since is not None and max(self._invalidated.get(key, 0), self._invalidated_floor) > since:
+            self.stale_sets += 1
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Drop an entry immediately
+        """
+        entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def invalidate(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Drop an entry because its source changed: loads already in flight
+        for the key will not store their (older) value
+        """
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > max(self.maxsize, 1):
+            _, generation = self._invalidated.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, generation)
+        return self.pop(key, default)
+
+    def clear(self) -> None:
+        """
+        Drop every entry; loads already in flight will not store their value
+        """
+        self._data.clear()
+        self._generation += 1
+        self._invalidated.clear()
+        self._invalidated_floor = self._generation
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for sizing the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_sets": self.stale_sets,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
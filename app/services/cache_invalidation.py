@@ -0,0 +1,119 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db_config import engine
+import asyncio
+import asyncpg
+import os
+
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+
+
+class CacheInvalidationListener:
+    """
+    Cross-worker invalidation of in-process caches over PostgreSQL
+    LISTEN/NOTIFY
+
+    A write that makes cached entries wrong calls publish(db, kind, key) in
+    its own transaction; PostgreSQL delivers "kind:key" to every listening
+    worker only if that transaction commits, and each one runs the handler
+    subscribed for kind. The listener holds one dedicated connection outside
+    the pool and reconnects after reconnect_after seconds when it drops.
+    Notifications sent while it was disconnected are lost, so every
+    subscribed cache is reset on (re)connect. Until then the caches' TTLs
+    bound how stale an entry can get.
+    """
+
+    def __init__(self, channel: str = "cache_invalidation", reconnect_after: float = 5.0):
+        self.channel = channel
+        self.reconnect_after = reconnect_after
+        self._handlers: Dict[str, Tuple[Callable[[str], Any], Callable[[], Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+        self.published = 0
+        self.received = 0
+        self.connects = 0
+        self.failures = 0
+
+    def subscribe(self, kind: str, invalidate: Callable[[str], Any], reset: Callable[[], Any]) -> None:
+        """
+        invalidate(key) runs for each notification of kind, reset() whenever
+        notifications may have been missed
+        """
+        self._handlers[kind] = (invalidate, reset)
+
+    async def publish(self, db: AsyncSession, kind: str, key: str) -> None:
+        """
+        Queue the notification in db's transaction: it is sent on commit and
+        dropped on rollback
+        """
+        await db.execute(select(func.pg_notify(self.channel, f"{kind}:{key}")))
+        self.published += 1
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        kind, _, key = payload.partition(":")
+        handlers = self._handlers.get(kind)
+        if handlers is not None:
+            self.received += 1
+            handlers[0](key)
+
+    def _reset(self) -> None:
+        for _, reset in self._handlers.values():
+            reset()
+
+    def start(self) -> None:
+        """
+        Start listening (called from the app lifespan)
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.get_running_loop().create_future()
+                connection.add_termination_listener(lambda _: lost.done() or lost.set_result(None))
+                await connection.add_listener(self.channel, self._on_notification)
+                self._connected = True
+                self.connects += 1
+                self._reset()
+                await lost
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"Error listening for cache invalidations: {e}")
+            finally:
+                self._connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self._connected,
+            "channel": self.channel,
+            "subscriptions": sorted(self._handlers),
+            "published": self.published,
+            "received": self.received,
+            "connects": self.connects,
+            "failures": self.failures,
+        }
+
+
+cache_invalidation = CacheInvalidationListener(
+    channel=CACHE_INVALIDATION_CHANNEL,
+    reconnect_after=float(os.getenv("CACHE_INVALIDATION_RECONNECT", "5")),
+)
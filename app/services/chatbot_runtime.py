@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import Chatbot
+import asyncio
+import time
+import os
+
+
+class ChatbotRuntime:
+    """
+    Immutable, pre-parsed view of a Chatbot row for the request hot paths
+    Built once per chatbot config version instead of re-reading
+    chatbot_config on every request
+    """
+
+    __slots__ = (
+        "chatbot_id",
+        "name",
+        "display_name",
+        "description",
+        "tone",
+        "faqs",
+        "faq_matcher",
+        "owner_id",
+        "llm_endpoint_url",
+        "config",
+        "context_token_budget",
+        "version",
+    )
+
+    def __init__(self, chatbot: Chatbot):
+        cfg = chatbot.chatbot_config or {}
+        values = {
+            "chatbot_id": chatbot.id,
+            "name": chatbot.name,
+            "display_name": (
+                (cfg.get("bot_display_name") or cfg.get("name") or "").strip() or chatbot.name
+            ),
+            "description": cfg.get("description") or "",
+            "tone": (cfg.get("tone") or "friendly").strip().lower(),
+            "faqs": _normalize_faqs(cfg.get("faqs")),
+            # FAQ retrieval engine for /chatbot/respond: "bm25", "tfidf" or "trigram"
+            "faq_matcher": _faq_matcher(cfg.get("faq_matcher")),
+            "owner_id": chatbot.owner_id,
+            "llm_endpoint_url": chatbot.llm_endpoint_url,
+            "config": MappingProxyType(dict(cfg)),
+            "context_token_budget": _positive_int(cfg.get("context_token_budget")),
+            "version": chatbot.updated_at or chatbot.created_at,
+        }
+        for slot, value in values.items():
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ChatbotRuntime is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ChatbotRuntime is immutable")
+
+    def faq_dicts(self) -> List[Dict[str, str]]:
+        return [{"q": q, "a": a} for q, a in self.faqs]
+
+
+def _normalize_faqs(faqs: Any) -> Tuple[Tuple[str, str], ...]:
+    """
+    FAQs as a tuple of (question, answer), whitespace-trimmed, empties dropped
+    """
+    normalized = []
+    for faq in faqs or []:
+        if not isinstance(faq, dict):
+            continue
+        question = " ".join(str(faq.get("q") or "").split())
+        answer = str(faq.get("a") or "").strip()
+        if question and answer:
+            normalized.append((question, answer))
+    return tuple(normalized)
+
+
+def _faq_matcher(value: Any) -> str:
+    value = str(value or "").strip().lower()
+    return value if value in ("bm25", "tfidf", "trigram") else "bm25"
+
+
+def _positive_int(value: Any) -> Optional[int]:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class ChatbotRuntimeCache:
+    """
+    Bounded LRU of ChatbotRuntime objects keyed by chatbot_id
+
+    An entry is served from memory for revalidate_after seconds. After that a
+    cheap SELECT updated_at checks the config version: unchanged entries are
+    kept, changed ones are rebuilt from the row.
+    """
+
+    def __init__(self, maxsize: int = 1000, revalidate_after: float = 30.0):
+        self.maxsize = maxsize
+        self.revalidate_after = revalidate_after
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # id -> [runtime, checked_at]
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.rebuilds = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get(self, chatbot_id: str, db: AsyncSession) -> Optional[ChatbotRuntime]:
+        """
+        Return the runtime for chatbot_id, loading or revalidating it if needed
+        """
+        entry = self._entries.get(chatbot_id)
+        now = time.monotonic()
+
+        if entry is not None:
+            self._entries.move_to_end(chatbot_id)
+            if now - entry[1] < self.revalidate_after:
+                self.hits += 1
+                return entry[0]
+
+            self.revalidations += 1
+            result = await db.execute(select(Chatbot.updated_at).where(Chatbot.id == chatbot_id))
+            row = result.first()
+            if row is None:
+                self.invalidate(chatbot_id)
+                return None
+            if row[0] is None or row[0] == entry[0].version:
+                entry[1] = now
+                return entry[0]
+            self.rebuilds += 1
+        else:
+            self.misses += 1
+
+        result = await db.execute(select(Chatbot).where(Chatbot.id == chatbot_id))
+        chatbot = result.scalar_one_or_none()
+        if not chatbot:
+            self.invalidate(chatbot_id)
+            return None
+        return self.put(chatbot)
+
+    def peek(self, chatbot_id: str, stale_ok: bool = False) -> Optional[ChatbotRuntime]:
+        """
+        Return the runtime only if it is cached and still fresh (never hits the DB)
+        With stale_ok an entry past revalidate_after is returned as well and
+        revalidated in the background; for callers that already trust the
+        chatbot id, e.g. from a signed widget token
+        """
+        entry = self._entries.get(chatbot_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry[1] >= self.revalidate_after:
+            if not stale_ok:
+                self.misses += 1
+                return None
+            self.stale_hits += 1
+            self._revalidate_later(chatbot_id)
+        else:
+            self.hits += 1
+        self._entries.move_to_end(chatbot_id)
+        return entry[0]
+
+    def _revalidate_later(self, chatbot_id: str) -> None:
+        if chatbot_id not in self._refreshing:
+            self._refreshing[chatbot_id] = asyncio.get_running_loop().create_task(self._revalidate(chatbot_id))
+
+    async def _revalidate(self, chatbot_id: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.get(chatbot_id, db)
+        except Exception as e:
+            print(f"Error revalidating chatbot {chatbot_id}: {e}")
+        finally:
+            self._refreshing.pop(chatbot_id, None)
+
+    def put(self, chatbot: Chatbot) -> ChatbotRuntime:
+        """
+        Cache the runtime for a row that has already been loaded
+        The existing runtime is reused if the config version did not change
+        """
+        entry = self._entries.get(chatbot.id)
+        version = chatbot.updated_at or chatbot.created_at
+        if entry is not None and entry[0].version == version:
+            runtime = entry[0]
+        else:
+            runtime = ChatbotRuntime(chatbot)
+        self._entries[chatbot.id] = [runtime, time.monotonic()]
+        self._entries.move_to_end(chatbot.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return runtime
+
+    def invalidate(self, chatbot_id: str) -> None:
+        self._entries.pop(chatbot_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses + self.revalidations
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "revalidate_after_seconds": self.revalidate_after,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+chatbot_runtime_cache = ChatbotRuntimeCache(
+    maxsize=int(os.getenv("CHATBOT_RUNTIME_CACHE_SIZE", "1000")),
+    revalidate_after=float(os.getenv("CHATBOT_RUNTIME_REVALIDATE", "30")),
+)
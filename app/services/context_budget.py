@@ -0,0 +1,192 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import UserSession, ConversationMessage
+from app.services.cache import TTLCache
+from app.services.context_cache import user_context_cache, join_messages, CONTEXT_MAX_MESSAGES
+import copy
+import hashlib
+import os
+import re
+
+# Default prompt budget for the user context, overridable per chatbot with
+# chatbot_config["context_token_budget"]
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Shares of the budget profile_data and the summary may use before they are cut
+PROFILE_BUDGET_SHARE = 0.25
+SUMMARY_BUDGET_SHARE = 0.25
+# Upper bound for the rolling summary of older turns
+SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "300"))
+SUMMARY_BATCH_SIZE = 200
+SUMMARY_INTERVAL = float(os.getenv("CONTEXT_SUMMARY_INTERVAL", "30"))
+
+_recent_summaries = TTLCache(maxsize=10000, ttl=SUMMARY_INTERVAL)
+# Token estimates keyed by a 16-byte digest of the text, so an entry costs
+# the same whatever the length of the message or profile it was computed for
+_token_counts = TTLCache(maxsize=50000, ttl=3600)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local approximation of a BPE token count
+    Words count as one token per ~4 characters, punctuation as one token each.
+    Cached because the same turns are re-estimated on every request (hashing
+    the text is ~20x cheaper than tokenizing it).
+    """
+    if not text:
+        return 0
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    count = _token_counts.get(key)
+    if count is None:
+        count = sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+        _token_counts.set(key, count)
+    return count
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to roughly max_tokens, keeping the beginning
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += (len(match.group()) + 3) // 4
+        if used > max_tokens:
+            return text[:match.start()].rstrip() + " …"
+    return text
+
+
+def apply_token_budget(
+    context: Dict[str, Any],
+    budget: int = CONTEXT_TOKEN_BUDGET
+) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    Fit a get_user_context_for_llm() result into a token budget
+
+    profile_data and the rolling summary are capped at a share of the budget
+    each (the summary loses its oldest lines first), then the most recent
+    conversation turns are kept until the budget runs out. Returns (budgeted context, id of the oldest kept turn);
+    the id is set when older turns fell outside the window, so a
+    summarization pass may be due.
+    """
+    if not context:
+        return context, None
+
+    context = copy.copy(context)
+    profile = dict(context.get("user_profile") or {})
+    if profile.get("profile_data"):
+        profile["profile_data"] = truncate_to_tokens(
+            profile["profile_data"], int(budget * PROFILE_BUDGET_SHARE)
+        )
+    context["user_profile"] = profile
+
+    summary = _keep_newest_lines(
+        (context.get("conversation_summary") or "").split("\n"), int(budget * SUMMARY_BUDGET_SHARE)
+    )
+    context["conversation_summary"] = summary
+
+    remaining = budget
+    remaining -= estimate_tokens(str(profile))
+    remaining -= estimate_tokens(summary)
+
+    messages: List[Dict[str, Any]] = context.get("conversation_messages") or []
+    kept = []
+    for message in reversed(messages):
+        cost = estimate_tokens(message["content"])
+        if kept and cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+    kept.reverse()
+
+    context["conversation_messages"] = kept
+    context["conversation_context"] = join_messages(kept)
+
+    # Older turns exist outside the window if the budget dropped some, or if
+    # the fetched window was already full
+    truncated = len(kept) < len(messages) or len(messages) >= CONTEXT_MAX_MESSAGES
+    return context, (kept[0].get("id") if kept and truncated else None)
+
+
+def should_summarize(session_id: Optional[str]) -> bool:
+    """
+    Debounce: allow one summarization pass per session per SUMMARY_INTERVAL
+    """
+    if not session_id or session_id in _recent_summaries:
+        return False
+    _recent_summaries.set(session_id, True)
+    return True
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = _SENTENCE_END.split(" ".join(text.split()), 1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "…"
+
+
+def _keep_newest_lines(lines: List[str], max_tokens: int) -> str:
+    lines = [line for line in lines if line]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def fold_into_summary(summary: str, turns: List[str], max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """
+    Incremental extractive summary: append the lead sentence of each new
+    turn and drop the oldest lines once the summary exceeds max_tokens
+    """
+    lines = (summary or "").split("\n")
+    lines.extend(_first_sentence(turn) for turn in turns if turn.strip())
+    return _keep_newest_lines(lines, max_tokens)
+
+
+async def summarize_older_turns(user_id: str, session_id: str, keep_from_id: int) -> None:
+    """
+    Background task: fold turns older than keep_from_id that are not yet in
+    the session summary into it, one bounded batch per call
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(UserSession.summary, UserSession.summary_through_id)
+                .where(UserSession.id == session_id)
+            )
+            row = result.first()
+            if row is None:
+                return
+            summary, through_id = row[0] or "", row[1] or 0
+
+            result = await db.execute(
+                select(ConversationMessage.id, ConversationMessage.content)
+                .where(
+                    ConversationMessage.session_id == session_id,
+                    ConversationMessage.id > through_id,
+                    ConversationMessage.id < keep_from_id,
+                )
+                .order_by(ConversationMessage.id)
+                .limit(SUMMARY_BATCH_SIZE)
+            )
+            turns = result.all()
+            if not turns:
+                return
+
+            new_summary = fold_into_summary(summary, [content for _, content in turns])
+            new_through_id = turns[-1][0]
+            # Optimistic: skip if another pass already moved the summary on
+            result = await db.execute(
+                update(UserSession)
+                .where(
+                    UserSession.id == session_id,
+                    UserSession.summary_through_id.is_not_distinct_from(row[1]),
+                )
+                .values(summary=new_summary, summary_through_id=new_through_id)
+            )
+            await db.commit()
+            if result.rowcount:
+                user_context_cache.update_summary(user_id, session_id, new_summary)
+    except Exception as e:
+        print(f"Error summarizing conversation: {e}")
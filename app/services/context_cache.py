@@ -0,0 +1,167 @@
+from typing import Any, Dict, List, Optional
+from app.services.cache import TTLCache
+from datetime import datetime
+import copy
+import os
+
+# Window of conversation_messages included in the LLM context
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "20"))
+CONTEXT_MAX_CHARS = int(os.getenv("CONTEXT_MAX_CHARS", "8000"))
+
+
+def window_messages(
+    messages: List[Dict[str, Any]],
+    max_messages: int = CONTEXT_MAX_MESSAGES,
+    max_chars: int = CONTEXT_MAX_CHARS
+) -> List[Dict[str, Any]]:
+    """
+    Keep the most recent messages (oldest first) within both limits
+    The newest message is always kept, even if it alone exceeds max_chars
+    """
+    kept = []
+    total = 0
+    for message in reversed(messages[-max_messages:] if max_messages > 0 else []):
+        total += len(message["content"])
+        if kept and total > max_chars:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+def join_messages(messages: List[Dict[str, Any]]) -> str:
+    """
+    Flatten messages into the conversation_context string
+    """
+    return "\n".join(message["content"] for message in messages)
+
+
+_PROFILE_FIELDS = ("email", "first_name", "last_name", "company", "role", "preferences", "profile_data")
+
+
+def pending_context(
+    context: Dict[str, Any],
+    profile_fields: Dict[str, Any],
+    turns: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    A get_user_context_for_llm() result as it will read once a request's
+    writes commit: profile_fields merged into the profile and turns (not
+    yet logged, so without ids) appended to the window. An empty context
+    (the visitor has no row yet) starts from a blank one.
+    """
+    context = copy.deepcopy(context) if context else {
+        "user_id": None,
+        "visitor_id": None,
+        "user_profile": {field: None for field in _PROFILE_FIELDS},
+        "session_id": None,
+        "session_data": {},
+        "conversation_summary": "",
+        "conversation_messages": [],
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    profile = context["user_profile"]
+    for key, value in profile_fields.items():
+        if key in profile:
+            profile[key] = copy.deepcopy(value or {}) if key == "preferences" else copy.deepcopy(value)
+    messages = window_messages(context["conversation_messages"] + copy.deepcopy(turns))
+    context["conversation_messages"] = messages
+    context["conversation_context"] = join_messages(messages)
+    return context
+
+
+class UserContextCache:
+    """
+    Cache of the LLM context built by get_user_context_for_llm, per user and
+    their active session
+
+    The write paths (save_user_details, append_conversation_message,
+    update_conversation_context) update the cached entry in place or drop
+    it, so reads can be served from memory. A context loaded while one of
+    them committed is not cached (see TTLCache.generation), so a read can
+    never put back a context that misses the newest turn.
+    The cache is per worker: a write handled by another worker is only seen
+    here once the entry expires, so the TTL bounds how stale a context can
+    be across workers.
+    The per-request "timestamp" field is never cached.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        context = copy.deepcopy(entry["context"])
+        context["timestamp"] = datetime.utcnow().isoformat()
+        return context
+
+    def generation(self) -> int:
+        """
+        Token to take before loading a context from the DB, for set(since=...)
+        """
+        return self._cache.generation()
+
+    def set(
+        self,
+        user_id: str,
+        session_id: Optional[str],
+        context: Dict[str, Any],
+        since: Optional[int] = None
+    ) -> None:
+        cached = {key: value for key, value in context.items() if key != "timestamp"}
+        self._cache.set(user_id, {"session_id": session_id, "context": copy.deepcopy(cached)}, since=since)
+
+    def update_profile(self, user_id: str, fields: Dict[str, Any]) -> None:
+        """
+        Write-through for save_user_details
+        """
+        entry = self._cache.invalidate(user_id)
+        if entry is None:
+            return
+        profile = entry["context"]["user_profile"]
+        for key, value in fields.items():
+            if key not in profile:
+                continue
+            if key == "preferences":
+                value = value or {}
+            profile[key] = copy.deepcopy(value)
+        self._cache.set(user_id, entry)
+
+    def append_message(self, user_id: str, session_id: str, message: Dict[str, Any]) -> None:
+        """
+        Write-through for append_conversation_message: append the new turn
+        and re-apply the window. If a different session became the active
+        one, the entry is dropped.
+        """
+        entry = self._cache.invalidate(user_id)
+        if entry is None or entry["session_id"] != session_id:
+            return
+        context = entry["context"]
+        messages = window_messages(context["conversation_messages"] + [copy.deepcopy(message)])
+        context["conversation_messages"] = messages
+        context["conversation_context"] = join_messages(messages)
+        self._cache.set(user_id, entry)
+
+    def update_summary(self, user_id: str, session_id: str, summary: str) -> None:
+        """
+        Write-through for the background summarizer
+        """
+        entry = self._cache.invalidate(user_id)
+        if entry is None or entry["session_id"] != session_id:
+            return
+        entry["context"]["conversation_summary"] = summary
+        self._cache.set(user_id, entry)
+
+    def invalidate(self, user_id: str) -> None:
+        self._cache.invalidate(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+user_context_cache = UserContextCache(
+    maxsize=int(os.getenv("USER_CONTEXT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CONTEXT_CACHE_TTL", "60")),
+)
@@ -0,0 +1,107 @@
+from typing import Any, Dict, Optional
+from app.services.cache import TTLCache
+import hashlib
+import json
+import os
+
+
+def _digest(value: Any) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class UserDetailsFingerprints:
+    """
+    Remembers what save_user_details last persisted for each user or
+    visitor, so an unchanged user_details payload (the widget resends it with
+    every message) costs no round trip at all
+
+    In memory: a digest per field, which also tells which fields of a changed
+    payload actually differ, and the row's details_fingerprint (the digest of
+    the whole last payload written). A partial write is only applied WHERE
+    details_fingerprint still equals the remembered one; when another worker
+    wrote in between, save_user_details falls back to the full write WHERE
+    details_fingerprint IS DISTINCT FROM the new digest.
+
+    Every write publishes "user_details" with the new fingerprint through
+    cache_invalidation, and other workers drop their entry for that row. A
+    write the listener misses (disconnected, manual SQL) can be skipped by
+    this worker for at most the TTL.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.writes = 0
+        self.writes_skipped = 0
+        self.fields_skipped = 0
+
+    @staticmethod
+    def fingerprint(fields: Dict[str, Any]) -> str:
+        return _digest(fields)
+
+    @staticmethod
+    def key(subject_id: str, visitor: bool = False) -> str:
+        return f"{'visitor' if visitor else 'user'}:{subject_id}"
+
+    def known(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        {"fingerprint": row digest, "fields": {name: digest}} last persisted,
+        or None if nothing is known about this row in memory
+        """
+        return self._cache.get(key)
+
+    @staticmethod
+    def changed_fields(known: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: value for name, value in fields.items() if known["fields"].get(name) != _digest(value)}
+
+    def generation(self) -> int:
+        return self._cache.generation()
+
+    def remember(self, key: str, fields: Dict[str, Any], fingerprint: str, since: Optional[int] = None) -> None:
+        """
+        Record a payload as persisted; with since (a generation() token taken
+        before the write), nothing is stored if the row was invalidated since
+        """
+        known = self._cache.get(key)
+        digests = dict(known["fields"]) if known is not None else {}
+        digests.update({name: _digest(value) for name, value in fields.items()})
+        self._cache.set(key, {"fingerprint": fingerprint, "fields": digests}, since=since)
+
+    def forget(self, key: str) -> None:
+        self._cache.invalidate(key)
+
+    def written_elsewhere(self, payload: str) -> None:
+        """
+        cache_invalidation handler: payload is "<key>:<fingerprint>". This
+        worker's own writes arrive here too and keep the entry they set.
+        """
+        key, _, fingerprint = payload.rpartition(":")
+        known = self._cache.get(key)
+        if known is not None and known["fingerprint"] != fingerprint:
+            self._cache.invalidate(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def record_write(self, fields_skipped: int = 0) -> None:
+        self.writes += 1
+        self.fields_skipped += fields_skipped
+
+    def record_skip(self, fields: int) -> None:
+        self.writes_skipped += 1
+        self.fields_skipped += fields
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({
+            "writes": self.writes,
+            "writes_skipped": self.writes_skipped,
+            "fields_skipped": self.fields_skipped,
+        })
+        return stats
+
+
+user_details_fingerprints = UserDetailsFingerprints(
+    maxsize=int(os.getenv("USER_DETAILS_FINGERPRINT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_DETAILS_FINGERPRINT_TTL", "300")),
+)
@@ -0,0 +1,288 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+from sqlalchemy import func, select
+from app.db.db_config import engine
+from app.db.models import KnowledgeChunk
+from app.services.chatbot_runtime import ChatbotRuntime
+from app.services.vector_index import FlatEmbeddingIndex, HashingEmbedder, IVFEmbeddingIndex, build_ivf_lists
+from datetime import datetime
+import numpy as np
+import asyncio
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", "data/embeddings")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+
+
+class EmbeddingStore:
+    """
+    Per-chatbot embedding matrices on disk, one per corpus ("faqs",
+    "knowledge"), opened with np.load(mmap_mode="r")
+
+    Each build goes to its own directory ({chatbot_id}/{corpus}-{build}/
+    vectors.npy and ids.npy) and is published by atomically replacing
+    {corpus}.json, so readers never see a half-written matrix. Every uvicorn
+    worker maps the same files and so shares their pages through the OS page
+    cache instead of holding a private copy. Opened indexes are kept in an
+    LRU and re-check the pointer file every revalidate_after seconds.
+
+    Builds of at least ivf_threshold rows also get an IVF index (ivf_nlist
+    lists, 2 * sqrt(rows) when 0) and are searched with ivf_nprobe lists;
+    smaller ones are searched exhaustively.
+    """
+
+    def __init__(
+        self,
+        root: str = "data/embeddings",
+        embedder: Optional[HashingEmbedder] = None,
+        maxsize: int = 1000,
+        revalidate_after: float = 5.0,
+        build_batch_size: int = 1000,
+        ivf_threshold: int = 50000,
+        ivf_nlist: int = 0,
+        ivf_nprobe: int = 8
+    ):
+        self.root = root
+        self.embedder = embedder or HashingEmbedder()
+        self.maxsize = maxsize
+        self.revalidate_after = revalidate_after
+        self.build_batch_size = build_batch_size
+        self.ivf_threshold = ivf_threshold
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self._entries: "OrderedDict[Tuple[str, str], list]" = OrderedDict()  # key -> [index, mtime, checked_at]
+        self.hits = 0
+        self.loads = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def _pointer(self, chatbot_id: str, corpus: str) -> str:
+        return os.path.join(self.root, chatbot_id, f"{corpus}.json")
+
+    def open(self, chatbot_id: str, corpus: str):
+        """
+        The published index for the corpus (FlatEmbeddingIndex or
+        IVFEmbeddingIndex), or None if none was built
+        """
+        key = (chatbot_id, corpus)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.revalidate_after:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        pointer = self._pointer(chatbot_id, corpus)
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            return None
+        if entry is not None and entry[1] == mtime:
+            entry[2] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        with open(pointer) as f:
+            meta = json.load(f)
+        build_dir = os.path.join(self.root, chatbot_id, meta["build"])
+        if meta["count"]:
+            vectors = np.load(os.path.join(build_dir, "vectors.npy"), mmap_mode="r")
+        else:
+            # An empty file cannot be memory-mapped
+            vectors = np.zeros((0, meta["dim"]), dtype=np.float32)
+        ids = np.load(os.path.join(build_dir, "ids.npy"))
+        if meta.get("kind") == "ivf":
+            index = IVFEmbeddingIndex(
+                vectors, ids, meta["version"],
+                np.load(os.path.join(build_dir, "centroids.npy")),
+                np.load(os.path.join(build_dir, "offsets.npy")),
+                nprobe=self.ivf_nprobe,
+            )
+        else:
+            index = FlatEmbeddingIndex(vectors, ids, meta["version"])
+        self.loads += 1
+        self._entries[key] = [index, mtime, now]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return index
+
+    def begin(self, chatbot_id: str, corpus: str, version: str, count: int) -> "EmbeddingBuild":
+        """
+        Start a new build of at most count rows; fill it with add() and
+        publish() it, or abort() it
+        """
+        return EmbeddingBuild(self, chatbot_id, corpus, version, count)
+
+    @staticmethod
+    def faqs_version(chatbot: ChatbotRuntime) -> str:
+        return hashlib.sha256(json.dumps(chatbot.faqs).encode("utf-8")).hexdigest()[:16]
+
+    async def faq_index(self, chatbot: ChatbotRuntime):
+        """
+        The FAQ question matrix, rebuilt first if the FAQs changed
+        """
+        version = self.faqs_version(chatbot)
+        index = self.open(chatbot.chatbot_id, "faqs")
+        if index is None or index.version != version:
+            await asyncio.to_thread(self._build_faqs, chatbot, version)
+            index = self.open(chatbot.chatbot_id, "faqs")
+        return index
+
+    def _build_faqs(self, chatbot: ChatbotRuntime, version: str) -> None:
+        questions = [question for question, _ in chatbot.faqs]
+        build = self.begin(chatbot.chatbot_id, "faqs", version, len(questions))
+        build.add(range(len(questions)), questions)
+        build.publish()
+
+    async def build_knowledge(self, chatbot_id: str) -> int:
+        """
+        Embed all of the chatbot's knowledge_chunks, streamed from the DB in
+        batches of build_batch_size; returns the row count
+        """
+        async with engine.connect() as conn:
+            count, max_id = (await conn.execute(
+                select(func.count(), func.max(KnowledgeChunk.id)).where(KnowledgeChunk.chatbot_id == chatbot_id)
+            )).one()
+            if not count:
+                return 0
+
+            build = await asyncio.to_thread(self.begin, chatbot_id, "knowledge", str(max_id), count)
+            try:
+                result = await conn.stream(
+                    select(KnowledgeChunk.id, KnowledgeChunk.content)
+                    .where(KnowledgeChunk.chatbot_id == chatbot_id, KnowledgeChunk.id <= max_id)
+                    .order_by(KnowledgeChunk.id)
+                    .execution_options(yield_per=self.build_batch_size)
+                )
+                async for rows in result.partitions():
+                    await asyncio.to_thread(build.add, [row[0] for row in rows], [row[1] for row in rows])
+                await asyncio.to_thread(build.publish)
+            except BaseException:
+                build.abort()
+                raise
+        return build.written
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": len(self._entries),
+            "maxsize": self.maxsize,
+            "dim": self.embedder.dim,
+            "hits": self.hits,
+            "loads": self.loads,
+            "builds": self.builds,
+            "evictions": self.evictions,
+        }
+
+
+class EmbeddingBuild:
+    """
+    One build directory being filled: rows are embedded straight into a
+    memory-mapped vectors.npy, so a large corpus is never held in memory
+    """
+
+    def __init__(self, store: EmbeddingStore, chatbot_id: str, corpus: str, version: str, count: int):
+        self.store = store
+        self.chatbot_id = chatbot_id
+        self.corpus = corpus
+        self.version = version
+        self.name = f"{corpus}-{uuid.uuid4().hex[:12]}"
+        self.path = os.path.join(store.root, chatbot_id, self.name)
+        os.makedirs(self.path)
+        self._vectors = np.lib.format.open_memmap(
+            os.path.join(self.path, "vectors.npy"), mode="w+", dtype=np.float32,
+            shape=(count, store.embedder.dim)
+        )
+        self._ids = np.empty(count, dtype=np.int64)
+        self.written = 0
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]) -> None:
+        n = min(len(texts), len(self._ids) - self.written)
+        self._vectors[self.written:self.written + n] = self.store.embedder.embed(texts[:n])
+        self._ids[self.written:self.written + n] = ids[:n]
+        self.written += n
+
+    def publish(self) -> None:
+        """
+        Atomically make this build the one open() returns, then remove the
+        previous build (workers still mapping it keep the inode alive)
+        """
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        self._vectors.flush()
+        ids = self._ids[:self.written]
+        kind = "flat"
+        if self.written >= max(self.store.ivf_threshold, 1):
+            ids = self._build_ivf()
+            kind = "ivf"
+        elif self.written < len(self._ids):
+            # Rows deleted while building: keep only what was written
+            np.save(os.path.join(self.path, "vectors.tmp.npy"), self._vectors[:self.written])
+            os.replace(os.path.join(self.path, "vectors.tmp.npy"), vectors_path)
+        self._vectors = None
+        np.save(os.path.join(self.path, "ids.npy"), ids)
+
+        pointer = self.store._pointer(self.chatbot_id, self.corpus)
+        previous = None
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                previous = json.load(f).get("build")
+        meta = {
+            "build": self.name,
+            "version": self.version,
+            "count": self.written,
+            "dim": self.store.embedder.dim,
+            "kind": kind,
+            "built_at": datetime.utcnow().isoformat(),
+        }
+        with open(pointer + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(pointer + ".tmp", pointer)
+        self.store.builds += 1
+        self.store._entries.pop((self.chatbot_id, self.corpus), None)
+        if previous and previous != self.name:
+            shutil.rmtree(os.path.join(self.store.root, self.chatbot_id, previous), ignore_errors=True)
+
+    def _build_ivf(self, batch_rows: int = 65536) -> np.ndarray:
+        """
+        Cluster the written rows and rewrite vectors.npy grouped by list;
+        returns the ids in the new row order
+        """
+        vectors = self._vectors[:self.written]
+        nlist = self.store.ivf_nlist or int(2 * math.sqrt(self.written))
+        nlist = max(1, min(nlist, self.written))
+        centroids, order, offsets = build_ivf_lists(vectors, nlist, batch_rows)
+
+        grouped_path = os.path.join(self.path, "vectors.ivf.npy")
+        grouped = np.lib.format.open_memmap(grouped_path, mode="w+", dtype=np.float32, shape=vectors.shape)
+        for start in range(0, self.written, batch_rows):
+            grouped[start:start + batch_rows] = vectors[order[start:start + batch_rows]]
+        grouped.flush()
+        del grouped
+        os.replace(grouped_path, os.path.join(self.path, "vectors.npy"))
+        np.save(os.path.join(self.path, "centroids.npy"), centroids)
+        np.save(os.path.join(self.path, "offsets.npy"), offsets)
+        return self._ids[:self.written][order]
+
+    def abort(self) -> None:
+        self._vectors = None
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+embedding_store = EmbeddingStore(
+    root=EMBEDDING_DIR,
+    embedder=HashingEmbedder(dim=EMBEDDING_DIM),
+    maxsize=int(os.getenv("EMBEDDING_INDEX_CACHE_SIZE", "1000")),
+    revalidate_after=float(os.getenv("EMBEDDING_INDEX_REVALIDATE", "5")),
+    ivf_threshold=int(os.getenv("EMBEDDING_IVF_THRESHOLD", "50000")),
+    ivf_nlist=int(os.getenv("EMBEDDING_IVF_NLIST", "0")),
+    ivf_nprobe=int(os.getenv("EMBEDDING_IVF_NPROBE", "8")),
+)
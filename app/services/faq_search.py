@@ -0,0 +1,615 @@
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.services.chatbot_runtime import ChatbotRuntime
+import numpy as np
+import asyncio
+import heapq
+import math
+import os
+import re
+
+# Replies below this confidence fall back to the generic answer
+FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", "0.3"))
+# Trigram (typo-tolerant) matches below this similarity are not used
+FAQ_FUZZY_MIN_SIMILARITY = float(os.getenv("FAQ_FUZZY_MIN_SIMILARITY", "0.5"))
+# A question term counts this many times more than an answer term
+QUESTION_WEIGHT = 2
+# Share of added / removed FAQs since the last build at which an index is
+# rebuilt in the background (refreshing idf and reclaiming tombstones)
+FAQ_INDEX_COMPACT_RATIO = float(os.getenv("FAQ_INDEX_COMPACT_RATIO", "0.2"))
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it "
+    "its me my of on or our so that the their there this to was we what when where "
+    "which who why will with you your".split()
+)
+
+
+# Light suffix stripping (ship / shipping / shipped, international / internationally)
+_SUFFIXES = (("ingly", ""), ("edly", ""), ("ally", "al"), ("ing", ""), ("ed", ""), ("ly", ""))
+
+
+def _stem(token: str) -> str:
+    for suffix, replacement in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[:-len(suffix)] + replacement
+            # shipp(ing) -> ship
+            if not replacement and token[-1] == token[-2] and token[-1] not in "lsz":
+                token = token[:-1]
+            return token
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased, lightly stemmed word tokens without stopwords
+    """
+    return [_stem(token) for token in _WORD.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _term_freqs(question: str, answer: str) -> Counter:
+    tf: Counter = Counter()
+    for term in tokenize(question):
+        tf[term] += QUESTION_WEIGHT
+    for term in tokenize(answer):
+        tf[term] += 1
+    return tf
+
+
+class FAQMatch(NamedTuple):
+    index: int  # Position in the chatbot's FAQ tuple
+    question: str
+    answer: str
+    score: float
+    confidence: float  # 0..1, see FAQIndex.search
+
+
+class IncrementalFAQIndex(ABC):
+    """
+    Slot bookkeeping shared by the FAQ indexes so a config edit does not
+    cost a rebuild
+
+    Every FAQ the index has seen owns a slot; sync() matches the new FAQ
+    tuple against the live slots by content, adds slots for new FAQs and
+    removes the ones that are gone (an edit is a remove plus an add), and
+    remaps slots to their new positions. Removed slots stay behind as
+    tombstones and index statistics (idf, average length) stay as they were
+    at build time, until FAQIndexCache rebuilds the index in the background
+    once stale_ratio crosses FAQ_INDEX_COMPACT_RATIO.
+    """
+
+    # Above this share of changed FAQs a fresh build is cheaper than a sync
+    _SYNC_LIMIT = 0.5
+
+    def _init_slots(self, faqs: Sequence[Tuple[str, str]]) -> None:
+        self.faqs: List[Optional[Tuple[str, str]]] = list(faqs)  # By slot, None once removed
+        self._positions = list(range(len(self.faqs)))
+        self.live = len(self.faqs)
+        self.changes = 0
+
+    def __len__(self) -> int:
+        return self.live
+
+    @property
+    def stale_ratio(self) -> float:
+        return self.changes / max(len(self.faqs), 1)
+
+    def sync(self, faqs: Sequence[Tuple[str, str]]) -> bool:
+        """
+        Bring the index in line with faqs; False (index untouched) when so
+        much changed that the caller should rebuild instead
+        """
+        free: Dict[Tuple[str, str], List[int]] = {}
+        for slot, faq in enumerate(self.faqs):
+            if faq is not None:
+                free.setdefault(faq, []).append(slot)
+        positions: List[Optional[int]] = []
+        added = []
+        for position, faq in enumerate(faqs):
+            slots = free.get(faq)
+            if slots:
+                positions.append(slots.pop())
+            else:
+                positions.append(None)
+                added.append(position)
+        removed = [slot for slots in free.values() for slot in slots]
+        if len(added) + len(removed) > self._SYNC_LIMIT * max(len(faqs), self.live, 1):
+            return False
+
+        for slot in removed:
+            self._remove(slot)
+            self.faqs[slot] = None
+        for position in added:
+            self.faqs.append(faqs[position])
+            positions[position] = len(self.faqs) - 1
+            self._add(len(self.faqs) - 1, *faqs[position])
+        self._positions = [-1] * len(self.faqs)
+        for position, slot in enumerate(positions):
+            self._positions[slot] = position
+        self.live = len(faqs)
+        self.changes += len(added) + len(removed)
+        return True
+
+    @abstractmethod
+    def _add(self, slot: int, question: str, answer: str) -> None:
+        """Index the FAQ stored in slot (already appended to self.faqs)"""
+
+    @abstractmethod
+    def _remove(self, slot: int) -> None:
+        """Drop slot from the index or tombstone it"""
+
+    @abstractmethod
+    def search(self, text: str, top_k: int = 1) -> List[FAQMatch]:
+        """Best top_k live FAQs for text, best first"""
+
+    def _match(self, slot: int, score: float, confidence: float) -> FAQMatch:
+        question, answer = self.faqs[slot]
+        return FAQMatch(self._positions[slot], question, answer, score, confidence)
+
+    def best(self, text: str) -> Optional[FAQMatch]:
+        matches = self.search(text, top_k=1)
+        return matches[0] if matches else None
+
+    def search_batch(self, texts: Sequence[str], top_k: int = 1) -> List[List[FAQMatch]]:
+        return [self.search(text, top_k) for text in texts]
+
+
+class FAQIndex(IncrementalFAQIndex):
+    """
+    Okapi BM25 over a chatbot's FAQs (question and answer text)
+
+    The inverted index stores each posting's final BM25 term weight, so a
+    query only sums precomputed floats. Queries use MaxScore pruning: terms
+    are visited from the highest to the lowest upper bound, and once the
+    remaining (common, low-idf) terms cannot lift a new FAQ into the top k,
+    their long postings are no longer scanned, only probed for the
+    surviving candidates. Results are the same as exhaustive scoring.
+    """
+
+    def __init__(self, faqs: Sequence[Tuple[str, str]], k1: float = 1.2, b: float = 0.75):
+        self._init_slots(faqs)
+        self.k1 = k1
+        self.b = b
+        term_freqs = [_term_freqs(question, answer) for question, answer in self.faqs]
+
+        n = len(term_freqs)
+        lengths = [sum(tf.values()) for tf in term_freqs]
+        self._n = n
+        self._avg_length = (sum(lengths) / n) if n else 0.0
+        doc_freq = Counter(term for tf in term_freqs for term in tf)
+
+        self._idf = {term: _idf(n, df) for term, df in doc_freq.items()}
+        self._unseen_idf = _idf(n, 0)
+        # Score of a query term matched once in the question of an
+        # average-length FAQ: the yardstick for confidence
+        self._ideal_weight = QUESTION_WEIGHT * (k1 + 1) / (QUESTION_WEIGHT + k1)
+
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._max_weight: Dict[str, float] = {}
+        self._doc_terms: List[Tuple[str, ...]] = []
+        for doc, tf in enumerate(term_freqs):
+            self._index_doc(doc, tf)
+
+    def _index_doc(self, doc: int, tf: Counter) -> None:
+        length = sum(tf.values())
+        norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+        for term, freq in tf.items():
+            weight = self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            self._postings.setdefault(term, {})[doc] = weight
+            if weight > self._max_weight.get(term, 0.0):
+                self._max_weight[term] = weight
+        self._doc_terms.append(tuple(tf))
+
+    def _add(self, slot: int, question: str, answer: str) -> None:
+        tf = _term_freqs(question, answer)
+        for term in tf:
+            # Build-time statistics: a new term counts as seen once
+            self._idf.setdefault(term, _idf(self._n, 1))
+        self._index_doc(slot, tf)
+
+    def _remove(self, slot: int) -> None:
+        # Dict postings can drop the FAQ outright; _max_weight stays a valid
+        # upper bound for MaxScore
+        for term in self._doc_terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+                del self._max_weight[term]
+        self._doc_terms[slot] = ()
+
+    def search(self, text: str, top_k: int = 1) -> List[FAQMatch]:
+        """
+        Best matching FAQs for text, highest score first
+
+        confidence is the score relative to an FAQ whose question contains
+        every query term once; query terms no FAQ contains lower it.
+        """
+        terms = set(tokenize(text))
+        matched = sorted(
+            (term for term in terms if term in self._postings),
+            key=self._max_weight.__getitem__,
+            reverse=True,
+        )
+        if not matched:
+            return []
+
+        # remaining[i]: the most terms i.. can still add to any FAQ's score
+        remaining = [0.0] * (len(matched) + 1)
+        for i in range(len(matched) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + self._max_weight[matched[i]]
+
+        scores: Dict[int, float] = {}
+        for i, term in enumerate(matched):
+            threshold = heapq.nlargest(top_k, scores.values())[-1] if len(scores) >= top_k else 0.0
+            if threshold and threshold >= remaining[i]:
+                # No unseen FAQ can reach the top k any more: keep only the
+                # candidates that still can, and probe the remaining terms
+                candidates = {doc: score for doc, score in scores.items() if score + remaining[i] >= threshold}
+                for rest in matched[i:]:
+                    postings = self._postings[rest]
+                    for doc in candidates:
+                        weight = postings.get(doc)
+                        if weight is not None:
+                            candidates[doc] += weight
+                scores = candidates
+                break
+            for doc, weight in self._postings[term].items():
+                scores[doc] = scores.get(doc, 0.0) + weight
+
+        ideal = self._ideal_weight * sum(self._idf.get(term, self._unseen_idf) for term in terms)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [self._match(doc, score, min(1.0, score / ideal)) for doc, score in best]
+
+
+class TfidfFAQIndex(IncrementalFAQIndex):
+    """
+    TF-IDF cosine similarity over a chatbot's FAQs, scored with NumPy
+
+    The FAQ matrix (sublinear tf, smoothed idf, L2-normalized rows) is kept
+    term-major, i.e. as CSR arrays of its transpose, so scoring a message is
+    one sparse matrix-vector product done by np.bincount, with no Python loop
+    over postings. search_batch scores many messages in one product.
+    Confidence is the cosine similarity itself. Added FAQs are spliced into
+    the CSR arrays (one np.insert), removed ones are masked out.
+    """
+
+    # Upper bound for the dense (messages x FAQs) score block of one batch step
+    _BATCH_CELLS = 250_000
+
+    def __init__(self, faqs: Sequence[Tuple[str, str]]):
+        self._init_slots(faqs)
+        term_freqs = [_term_freqs(question, answer) for question, answer in self.faqs]
+
+        n = len(term_freqs)
+        self._n = n
+        doc_freq = Counter(term for tf in term_freqs for term in tf)
+        self._vocabulary = {term: i for i, term in enumerate(doc_freq)}
+        self._idf = np.array(
+            [math.log((1 + n) / (1 + doc_freq[term])) + 1 for term in doc_freq], dtype=np.float32
+        )
+        self._alive = np.ones(n, dtype=bool)
+
+        rows, cols, values = [], [], []
+        for doc, tf in enumerate(term_freqs):
+            for term_id, weight in self._doc_weights(tf).items():
+                rows.append(term_id)
+                cols.append(doc)
+                values.append(weight)
+
+        order = np.argsort(np.asarray(rows, dtype=np.int64), kind="stable")
+        self._docs = np.asarray(cols, dtype=np.int32)[order]
+        self._values = np.asarray(values, dtype=np.float32)[order]
+        self._indptr = np.zeros(len(self._vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.asarray(rows, dtype=np.int64), minlength=len(self._vocabulary)),
+                  out=self._indptr[1:])
+
+    def _doc_weights(self, tf: Counter) -> Dict[int, float]:
+        weights = {
+            self._vocabulary[term]: (1 + math.log(freq)) * self._idf[self._vocabulary[term]]
+            for term, freq in tf.items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term_id: weight / norm for term_id, weight in weights.items()}
+
+    def _add(self, slot: int, question: str, answer: str) -> None:
+        tf = _term_freqs(question, answer)
+        new_terms = [term for term in tf if term not in self._vocabulary]
+        if new_terms:
+            # Build-time statistics: a new term counts as seen once
+            for term in new_terms:
+                self._vocabulary[term] = len(self._vocabulary)
+            self._idf = np.append(self._idf, np.full(len(new_terms), math.log((1 + self._n) / 2) + 1, dtype=np.float32))
+            self._indptr = np.append(self._indptr, np.full(len(new_terms), self._indptr[-1]))
+
+        weights = self._doc_weights(tf)
+        term_ids = np.fromiter(sorted(weights), dtype=np.int64, count=len(weights))
+        # Append at the end of each term's postings; later terms shift right
+        at = self._indptr[term_ids + 1]
+        self._docs = np.insert(self._docs, at, slot)
+        self._values = np.insert(self._values, at, [weights[t] for t in term_ids.tolist()])
+        self._indptr += np.searchsorted(term_ids, np.arange(len(self._indptr)), side="left")
+        self._alive = np.append(self._alive, True)
+
+    def _remove(self, slot: int) -> None:
+        self._alive[slot] = False
+
+    def _query(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Posting positions and the matching query weights for one message
+        """
+        tf = Counter(term for term in tokenize(text) if term in self._vocabulary)
+        if not tf:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        term_ids = np.fromiter((self._vocabulary[term] for term in tf), dtype=np.int64, count=len(tf))
+        weights = np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf))) + 1
+        weights *= self._idf[term_ids]
+        # Unknown terms are left out of the norm as well: they would only
+        # scale every score down by the same factor
+        weights /= np.linalg.norm(weights)
+
+        starts, ends = self._indptr[term_ids], self._indptr[term_ids + 1]
+        lengths = ends - starts
+        positions = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        return positions, np.repeat(weights, lengths)
+
+    def search(self, text: str, top_k: int = 1) -> List[FAQMatch]:
+        return self.search_batch([text], top_k)[0]
+
+    def best(self, text: str) -> Optional[FAQMatch]:
+        matches = self.search(text, top_k=1)
+        return matches[0] if matches else None
+
+    def search_batch(self, texts: Sequence[str], top_k: int = 1) -> List[List[FAQMatch]]:
+        """
+        Best matching FAQs for each message, highest similarity first
+        """
+        n = len(self.faqs)
+        if not self.live:
+            return [[] for _ in texts]
+        step = max(1, self._BATCH_CELLS // n)
+        results: List[List[FAQMatch]] = []
+        for offset in range(0, len(texts), step):
+            results.extend(self._score_chunk(texts[offset:offset + step], top_k))
+        return results
+
+    def _score_chunk(self, texts: Sequence[str], top_k: int) -> List[List[FAQMatch]]:
+        n = len(self.faqs)
+        queries = [self._query(text) for text in texts]
+        positions = np.concatenate([q[0] for q in queries])
+        weights = np.concatenate([q[1] for q in queries])
+        query_rows = np.repeat(np.arange(len(texts), dtype=np.int64), [len(q[0]) for q in queries])
+
+        # (messages x FAQs) = Q @ D.T as one weighted bincount
+        scores = np.bincount(
+            query_rows * n + self._docs[positions],
+            weights=weights * self._values[positions],
+            minlength=len(texts) * n,
+        ).reshape(len(texts), n)
+        if self.live < n:
+            scores[:, ~self._alive] = 0.0
+
+        k = min(top_k, n)
+        if k == 1:
+            top = scores.argmax(axis=1)[:, None]
+        elif k < n:
+            top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+        else:
+            top = np.tile(np.arange(n), (len(texts), 1))
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates], kind="stable")]
+            results.append([
+                self._match(int(doc), float(scores[row, doc]), min(1.0, float(scores[row, doc])))
+                for doc in ranked
+                if scores[row, doc] > 0
+            ])
+        return results
+
+
+def _idf(n: int, df: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+
+def _trigrams(text: str) -> frozenset:
+    """
+    Character trigrams of the non-stopword words, each padded with spaces
+    ("hours" -> " ho", "hou", "our", "urs", "rs ")
+    """
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramFAQIndex(IncrementalFAQIndex):
+    """
+    Typo-tolerant matching of messages against FAQ questions
+
+    Shared trigrams are counted from the posting lists, rarest trigrams
+    first, until posting_budget postings have been read, so common trigrams
+    never cause a scan over every FAQ. The counts give the Dice similarity of
+    the trigram sets (also the confidence); when the budget cut the walk
+    short, the best max_candidates are re-ranked on their exact sets.
+    Added FAQs are appended to their trigrams' postings, removed ones are
+    masked out.
+    """
+
+    def __init__(self, faqs: Sequence[Tuple[str, str]], max_candidates: int = 32, posting_budget: int = 5000):
+        self._init_slots(faqs)
+        self.max_candidates = max_candidates
+        self.posting_budget = posting_budget
+        self._grams = [_trigrams(question) for question, _ in self.faqs]
+        postings: Dict[str, List[int]] = {}
+        for doc, grams in enumerate(self._grams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc)
+        self._postings = {gram: np.asarray(docs, dtype=np.int32) for gram, docs in postings.items()}
+        self._sizes = np.fromiter((len(grams) for grams in self._grams), dtype=np.float64, count=len(self._grams))
+        self._alive = np.ones(len(self._grams), dtype=bool)
+
+    def _add(self, slot: int, question: str, answer: str) -> None:
+        grams = _trigrams(question)
+        self._grams.append(grams)
+        for gram in grams:
+            docs = self._postings.get(gram)
+            self._postings[gram] = np.append(docs, np.int32(slot)) if docs is not None else np.array([slot], dtype=np.int32)
+        self._sizes = np.append(self._sizes, len(grams))
+        self._alive = np.append(self._alive, True)
+
+    def _remove(self, slot: int) -> None:
+        self._alive[slot] = False
+
+    def search(self, text: str, top_k: int = 1) -> List[FAQMatch]:
+        query = _trigrams(text)
+        known = sorted((gram for gram in query if gram in self._postings),
+                       key=lambda gram: len(self._postings[gram]))
+        lists = []
+        visited = 0
+        for gram in known:
+            docs = self._postings[gram]
+            if visited and visited + len(docs) > self.posting_budget:
+                break
+            visited += len(docs)
+            lists.append(docs)
+        if not lists:
+            return []
+
+        # Only FAQs that share a trigram, with their shared counts
+        docs, shared = np.unique(np.concatenate(lists), return_counts=True)
+        if self.live < len(self.faqs):
+            alive = self._alive[docs]
+            docs, shared = docs[alive], shared[alive]
+            if not len(docs):
+                return []
+        dice = 2 * shared / (len(query) + self._sizes[docs])
+        if len(lists) == len(known):
+            keep = min(top_k, len(docs))
+            top = np.argpartition(dice, -keep)[-keep:]
+            scored = [(float(dice[i]), int(docs[i])) for i in top]
+        else:
+            keep = min(self.max_candidates, len(docs))
+            candidates = docs[np.argpartition(dice, -keep)[-keep:]].tolist()
+            scored = [
+                (2 * len(query & self._grams[doc]) / (len(query) + len(self._grams[doc])), doc)
+                for doc in candidates
+            ]
+        return [self._match(doc, score, score) for score, doc in heapq.nlargest(top_k, scored)]
+
+
+FAQ_MATCHERS = {"bm25": FAQIndex, "tfidf": TfidfFAQIndex, "trigram": TrigramFAQIndex}
+
+
+class FAQIndexCache:
+    """
+    FAQ indexes per chatbot: the one chatbot_config["faq_matcher"] selects
+    ("bm25" by default, or "tfidf"), plus the trigram index used as the
+    typo-tolerant fallback
+
+    When the chatbot's runtime (and so its FAQ tuple) changes, the cached
+    index is synced in place. Once its stale_ratio reaches compact_ratio a
+    fresh index is built in a worker thread and swapped in if the FAQs have
+    not changed again meanwhile.
+    """
+
+    def __init__(self, maxsize: int = 1000, compact_ratio: float = 0.2):
+        self.maxsize = maxsize
+        self.compact_ratio = compact_ratio
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (id, matcher) -> (faqs, index)
+        self._compacting: set = set()
+        self.hits = 0
+        self.builds = 0
+        self.syncs = 0
+        self.compactions = 0
+        self.evictions = 0
+
+    def get(self, chatbot: ChatbotRuntime):
+        return self._get(chatbot, chatbot.faq_matcher)
+
+    def fuzzy(self, chatbot: ChatbotRuntime) -> TrigramFAQIndex:
+        return self._get(chatbot, "trigram")
+
+    def _get(self, chatbot: ChatbotRuntime, matcher: str):
+        key = (chatbot.chatbot_id, matcher)
+        entry = self._entries.get(key)
+        # Same runtime version -> same tuple object, so identity is enough
+        if entry is not None and entry[0] is chatbot.faqs:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        if entry is not None and entry[1].sync(chatbot.faqs):
+            index = entry[1]
+            self.syncs += 1
+            if index.stale_ratio >= self.compact_ratio:
+                self._compact(key, chatbot.faqs, matcher)
+        else:
+            index = FAQ_MATCHERS[matcher](chatbot.faqs)
+            self.builds += 1
+        self._store(key, chatbot.faqs, index)
+        return index
+
+    def refresh(self, chatbot: ChatbotRuntime) -> None:
+        """
+        Sync every cached index of the chatbot to its current FAQs
+        """
+        for key in [key for key in self._entries if key[0] == chatbot.chatbot_id]:
+            self._get(chatbot, key[1])
+
+    def _store(self, key: tuple, faqs: tuple, index) -> None:
+        self._entries[key] = (faqs, index)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _compact(self, key: tuple, faqs: tuple, matcher: str) -> None:
+        if key in self._compacting:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, benchmarks): the caller stores the
+            # synced index; compaction waits for the next change
+            return
+        self._compacting.add(key)
+        future = loop.run_in_executor(None, FAQ_MATCHERS[matcher], faqs)
+        future.add_done_callback(lambda done: self._compacted(key, faqs, done))
+
+    def _compacted(self, key: tuple, faqs: tuple, done: "asyncio.Future") -> None:
+        self._compacting.discard(key)
+        if done.cancelled():
+            return
+        if done.exception() is not None:
+            print(f"Error compacting FAQ index for chatbot {key[0]}: {done.exception()}")
+            return
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is faqs:
+            self._entries[key] = (faqs, done.result())
+            self.compactions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.builds + self.syncs
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "builds": self.builds,
+            "syncs": self.syncs,
+            "compactions": self.compactions,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+faq_index_cache = FAQIndexCache(
+    maxsize=int(os.getenv("FAQ_INDEX_CACHE_SIZE", "1000")),
+    compact_ratio=FAQ_INDEX_COMPACT_RATIO,
+)
@@ -0,0 +1,372 @@
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import delete, insert, or_, true, update
+from app.db.db_config import engine
+from app.db.models import IngestionJob, KnowledgeChunk
+from app.services.embeddings import embedding_store
+from itertools import islice
+from datetime import datetime, timedelta
+import asyncio
+import codecs
+import os
+import re
+import shutil
+import tempfile
+
+# Target chunk size and the tail each chunk repeats from the previous one
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "1000"))
+KNOWLEDGE_CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "100"))
+
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def read_blocks(file: BinaryIO, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    while True:
+        block = file.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def decode(blocks: Iterable[bytes], encoding: str = "utf-8-sig") -> Iterator[str]:
+    """
+    Incremental decode: a character split across two blocks is carried over,
+    undecodable bytes become U+FFFD
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def normalize(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Drop control characters and collapse whitespace runs to one space,
+    including runs that span two pieces
+    """
+    pending_space = False
+    started = False
+    for piece in pieces:
+        piece = _WHITESPACE.sub(" ", _CONTROL.sub("", piece))
+        if not piece:
+            continue
+        if piece[0] == " ":
+            pending_space = True
+            piece = piece[1:]
+        if not piece:
+            continue
+        if pending_space and started:
+            piece = " " + piece
+        pending_space = piece[-1] == " "
+        piece = piece.rstrip(" ")
+        if piece:
+            started = True
+            yield piece
+
+
+def chunk(
+    pieces: Iterable[str],
+    size: int = KNOWLEDGE_CHUNK_CHARS,
+    overlap: int = KNOWLEDGE_CHUNK_OVERLAP
+) -> Iterator[str]:
+    """
+    Cut normalized text into chunks of at most size characters, at a space
+    where there is one, each starting with up to overlap characters (whole
+    words) of the previous chunk. Only one chunk plus one piece is ever held.
+    """
+    overlap = min(overlap, size // 2)
+    buffer = ""
+    covered = 0  # Leading characters of buffer already in the previous chunk
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) > size:
+            cut = buffer.rfind(" ", size // 2, size + 1)
+            if cut <= 0:
+                cut = size
+            yield buffer[:cut].strip()
+            space = buffer.find(" ", cut - overlap, cut) if overlap else -1
+            start = space + 1 if space != -1 else cut
+            if buffer[start:start + 1] == " ":
+                start += 1
+            buffer = buffer[start:]
+            covered = cut - start
+    if len(buffer.strip()) > covered:
+        yield buffer.strip()
+
+
+def copy_upload(file: BinaryIO, block_size: int = 64 * 1024) -> BinaryIO:
+    """
+    Copy an upload into a temp file owned by the ingestion job (blocking:
+    run it in a thread), rewound and ready to read
+    """
+    file.seek(0)
+    copy = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(file, copy, block_size)
+        copy.seek(0)
+    except Exception:
+        copy.close()
+        raise
+    return copy
+
+
+def _is_binary(file: BinaryIO) -> bool:
+    head = file.read(8192)
+    file.seek(0)
+    return b"\x00" in head
+
+
+class KnowledgeIngestion:
+    """
+    Background ingestion of knowledge_files uploads into knowledge_chunks
+
+    create_chatbot copies each upload into a temp file of its own
+    (copy_upload), records an ingestion_jobs row and submits the job here;
+    workers started with the app lifespan process jobs one at a time each. A file flows through
+    read_blocks -> decode -> normalize -> chunk as generators, so memory stays
+    at one block plus one insert batch regardless of file size; the
+    generators advance in a worker thread and every insert_batch_size chunks
+    are inserted (with the job's progress) in their own short transaction.
+
+    Jobs live in this process's queue, so a process that stops takes its
+    jobs with it. Every heartbeat_interval seconds each process bumps
+    heartbeat_at on the jobs it holds, and fails queued or running jobs
+    whose heartbeat is older than stale_after (their process is gone); the
+    first check runs at startup. A clean shutdown fails its own jobs.
+    Failing a job deletes the chunks it stored in the same transaction, so a
+    failed job never leaves partial knowledge behind.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        block_size: int = 64 * 1024,
+        insert_batch_size: int = 200,
+        heartbeat_interval: float = 30.0,
+        stale_after: float = 120.0
+    ):
+        self.workers = workers
+        self.block_size = block_size
+        self.insert_batch_size = insert_batch_size
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._queue: "asyncio.Queue[Tuple[str, str, List[Tuple[str, Optional[str], BinaryIO]]]]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._held: Set[str] = set()
+        self.jobs_submitted = 0
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.jobs_abandoned = 0
+        self.files_skipped = 0
+        self.chunks = 0
+        self.chunks_discarded = 0
+        self.bytes_read = 0
+
+    def submit(self, job_id: str, chatbot_id: str, files: List[Tuple[str, Optional[str], BinaryIO]]) -> None:
+        """
+        Queue (name, content_type, file) uploads; the files are closed here
+        once ingested
+        """
+        self._held.add(job_id)
+        self._queue.put_nowait((job_id, chatbot_id, files))
+        self.jobs_submitted += 1
+
+    def start(self) -> None:
+        """
+        Start the ingestion workers (called from the app lifespan)
+        """
+        self._tasks = [task for task in self._tasks if not task.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._run()))
+        if self.heartbeat_interval > 0 and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = loop.create_task(self._heartbeat())
+
+    async def stop(self) -> None:
+        tasks = self._tasks + ([self._heartbeat_task] if self._heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._heartbeat_task = None
+        while not self._queue.empty():
+            _, _, files = self._queue.get_nowait()
+            for _, _, file in files:
+                file.close()
+        # Nothing will pick up the interrupted and queued jobs
+        if self._held:
+            try:
+                await self._fail(IngestionJob.id.in_(list(self._held)), error="Interrupted by shutdown")
+            except Exception as e:
+                print(f"Error failing interrupted ingestion jobs: {e}")
+            self._held.clear()
+
+    async def fail_stale_jobs(self) -> int:
+        """
+        Fail queued / running jobs whose process stopped bumping heartbeat_at
+        (or that predate the heartbeat)
+        """
+        now = datetime.utcnow()
+        job_ids = await self._fail(
+            IngestionJob.status.in_(["queued", "running"]),
+            or_(
+                IngestionJob.heartbeat_at < now - timedelta(seconds=self.stale_after),
+                IngestionJob.heartbeat_at.is_(None),
+            ),
+            IngestionJob.id.not_in(self._held) if self._held else true(),
+            error="Interrupted: the process running this job stopped",
+        )
+        if job_ids:
+            self.jobs_abandoned += len(job_ids)
+            print(f"Failed {len(job_ids)} abandoned ingestion jobs")
+        return len(job_ids)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            try:
+                if self._held:
+                    await self._update_many(self._held, heartbeat_at=datetime.utcnow())
+                await self.fail_stale_jobs()
+            except Exception as e:
+                print(f"Error checking ingestion job heartbeats: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _run(self) -> None:
+        while True:
+            job_id, chatbot_id, files = await self._queue.get()
+            try:
+                await self.ingest(job_id, chatbot_id, files)
+                self.jobs_done += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.jobs_failed += 1
+                print(f"Error ingesting knowledge files for job {job_id}: {e}")
+                try:
+                    await self._fail(IngestionJob.id == job_id, error=str(e))
+                except Exception as e:
+                    print(f"Error updating ingestion job {job_id}: {e}")
+            finally:
+                self._held.discard(job_id)
+                for _, _, file in files:
+                    file.close()
+
+    async def ingest(self, job_id: str, chatbot_id: str, files: List[Tuple[str, Optional[str], BinaryIO]]) -> None:
+        await self._update(job_id, status="running", started_at=datetime.utcnow())
+        results: List[Dict[str, Any]] = []
+        total_chunks = 0
+        total_bytes = 0
+        for name, content_type, file in files:
+            result: Dict[str, Any] = {"name": name, "content_type": content_type, "bytes": 0, "chunks": 0}
+            results.append(result)
+            if await asyncio.to_thread(_is_binary, file):
+                result["skipped"] = "binary content"
+                self.files_skipped += 1
+                continue
+
+            def counted(blocks: Iterator[bytes]) -> Iterator[bytes]:
+                for block in blocks:
+                    result["bytes"] += len(block)
+                    yield block
+
+            chunks = chunk(normalize(decode(counted(read_blocks(file, self.block_size)))))
+            while True:
+                # Generators advance (and read the temp file) off the event loop
+                batch = await asyncio.to_thread(list, islice(chunks, self.insert_batch_size))
+                if not batch:
+                    break
+                rows = [
+                    {"chatbot_id": chatbot_id, "job_id": job_id, "source": name,
+                     "chunk_index": result["chunks"] + i, "content": content}
+                    for i, content in enumerate(batch)
+                ]
+                result["chunks"] += len(batch)
+                async with engine.begin() as conn:
+                    await conn.execute(insert(KnowledgeChunk), rows)
+                    await conn.execute(
+                        update(IngestionJob).where(IngestionJob.id == job_id).values(
+                            chunks=total_chunks + result["chunks"],
+                            bytes_read=total_bytes + result["bytes"],
+                        )
+                    )
+                self.chunks += len(batch)
+            total_chunks += result["chunks"]
+            total_bytes += result["bytes"]
+            self.bytes_read += result["bytes"]
+
+        await self._finish(job_id, "done", files=results, chunks=total_chunks, bytes_read=total_bytes)
+
+        # The chunks are stored either way; a failed embedding build only
+        # delays semantic search until the next ingestion
+        if total_chunks:
+            try:
+                await embedding_store.build_knowledge(chatbot_id)
+            except Exception as e:
+                print(f"Error building knowledge embeddings for chatbot {chatbot_id}: {e}")
+
+    async def _finish(self, job_id: str, status: str, **values: Any) -> None:
+        try:
+            await self._update(job_id, status=status, finished_at=datetime.utcnow(), **values)
+        except Exception as e:
+            print(f"Error updating ingestion job {job_id}: {e}")
+
+    async def _fail(self, *where: Any, error: str) -> List[str]:
+        """
+        Mark the jobs matching where as failed and delete the chunks they
+        stored, in one transaction
+        """
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                update(IngestionJob)
+                .where(*where)
+                .values(status="failed", error=error, finished_at=datetime.utcnow())
+                .returning(IngestionJob.id)
+            )
+            job_ids = list(result.scalars())
+            if job_ids:
+                result = await conn.execute(delete(KnowledgeChunk).where(KnowledgeChunk.job_id.in_(job_ids)))
+                self.chunks_discarded += result.rowcount
+        return job_ids
+
+    @staticmethod
+    async def _update(job_id: str, **values: Any) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**values))
+
+    @staticmethod
+    async def _update_many(job_ids: Iterable[str], **values: Any) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(update(IngestionJob).where(IngestionJob.id.in_(list(job_ids))).values(**values))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._tasks),
+            "jobs_submitted": self.jobs_submitted,
+            "jobs_done": self.jobs_done,
+            "jobs_failed": self.jobs_failed,
+            "jobs_abandoned": self.jobs_abandoned,
+            "jobs_held": len(self._held),
+            "files_skipped": self.files_skipped,
+            "chunks": self.chunks,
+            "chunks_discarded": self.chunks_discarded,
+            "bytes_read": self.bytes_read,
+        }
+
+
+knowledge_ingestion = KnowledgeIngestion(
+    workers=int(os.getenv("KNOWLEDGE_INGEST_WORKERS", "2")),
+    block_size=int(os.getenv("KNOWLEDGE_READ_BLOCK_SIZE", str(64 * 1024))),
+    insert_batch_size=int(os.getenv("KNOWLEDGE_INSERT_BATCH_SIZE", "200")),
+    heartbeat_interval=float(os.getenv("KNOWLEDGE_JOB_HEARTBEAT", "30")),
+    stale_after=float(os.getenv("KNOWLEDGE_JOB_STALE_AFTER", "120")),
+)
@@ -0,0 +1,334 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.services.chatbot_runtime import ChatbotRuntime
+import asyncio
+import hashlib
+import httpx
+import json
+import time
+import os
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class LLMReply(NamedTuple):
+    text: str
+    provider: str
+    model: str
+    latency_ms: float
+
+
+class LLMProvider(ABC):
+    """
+    One LLM API behind the common async interface: complete() gets a system
+    prompt and the chat turns ({"role": "user" | "assistant", "content": ...})
+    and returns the reply text. HTTP providers share LLMService's pooled client.
+    """
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    async def complete(
+        self,
+        client: Optional[httpx.AsyncClient],
+        system: str,
+        messages: Sequence[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        endpoint: Optional[str] = None
+    ) -> str:
+        """Reply text for the turns; client is None for local providers"""
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministic local provider for tests and offline load tests: echoes
+    the last user turn after latency seconds, plus up to jitter seconds
+    derived from the prompt (the same prompt always takes as long)
+    """
+
+    name = "fake"
+
+    def __init__(self, model: str = "fake", latency: float = 0.0, jitter: float = 0.0):
+        super().__init__(model)
+        self.latency = latency
+        self.jitter = jitter
+
+    async def complete(self, client, system, messages, model, max_tokens, endpoint=None) -> str:
+        last = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        delay = self.latency
+        if self.jitter:
+            digest = hashlib.blake2b(f"{system}\x00{last}".encode("utf-8"), digest_size=8).digest()
+            delay += self.jitter * int.from_bytes(digest, "big") / 2 ** 64
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return f"You said: {last}"
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Any /chat/completions API (OpenAI, vLLM, Ollama, ...)
+
+    api_key is only ever sent to base_url. A chatbot's llm_endpoint_url
+    replaces base_url only if it is one of endpoints, which maps each
+    endpoint the operator allows to the API key for it ("" for none); any
+    other endpoint is refused before a request is made, so a chatbot's
+    settings can neither receive the shared key nor point the server at an
+    arbitrary address.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str, base_url: str, api_key: str = "", endpoints: Optional[Dict[str, str]] = None):
+        super().__init__(model)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.endpoints = {url.rstrip("/"): key for url, key in (endpoints or {}).items()}
+
+    def resolve(self, endpoint: Optional[str] = None) -> Tuple[str, str]:
+        """
+        (URL, API key) to use for a chatbot's endpoint; raises LLMError if
+        the endpoint is not allowed
+        """
+        url = (endpoint or "").strip().rstrip("/") or self.base_url
+        if url == self.base_url:
+            return url, self.api_key
+        if url in self.endpoints:
+            return url, self.endpoints[url]
+        raise LLMError(f"LLM endpoint {url} is not in OPENAI_ENDPOINTS")
+
+    async def complete(self, client, system, messages, model, max_tokens, endpoint=None) -> str:
+        url, api_key = self.resolve(endpoint)
+        response = await client.post(
+            f"{url}/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            json={
+                "model": model,
+                "messages": [{"role": "system", "content": system}, *messages],
+                "max_tokens": max_tokens,
+            },
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Gemini generateContent over REST, on the shared async client instead of
+    the synchronous google-generativeai SDK
+    """
+
+    name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com/v1beta"
+
+    def __init__(self, model: str, api_key: str):
+        super().__init__(model)
+        self.api_key = api_key
+
+    async def complete(self, client, system, messages, model, max_tokens, endpoint=None) -> str:
+        response = await client.post(
+            f"{self.base_url}/models/{model}:generateContent",
+            headers={"x-goog-api-key": self.api_key},
+            json={
+                "systemInstruction": {"parts": [{"text": system}]},
+                "contents": [
+                    {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+                    for m in messages
+                ],
+                "generationConfig": {"maxOutputTokens": max_tokens},
+            },
+        )
+        response.raise_for_status()
+        parts = response.json()["candidates"][0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+
+class LLMService:
+    """
+    Entry point for LLM calls from the API
+
+    The provider comes from chatbot_config["llm_provider"] (else
+    default_provider), the model from chatbot_config["llm_model"] (else the
+    provider's default). Every call gets a deadline (timeout seconds unless
+    the caller passes one) covering connect, queueing for a pooled
+    connection and the whole response. HTTP providers share one
+    httpx.AsyncClient whose connection pool (max_connections, of which
+    max_keepalive stay open) keeps TLS sessions warm across requests; it is
+    created on first use and closed with the app lifespan.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, LLMProvider],
+        default_provider: str = "fake",
+        timeout: float = 15.0,
+        max_tokens: int = 512,
+        max_connections: int = 100,
+        max_keepalive: int = 20
+    ):
+        self.providers = providers
+        self.default_provider = default_provider if default_provider in providers else "fake"
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self._client: Optional[httpx.AsyncClient] = None
+        self._calls: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                # The overall deadline is enforced in complete()
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def provider_for(self, chatbot: ChatbotRuntime) -> LLMProvider:
+        name = str(chatbot.config.get("llm_provider") or "").strip().lower()
+        return self.providers.get(name) or self.providers[self.default_provider]
+
+    async def complete(
+        self,
+        chatbot: ChatbotRuntime,
+        system: str,
+        messages: Sequence[Dict[str, str]],
+        timeout: Optional[float] = None
+    ) -> LLMReply:
+        """
+        Reply for the chat turns; raises LLMTimeout past the deadline and
+        LLMError when the provider fails
+        """
+        provider = self.provider_for(chatbot)
+        model = str(chatbot.config.get("llm_model") or "") or provider.model
+        stats = self._calls.setdefault(provider.name, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0})
+        stats["calls"] += 1
+        client = self.client if provider.name != "fake" else None
+        deadline = timeout if timeout is not None else self.timeout
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(
+                provider.complete(
+                    client, system, messages, model, self.max_tokens, endpoint=chatbot.llm_endpoint_url
+                ),
+                deadline,
+            )
+            if not isinstance(text, str):
+                raise TypeError(f"reply is {type(text).__name__}, not text")
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            raise LLMTimeout(f"{provider.name} did not answer within {deadline}s")
+        except LLMError:
+            stats["errors"] += 1
+            raise
+        # Error statuses, bodies that are not JSON, and JSON of the wrong
+        # shape (a list or null where an object is expected raises
+        # TypeError / AttributeError)
+        except (httpx.HTTPError, KeyError, IndexError, ValueError, TypeError, AttributeError) as e:
+            stats["errors"] += 1
+            raise LLMError(f"{provider.name} call failed: {e}") from e
+        latency_ms = (time.perf_counter() - started) * 1000
+        stats["total_ms"] += latency_ms
+        return LLMReply(text.strip(), provider.name, model, round(latency_ms, 2))
+
+    def stats(self) -> Dict[str, Any]:
+        providers = {}
+        for name, stats in self._calls.items():
+            succeeded = stats["calls"] - stats["errors"] - stats["timeouts"]
+            providers[name] = {
+                "calls": int(stats["calls"]),
+                "errors": int(stats["errors"]),
+                "timeouts": int(stats["timeouts"]),
+                "mean_latency_ms": round(stats["total_ms"] / succeeded, 2) if succeeded > 0 else 0.0,
+            }
+        return {
+            "default_provider": self.default_provider,
+            "timeout_seconds": self.timeout,
+            "max_connections": self.max_connections,
+            "client_open": self._client is not None and not self._client.is_closed,
+            "providers": providers,
+        }
+
+
+def build_system_prompt(chatbot: ChatbotRuntime, user_context: Optional[Dict[str, Any]] = None) -> str:
+    """
+    System prompt from the chatbot's persona plus, when known, who the user
+    is and the summary of earlier turns
+    """
+    lines = [f"You are {chatbot.display_name}, a {chatbot.tone} assistant."]
+    if chatbot.description:
+        lines.append(chatbot.description)
+    if chatbot.faqs:
+        lines.append("Answer from these FAQs where they apply:")
+        lines.extend(f"Q: {question}\nA: {answer}" for question, answer in chatbot.faqs[:20])
+    if user_context:
+        profile = user_context.get("user_profile") or {}
+        name = " ".join(filter(None, [profile.get("first_name"), profile.get("last_name")]))
+        if name:
+            lines.append(f"You are talking to {name}.")
+        if user_context.get("conversation_summary"):
+            lines.append(f"Earlier in this conversation: {user_context['conversation_summary']}")
+    return "\n".join(lines)
+
+
+def build_messages(user_message: str, user_context: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+    """
+    The context's turns followed by user_message, unless the message was
+    already logged as the newest turn
+    """
+    turns = (user_context or {}).get("conversation_messages") or []
+    messages = [
+        {"role": turn["role"], "content": turn["content"]}
+        for turn in turns
+        if turn.get("role") in ("user", "assistant") and turn.get("content")
+    ]
+    if messages[-1:] != [{"role": "user", "content": user_message}]:
+        messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def _providers_from_env() -> Dict[str, LLMProvider]:
+    providers: Dict[str, LLMProvider] = {
+        "fake": FakeLLMProvider(
+            latency=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000,
+            jitter=float(os.getenv("FAKE_LLM_JITTER_MS", "0")) / 1000,
+        ),
+        "openai": OpenAICompatibleProvider(
+            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+            api_key=os.getenv("OPENAI_API_KEY", ""),
+            endpoints=json.loads(os.getenv("OPENAI_ENDPOINTS") or "{}"),
+        ),
+    }
+    gemini_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if gemini_key:
+        providers["gemini"] = GeminiProvider(model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"), api_key=gemini_key)
+    return providers
+
+
+llm_service = LLMService(
+    providers=_providers_from_env(),
+    default_provider=os.getenv("LLM_PROVIDER", "fake").lower(),
+    timeout=float(os.getenv("LLM_TIMEOUT", "15")),
+    max_tokens=int(os.getenv("LLM_MAX_TOKENS", "512")),
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+    max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+)
@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple
+from sqlalchemy import text
+from app.db.db_config import engine
+import time
+import os
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: float  # seconds until the next request would be allowed
+
+
+class RateLimit(NamedTuple):
+    rate: float  # sustained requests per second
+    burst: int   # requests allowed back to back
+
+
+class InMemoryRateLimitBackend:
+    """
+    Token bucket per key held in this process
+    Only correct for a single worker; buckets are LRU-bounded by max_keys
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(limit.burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        tokens = min(float(limit.burst), bucket[0] + (now - bucket[1]) * limit.rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return RateLimitResult(True, 0.0)
+
+        bucket[0] = tokens
+        return RateLimitResult(False, (1.0 - tokens) / limit.rate)
+
+    async def purge_expired(self, batch_size: int) -> int:
+        """
+        Nothing to purge: buckets are bounded by max_keys
+        """
+        return 0
+
+
+class PostgresRateLimitBackend:
+    """
+    Shared limiter for multi-worker deployments, one row per key in
+    rate_limit_buckets
+
+    The token bucket is stored in its GCRA form: a single "theoretical arrival
+    time" (tat) per key. One INSERT ... ON CONFLICT DO UPDATE both checks and
+    consumes a token, so concurrent workers cannot over-admit.
+    """
+
+    name = "postgres"
+
+    _HIT = text(
+        "WITH clock AS (SELECT extract(epoch FROM clock_timestamp())::float8 AS now) "
+        "INSERT INTO rate_limit_buckets (bucket_key, tat) "
+        "SELECT :key, clock.now + :interval FROM clock "
+        "ON CONFLICT (bucket_key) DO UPDATE "
+        "SET tat = GREATEST(rate_limit_buckets.tat + :interval, EXCLUDED.tat) "
+        "WHERE GREATEST(rate_limit_buckets.tat + :interval, EXCLUDED.tat) "
+        "- EXCLUDED.tat + :interval <= :window "
+        "RETURNING tat"
+    )
+    _RETRY_AFTER = text(
+        "SELECT tat + :interval - :window - extract(epoch FROM clock_timestamp())::float8 "
+        "FROM rate_limit_buckets WHERE bucket_key = :key"
+    )
+    _PURGE = text(
+        "DELETE FROM rate_limit_buckets WHERE bucket_key IN ("
+        "  SELECT bucket_key FROM rate_limit_buckets "
+        "  WHERE tat < extract(epoch FROM clock_timestamp())::float8 "
+        "  LIMIT :batch_size FOR UPDATE SKIP LOCKED"
+        ")"
+    )
+
+    async def hit(self, key: str, limit: RateLimit) -> RateLimitResult:
+        params = {
+            "key": key,
+            "interval": 1.0 / limit.rate,
+            "window": limit.burst / limit.rate,
+        }
+        async with engine.begin() as conn:
+            result = await conn.execute(self._HIT, params)
+            if result.first() is not None:
+                return RateLimitResult(True, 0.0)
+
+            # Denied: the row was left untouched, read it back for Retry-After
+            result = await conn.execute(self._RETRY_AFTER, params)
+            retry_after = result.scalar() or 0.0
+            return RateLimitResult(False, max(retry_after, 0.0))
+
+    async def purge_expired(self, batch_size: int) -> int:
+        """
+        Delete up to batch_size rows whose tat has passed: such a bucket is
+        full again, exactly as if it had no row
+        """
+        async with engine.begin() as conn:
+            result = await conn.execute(self._PURGE, {"batch_size": batch_size})
+            return result.rowcount
+
+
+class RateLimiter:
+    """
+    Applies named limits ("api_key", "chatbot", ...) through a backend and
+    counts allowed / limited requests per scope
+    """
+
+    def __init__(self, backend, limits: Dict[str, RateLimit]):
+        self.backend = backend
+        self.limits = limits
+        self.allowed: Dict[str, int] = {scope: 0 for scope in limits}
+        self.limited: Dict[str, int] = {scope: 0 for scope in limits}
+        self.errors = 0
+        self.purged = 0
+
+    async def hit(self, scope: str, key: str) -> RateLimitResult:
+        """
+        Consume one request for key under scope's limit
+        Fails open if the backend is unavailable
+        """
+        limit = self.limits.get(scope)
+        if limit is None or limit.rate <= 0:
+            return RateLimitResult(True, 0.0)
+
+        try:
+            result = await self.backend.hit(f"{scope}:{key}", limit)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error checking rate limit: {e}")
+            return RateLimitResult(True, 0.0)
+
+        if result.allowed:
+            self.allowed[scope] = self.allowed.get(scope, 0) + 1
+        else:
+            self.limited[scope] = self.limited.get(scope, 0) + 1
+        return result
+
+    async def purge_expired(self, batch_size: int = 1000, max_batches: int = 10) -> int:
+        """
+        Drop expired buckets in batches (called by the session sweeper)
+        """
+        total = 0
+        for _ in range(max_batches):
+            rows = await self.backend.purge_expired(batch_size)
+            total += rows
+            if rows < batch_size:
+                break
+        self.purged += total
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "limits": {
+                scope: {"per_minute": limit.rate * 60, "burst": limit.burst}
+                for scope, limit in self.limits.items()
+            },
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "errors": self.errors,
+            "purged": self.purged,
+        }
+
+
+def _limit_from_env(prefix: str, per_minute: str, burst: str) -> RateLimit:
+    return RateLimit(
+        rate=float(os.getenv(f"{prefix}_PER_MINUTE", per_minute)) / 60.0,
+        burst=int(os.getenv(f"{prefix}_BURST", burst)),
+    )
+
+
+def _backend_from_env():
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "postgres":
+        return PostgresRateLimitBackend()
+    return InMemoryRateLimitBackend()
+
+
+rate_limiter = RateLimiter(
+    backend=_backend_from_env(),
+    limits={
+        "api_key": _limit_from_env("RATE_LIMIT_API_KEY", "120", "20"),
+        "chatbot": _limit_from_env("RATE_LIMIT_CHATBOT", "600", "60"),
+        "visitor": _limit_from_env("RATE_LIMIT_VISITOR", "30", "10"),
+    },
+)
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from app.services.cache import TTLCache
+import re
+import os
+
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Cache key for a message: case-folded, punctuation stripped, whitespace
+    collapsed ("What are your HOURS?" == "what are your hours")
+    """
+    return " ".join(_PUNCTUATION.sub(" ", text.casefold()).split())
+
+
+class ResponseCache:
+    """
+    Per-chatbot cache of /chatbot/respond replies keyed on the normalized
+    message, so the questions widget traffic repeats all day are answered
+    without FAQ matching or the LLM
+
+    Each chatbot gets its own TTLCache (LRU + TTL) tagged with the config
+    version it was filled under; a lookup with a newer version (the runtime
+    cache rebuilt the chatbot) drops it. Chatbots themselves are kept in an
+    LRU of max_chatbots, and hit/miss counters stay per chatbot.
+    """
+
+    def __init__(
+        self,
+        maxsize_per_chatbot: int = 256,
+        ttl: float = 300.0,
+        max_chatbots: int = 1000,
+        max_message_chars: int = 500
+    ):
+        self.maxsize_per_chatbot = maxsize_per_chatbot
+        self.ttl = ttl
+        self.max_chatbots = max_chatbots
+        self.max_message_chars = max_message_chars
+        self._chatbots: "OrderedDict[str, list]" = OrderedDict()  # id -> [version, TTLCache]
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _entries(self, chatbot_id: str, version: Hashable) -> TTLCache:
+        entry = self._chatbots.get(chatbot_id)
+        if entry is None:
+            entry = self._chatbots[chatbot_id] = [version, TTLCache(self.maxsize_per_chatbot, self.ttl)]
+            while len(self._chatbots) > self.max_chatbots:
+                self._chatbots.popitem(last=False)
+                self.evictions += 1
+        elif entry[0] != version:
+            # Config changed: cached replies may quote old FAQs, keep the counters
+            entry[0] = version
+            entry[1].clear()
+            self.invalidations += 1
+        self._chatbots.move_to_end(chatbot_id)
+        return entry[1]
+
+    def key(self, text: str) -> Optional[str]:
+        """
+        Normalized cache key, or None for messages not worth caching
+        """
+        if len(text) > self.max_message_chars:
+            return None
+        return normalize_message(text) or None
+
+    def get(self, chatbot_id: str, version: Hashable, key: str) -> Any:
+        return self._entries(chatbot_id, version).get(key)
+
+    def set(self, chatbot_id: str, version: Hashable, key: str, value: Any) -> None:
+        self._entries(chatbot_id, version).set(key, value)
+
+    def chatbot_stats(self, chatbot_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._chatbots.get(chatbot_id)
+        return entry[1].stats() if entry is not None else None
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Totals plus per-chatbot counters for the top busiest chatbots
+        """
+        hits = sum(entry[1].hits for entry in self._chatbots.values())
+        misses = sum(entry[1].misses for entry in self._chatbots.values())
+        busiest = sorted(
+            self._chatbots.items(), key=lambda item: item[1][1].hits + item[1][1].misses, reverse=True
+        )[:top]
+        return {
+            "chatbots": len(self._chatbots),
+            "max_chatbots": self.max_chatbots,
+            "maxsize_per_chatbot": self.maxsize_per_chatbot,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "by_chatbot": {chatbot_id: entry[1].stats() for chatbot_id, entry in busiest},
+        }
+
+
+response_cache = ResponseCache(
+    maxsize_per_chatbot=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+    max_chatbots=int(os.getenv("RESPONSE_CACHE_CHATBOTS", "1000")),
+)
@@ -0,0 +1,172 @@
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from app.db.db_config import engine
+from app.services.activity_buffer import activity_buffer
+from app.services.context_cache import user_context_cache
+from app.services.rate_limiter import rate_limiter
+from datetime import datetime, timedelta
+import asyncio
+import time
+import os
+
+
+class SessionSweeper:
+    """
+    Background expiry for user_sessions
+
+    Every interval seconds, sessions idle for longer than idle_timeout are
+    marked inactive, and inactive sessions older than archive_after are moved
+    (with their conversation_messages) to user_sessions_archive. Both steps run
+    as bounded batches of batch_size rows, at most max_batches per step and
+    pass, each batch in its own short transaction. FOR UPDATE SKIP LOCKED lets
+    several workers sweep at once without blocking each other or the API.
+    Each pass also purges expired rate limit buckets the same way.
+    """
+
+    _DEACTIVATE = text(
+        "UPDATE user_sessions SET is_active = false "
+        "WHERE id IN ("
+        "  SELECT id FROM user_sessions "
+        "  WHERE is_active AND last_activity < :cutoff "
+        "  ORDER BY last_activity LIMIT :batch_size "
+        "  FOR UPDATE SKIP LOCKED"
+        ") "
+        "RETURNING coalesce(user_id, visitor_id)"
+    )
+    # Statements in one WITH share a snapshot, so the messages are still
+    # visible to the INSERT although the DELETE cascades to them
+    _ARCHIVE = text(
+        "WITH moved AS ("
+        "  DELETE FROM user_sessions "
+        "  WHERE id IN ("
+        "    SELECT id FROM user_sessions "
+        "    WHERE NOT is_active AND last_activity < :cutoff "
+        "    ORDER BY last_activity LIMIT :batch_size "
+        "    FOR UPDATE SKIP LOCKED"
+        "  ) "
+        "  RETURNING id, user_id, visitor_id, session_data, context_data, summary, created_at, last_activity"
+        ") "
+        "INSERT INTO user_sessions_archive "
+        "(id, user_id, visitor_id, session_data, context_data, summary, messages, created_at, last_activity, archived_at) "
+        "SELECT moved.id, moved.user_id, moved.visitor_id, moved.session_data, moved.context_data, moved.summary, "
+        "  (SELECT json_agg(json_build_object("
+        "     'role', m.role, 'content', m.content, 'created_at', m.created_at) ORDER BY m.id) "
+        "   FROM conversation_messages m WHERE m.session_id = moved.id), "
+        "  moved.created_at, moved.last_activity, :now "
+        "FROM moved"
+    )
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        idle_timeout: float = 1800.0,
+        archive_after: float = 7 * 24 * 3600.0,
+        batch_size: int = 1000,
+        max_batches: int = 10
+    ):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.failed_passes = 0
+        self.deactivated = 0
+        self.archived = 0
+        self.last_pass: Dict[str, Any] = {}
+
+    async def sweep(self) -> Dict[str, Any]:
+        """
+        Run one pass and return how many rows it touched
+        """
+        started = time.perf_counter()
+        # Pending last_activity touches must land first, or a busy session
+        # could look idle
+        await activity_buffer.flush()
+
+        now = datetime.utcnow()
+        deactivated = await self._run_batches(
+            self._DEACTIVATE, now - timedelta(seconds=self.idle_timeout), now
+        )
+        archived = await self._run_batches(
+            self._ARCHIVE, now - timedelta(seconds=self.archive_after), now
+        )
+        buckets_purged = await rate_limiter.purge_expired(self.batch_size, self.max_batches)
+
+        self.passes += 1
+        self.deactivated += deactivated
+        self.archived += archived
+        self.last_pass = {
+            "deactivated": deactivated,
+            "archived": archived,
+            "rate_limit_buckets_purged": buckets_purged,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        if deactivated or archived:
+            print(f"Session sweep: {deactivated} deactivated, {archived} archived")
+        return self.last_pass
+
+    async def _run_batches(self, statement, cutoff: datetime, now: datetime) -> int:
+        total = 0
+        params = {"cutoff": cutoff, "batch_size": self.batch_size, "now": now}
+        for _ in range(self.max_batches):
+            async with engine.begin() as conn:
+                result = await conn.execute(statement, params)
+                user_ids = result.scalars().all() if result.returns_rows else []
+                rows = len(user_ids) if result.returns_rows else result.rowcount
+            # A cached context may still point at a session that was just closed
+            for user_id in set(user_ids):
+                user_context_cache.invalidate(user_id)
+            total += rows
+            if rows < self.batch_size:
+                break
+        return total
+
+    def start(self) -> None:
+        """
+        Start the periodic sweep loop (called from the app lifespan)
+        """
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.failed_passes += 1
+                print(f"Error sweeping user sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "failed_passes": self.failed_passes,
+            "deactivated": self.deactivated,
+            "archived": self.archived,
+            "last_pass": self.last_pass,
+            "interval_seconds": self.interval,
+            "idle_timeout_seconds": self.idle_timeout,
+            "archive_after_seconds": self.archive_after,
+            "batch_size": self.batch_size,
+        }
+
+
+session_sweeper = SessionSweeper(
+    interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "60")),
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "1800")),
+    archive_after=float(os.getenv("SESSION_ARCHIVE_AFTER", str(7 * 24 * 3600))),
+    batch_size=int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "1000")),
+    max_batches=int(os.getenv("SESSION_SWEEP_MAX_BATCHES", "10")),
+)
@@ -0,0 +1,191 @@
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+from app.services.faq_search import tokenize
+import numpy as np
+import hashlib
+import math
+
+
+class HashingEmbedder:
+    """
+    Local text embeddings without a model, network or GPU
+
+    Word unigrams and bigrams (faq_search.tokenize) are hashed with blake2b
+    onto `nonzeros` signed coordinates of a dim-sized vector, i.e. a sparse
+    random projection of the hashed feature space, weighted by 1 + log(tf)
+    and L2-normalized. Nothing is fitted, so every worker and every rebuild
+    maps the same text to the same vector.
+    """
+
+    def __init__(self, dim: int = 256, nonzeros: int = 4, seed: int = 0):
+        self.dim = dim
+        self.nonzeros = nonzeros
+        self._key = seed.to_bytes(8, "little")
+        self._feature = lru_cache(maxsize=200_000)(self._hash_feature)
+
+    def _hash_feature(self, feature: str) -> Tuple[np.ndarray, np.ndarray]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=4 * self.nonzeros, key=self._key).digest()
+        words = np.frombuffer(digest, dtype="<u4")
+        return (words % self.dim).astype(np.int64), np.where(words >> 31, 1.0, -1.0)
+
+    def features(self, text: str) -> Counter:
+        tokens = tokenize(text)
+        return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        float32 matrix of shape (len(texts), dim); texts without features
+        get a zero row
+        """
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        for row, text in enumerate(texts):
+            for feature, tf in self.features(text).items():
+                positions, signs = self._feature(feature)
+                rows.append(np.full(len(positions), row, dtype=np.int64))
+                cols.append(positions)
+                values.append(signs * (1.0 + math.log(tf)))
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            flat = np.concatenate(rows) * self.dim + np.concatenate(cols)
+            vectors += np.bincount(flat, np.concatenate(values), minlength=vectors.size).reshape(vectors.shape)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class FlatEmbeddingIndex:
+    """
+    Exact cosine top-k over a (possibly memory-mapped) matrix of unit vectors
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, version: str):
+        self.vectors = vectors
+        self.ids = ids
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        return self.search_batch(query[None, :], top_k)[0]
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        if not len(self.ids):
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.vectors.T  # (queries, rows)
+        k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, columns in zip(scores, top):
+            columns = columns[np.argsort(-row[columns], kind="stable")]
+            results.append([(int(self.ids[c]), float(row[c])) for c in columns])
+        return results
+
+
+def train_kmeans(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 8,
+    sample_per_list: int = 32,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Spherical k-means centroids (unit rows) trained on a random sample of at
+    most sample_per_list * nlist rows; empty lists are re-seeded
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, sample_per_list * nlist)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        sizes = np.bincount(assignments, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        sums = np.zeros_like(centroids)
+        filled = sizes > 0
+        sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+        sums[~filled] = sample[rng.choice(sample_size, int((~filled).sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+def build_ivf_lists(
+    vectors: np.ndarray,
+    nlist: int,
+    batch_rows: int = 65536
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (centroids, order, offsets): rows order[offsets[l]:offsets[l + 1]]
+    form inverted list l
+    """
+    centroids = train_kmeans(vectors, nlist)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_rows):
+        assignments[start:start + batch_rows] = np.argmax(vectors[start:start + batch_rows] @ centroids.T, axis=1)
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.searchsorted(assignments[order], np.arange(nlist + 1)).astype(np.int64)
+    return centroids, order, offsets
+
+
+class IVFEmbeddingIndex:
+    """
+    Inverted-file approximate top-k for large corpora
+
+    Rows are stored grouped by their nearest k-means centroid, so each
+    inverted list is one contiguous slice of the (memory-mapped) matrix. A
+    query scores the centroids, then only the rows of the nprobe best lists:
+    raising nprobe trades latency for recall, up to exact at nprobe = nlist.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        version: str,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        nprobe: int = 8
+    ):
+        self.vectors = vectors
+        self.ids = ids
+        self.version = version
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        return self.search_batch(query[None, :], top_k, nprobe)[0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        top_k: int = 5,
+        nprobe: Optional[int] = None
+    ) -> List[List[Tuple[int, float]]]:
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            if not len(rows):
+                results.append([])
+                continue
+            # Sorted rows read the memory map front to back
+            rows.sort()
+            scores = self.vectors[rows] @ query
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(int(self.ids[rows[i]]), float(scores[i])) for i in top])
+        return results
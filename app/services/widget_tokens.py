@@ -0,0 +1,71 @@
+from typing import Any, Dict, Optional, Tuple
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+# Short-lived, stateless credentials for the embeddable widget.
+# A token binds a visitor to a chatbot_id and is verified with HMAC only,
+# so /chatbot/respond does not need a DB round trip to trust the chatbot id.
+_secret = os.getenv("WIDGET_TOKEN_SECRET") or os.getenv("SECRET_KEY")
+if not _secret:
+    print("WIDGET_TOKEN_SECRET is not set: using a random per-process secret, "
+          "widget tokens will not survive restarts or work across workers")
+    _secret = secrets.token_hex(32)
+WIDGET_TOKEN_SECRET = _secret.encode("utf-8")
+
+WIDGET_TOKEN_TTL = int(os.getenv("WIDGET_TOKEN_TTL", "900"))
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(WIDGET_TOKEN_SECRET, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_widget_token(
+    chatbot_id: str,
+    visitor_id: str,
+    ttl: Optional[int] = None
+) -> Tuple[str, int]:
+    """
+    Create a signed token for a visitor of a chatbot
+    Returns (token, expires_at) where expires_at is a unix timestamp
+    """
+    expires_at = int(time.time()) + (ttl or WIDGET_TOKEN_TTL)
+    claims = {"cid": chatbot_id, "vid": visitor_id, "exp": expires_at}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def verify_widget_token(token: str, chatbot_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return the token claims if the signature is valid, it has not expired and
+    (when given) it was issued for chatbot_id; otherwise None
+    """
+    try:
+        payload, signature = token.split(".", 1)
+    except (AttributeError, ValueError):
+        return None
+
+    try:
+        if not hmac.compare_digest(_sign(payload), signature):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (TypeError, ValueError):
+        return None
+
+    if claims.get("exp", 0) < time.time():
+        return None
+    if chatbot_id is not None and claims.get("cid") != chatbot_id:
+        return None
+    return claims
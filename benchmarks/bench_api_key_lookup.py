@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: API key lookup latency against a large api_keys-shaped table
+Compares the old unindexed lookup (sequential scan) with the point lookup on
+the unique key_hash index that validate_api_key now uses.
+
+Runs against DATABASE_URL (PostgreSQL) inside a TEMP table, so nothing is left
+behind:
+
+    python -m benchmarks.bench_api_key_lookup --keys 1000000 --lookups 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from dotenv import load_dotenv
+
+from app.services.auth_service import AuthService
+
+load_dotenv()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    print(
+        f"{label:<22} p50={percentile(samples, 50) * 1000:8.3f} ms  "
+        f"p99={percentile(samples, 99) * 1000:8.3f} ms  "
+        f"mean={statistics.mean(samples) * 1000:8.3f} ms  "
+        f"(n={len(samples)})"
+    )
+
+
+async def time_lookups(conn, digests):
+    query = text("SELECT id, chatbot_id, revoked FROM bench_api_keys WHERE key_hash = :key_hash")
+    samples = []
+    for digest in digests:
+        start = time.perf_counter()
+        result = await conn.execute(query, {"key_hash": digest})
+        result.first()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(keys: int, lookups: int, scan_lookups: int):
+    engine = create_async_engine(os.getenv("DATABASE_URL"))
+    async with engine.connect() as conn:
+        print(f"🔧 Creating TEMP table with {keys:,} keys...")
+        await conn.execute(text(
+            "CREATE TEMP TABLE bench_api_keys ("
+            " id serial PRIMARY KEY,"
+            " chatbot_id varchar,"
+            " key_hash varchar(64) NOT NULL,"
+            " revoked boolean DEFAULT false)"
+        ))
+        start = time.perf_counter()
+        await conn.execute(text(
+            "INSERT INTO bench_api_keys (chatbot_id, key_hash) "
+            "SELECT 'bench', encode(sha256(convert_to('bench-key-' || g, 'UTF8')), 'hex') "
+            "FROM generate_series(1, :n) AS g"
+        ), {"n": keys})
+        await conn.execute(text("ANALYZE bench_api_keys"))
+        print(f"   loaded in {time.perf_counter() - start:.1f}s")
+
+        # Digests computed client-side exactly like validate_api_key does
+        sample = [
+            AuthService.hash_api_key(f"bench-key-{random.randint(1, keys)}")
+            for _ in range(lookups)
+        ]
+
+        print("🔍 Unindexed lookup (old schema)...")
+        scan = await time_lookups(conn, sample[:scan_lookups])
+
+        start = time.perf_counter()
+        await conn.execute(text("CREATE UNIQUE INDEX ON bench_api_keys (key_hash)"))
+        await conn.execute(text("ANALYZE bench_api_keys"))
+        print(f"🔍 Indexed lookup (index built in {time.perf_counter() - start:.1f}s)...")
+        indexed = await time_lookups(conn, sample)
+        await conn.rollback()
+
+    await engine.dispose()
+
+    print()
+    report("seq scan", scan)
+    report("unique index", indexed)
+    print(f"speedup (p50): {percentile(scan, 50) / percentile(indexed, 50):.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=50,
+                        help="lookups to time without the index (each one is a full scan)")
+    args = parser.parse_args()
+    asyncio.run(main(args.keys, args.lookups, args.scan_lookups))
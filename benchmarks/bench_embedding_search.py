@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: semantic search over a chatbot's knowledge embeddings
+Compares the exhaustive FlatEmbeddingIndex with the IVFEmbeddingIndex used
+above EMBEDDING_IVF_THRESHOLD rows, on synthetic clustered unit vectors:
+build time, queries per second and recall@k against the exact top-k for a
+range of nprobe values. No database needed:
+
+    python benchmarks/bench_embedding_search.py --rows 200000 --nprobe 1 2 4 8 16 32
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.vector_index import FlatEmbeddingIndex, IVFEmbeddingIndex, build_ivf_lists
+
+
+def make_vectors(rows, dim, topics, spread, rng):
+    # Chunks of the same document / topic sit close together, like real text;
+    # a larger spread blurs the topics and makes the lists harder to probe
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, rows)] + spread * rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def run(index, queries, top_k, **kwargs):
+    start = time.perf_counter()
+    results = [index.search(query, top_k, **kwargs) for query in queries]
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+def recall(results, truth):
+    hits = sum(len({i for i, _ in got} & {i for i, _ in want}) for got, want in zip(results, truth))
+    return hits / sum(len(want) for want in truth)
+
+
+def main(rows, dim, topics, spread, queries, top_k, nlist, nprobes, seed):
+    rng = np.random.default_rng(seed)
+    vectors = make_vectors(rows, dim, topics, spread, rng)
+    ids = np.arange(rows, dtype=np.int64)
+    # Queries: stored rows plus noise of norm ~0.5 (cosine ~0.9 to their row)
+    noise = rng.standard_normal((queries, dim)).astype(np.float32) * (0.5 / math.sqrt(dim))
+    queries_matrix = vectors[rng.integers(0, rows, queries)] + noise
+    queries_matrix /= np.linalg.norm(queries_matrix, axis=1, keepdims=True)
+
+    print(f"{rows} rows x {dim} dims, {topics} topics (spread {spread}), {queries} queries, recall@{top_k}")
+    flat = FlatEmbeddingIndex(vectors, ids, "bench")
+    truth, qps = run(flat, queries_matrix, top_k)
+    print(f"flat            build=     0.0 s  qps={qps:8.0f}  recall=100.0%")
+
+    nlist = nlist or int(2 * math.sqrt(rows))
+    start = time.perf_counter()
+    centroids, order, offsets = build_ivf_lists(vectors, nlist)
+    ivf = IVFEmbeddingIndex(vectors[order], ids[order], "bench", centroids, offsets)
+    build = time.perf_counter() - start
+    for nprobe in nprobes:
+        results, qps = run(ivf, queries_matrix, top_k, nprobe=nprobe)
+        print(
+            f"ivf nlist={nlist:<5} nprobe={nprobe:<3} build={build:5.1f} s  "
+            f"qps={qps:8.0f}  recall={recall(results, truth):6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=1.0)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = 2 * sqrt(rows), as in the service")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.rows, args.dim, args.topics, args.spread, args.queries, args.top_k, args.nlist, args.nprobe, args.seed)
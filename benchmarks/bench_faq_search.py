@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: FAQ lookup used by /chatbot/respond
+Builds each matcher (BM25 FAQIndex, NumPy TfidfFAQIndex, TrigramFAQIndex)
+over synthetic FAQs and times index construction, single-query latency and
+batch throughput, then reports top-1 accuracy on misspelled questions and
+the cost of editing one FAQ in place (sync) versus a rebuild.
+No database needed:
+
+    python benchmarks/bench_faq_search.py --faqs 5000 --queries 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.faq_search import FAQ_MATCHERS
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def make_faqs(count, vocabulary, rng):
+    # Zipf-like word frequencies, like natural text
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    faqs = []
+    for _ in range(count):
+        question = " ".join(rng.choices(vocabulary, weights, k=rng.randint(5, 12))) + "?"
+        answer = " ".join(rng.choices(vocabulary, weights, k=rng.randint(15, 40))) + "."
+        faqs.append((question, answer))
+    return faqs
+
+
+def misspell(word, rng):
+    # One swap, deletion or substitution, like a hurried typist
+    if len(word) < 4:
+        return word
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == 1:
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+
+
+def main(faq_count, queries, vocabulary_size, batch_size, seed):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    faqs = make_faqs(faq_count, vocabulary, rng)
+
+    # Queries: a few words of a random FAQ question plus some noise
+    texts = []
+    for _ in range(queries):
+        words = rng.choice(faqs)[0].rstrip("?").split()
+        texts.append(" ".join(rng.sample(words, min(len(words), 4)) + rng.choices(vocabulary, k=2)))
+
+    # Misspelled questions: every word of the question gets one typo
+    typo_targets = [rng.randrange(len(faqs)) for _ in range(min(queries, 2000))]
+    typo_texts = [
+        " ".join(misspell(word, rng) for word in faqs[target][0].rstrip("?").split())
+        for target in typo_targets
+    ]
+
+    print(f"{faq_count} FAQs, vocabulary {vocabulary_size}, {queries} queries")
+    for name, matcher in FAQ_MATCHERS.items():
+        start = time.perf_counter()
+        index = matcher(faqs)
+        build = time.perf_counter() - start
+
+        samples = []
+        for text in texts:
+            start = time.perf_counter()
+            index.best(text)
+            samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, len(texts), batch_size):
+            index.search_batch(texts[offset:offset + batch_size])
+        batch = time.perf_counter() - start
+
+        correct = 0
+        for target, text in zip(typo_targets, typo_texts):
+            match = index.best(text)
+            correct += match is not None and match.index == target
+
+        # Single-FAQ edits, as the FAQ edit endpoints apply them
+        current = list(faqs)
+        edits = []
+        for _ in range(50):
+            current[rng.randrange(len(current))] = make_faqs(1, vocabulary, rng)[0]
+            edited = tuple(current)
+            start = time.perf_counter()
+            index.sync(edited)
+            edits.append(time.perf_counter() - start)
+
+        print(
+            f"{name:<6} build={build * 1000:7.1f} ms  "
+            f"query p50={percentile(samples, 50) * 1e6:7.1f} us  "
+            f"p99={percentile(samples, 99) * 1e6:7.1f} us  "
+            f"mean={statistics.mean(samples) * 1e6:7.1f} us  "
+            f"batch({batch_size})={len(texts) / batch:9.0f} msg/s  "
+            f"typo top-1={correct / len(typo_texts):6.1%}  "
+            f"edit p50={percentile(edits, 50) * 1000:5.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faqs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.faqs, args.queries, args.vocabulary, args.batch_size, args.seed)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: DB work in front of /chatbot/{chatbot_id}/query
+Compares the old sequential path (SELECT api key, UPDATE last_used + COMMIT,
+SELECT chatbot) with the single api_keys LEFT JOIN chatbots statement used by
+AuthService.validate_api_key_with_chatbot. In-process caches are bypassed so
+only the database path is measured.
+
+Needs a migrated and seeded DATABASE_URL (PostgreSQL):
+
+    python benchmarks/bench_query_auth.py --iterations 5000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import select, update
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.db.models import APIKey, Chatbot
+from app.services.auth_service import AuthService
+
+# Keep SQL logging from dominating the measurement
+engine.echo = False
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    print(
+        f"{label:<26} p50={percentile(samples, 50) * 1000:7.3f} ms  "
+        f"p99={percentile(samples, 99) * 1000:7.3f} ms  "
+        f"mean={statistics.mean(samples) * 1000:7.3f} ms  "
+        f"(n={len(samples)})"
+    )
+
+
+async def sequential_path(db, key_hash):
+    result = await db.execute(select(APIKey).where(APIKey.key_hash == key_hash))
+    api_key = result.scalar_one_or_none()
+    await db.execute(
+        update(APIKey).where(APIKey.id == api_key.id).values(last_used=datetime.utcnow())
+    )
+    await db.commit()
+    result = await db.execute(select(Chatbot).where(Chatbot.id == api_key.chatbot_id))
+    return api_key, result.scalar_one_or_none()
+
+
+async def joined_path(db, key_hash):
+    result = await db.execute(
+        select(APIKey, Chatbot)
+        .outerjoin(Chatbot, Chatbot.id == APIKey.chatbot_id)
+        .where(APIKey.key_hash == key_hash)
+    )
+    row = result.first()
+    await db.rollback()  # end the read transaction, like the request session does
+    return row
+
+
+async def measure(fn, key_hash, iterations, warmup):
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for i in range(iterations + warmup):
+            start = time.perf_counter()
+            await fn(db, key_hash)
+            if i >= warmup:
+                samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(raw_key: str, iterations: int, warmup: int):
+    key_hash = AuthService.hash_api_key(raw_key)
+    async with AsyncSessionLocal() as db:
+        if not (await joined_path(db, key_hash)):
+            print(f"❌ API key {raw_key!r} not found - run migrations and `python -m app.seed_data` first")
+            return
+
+    print(f"🔍 {iterations} iterations per path ({warmup} warmup)...")
+    before = await measure(sequential_path, key_hash, iterations, warmup)
+    after = await measure(joined_path, key_hash, iterations, warmup)
+    await engine.dispose()
+
+    print()
+    report("before: 3 round trips", before)
+    report("after: 1 joined SELECT", after)
+    print(f"p50 speedup: {percentile(before, 50) / percentile(after, 50):.1f}x, "
+          f"p99 speedup: {percentile(before, 99) / percentile(after, 99):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-key", default="sample_api_key_123")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.api_key, args.iterations, args.warmup))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Load test: /chatbot/respond end to end against a running server
+Sends requests from a pool of concurrent clients, cycling through distinct
+messages (fewer distinct messages -> more response cache hits), and reports
+throughput and latency percentiles. Each client is a widget visitor with its
+own X-Widget-Token. Start the server with the fake LLM provider to run fully
+offline, and with rate limits high enough for the load, e.g.
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=200 RATE_LIMIT_CHATBOT_PER_MINUTE=1000000 \
+        RATE_LIMIT_CHATBOT_BURST=10000 RATE_LIMIT_VISITOR_PER_MINUTE=1000000 \
+        RATE_LIMIT_VISITOR_BURST=10000 uvicorn app.main:app
+    python benchmarks/bench_respond_load.py --chatbot-id <id> --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(base_url, chatbot_id, requests, concurrency, distinct):
+    messages = [f"Tell me about product number {i}" for i in range(distinct)]
+    samples = []
+    errors = 0
+    next_request = 0
+
+    async def worker(client):
+        nonlocal next_request, errors
+        session = await client.post(f"/chatbot/{chatbot_id}/session")
+        session.raise_for_status()
+        headers = {"X-Widget-Token": session.json()["token"]}
+        while next_request < requests:
+            message = messages[next_request % distinct]
+            next_request += 1
+            start = time.perf_counter()
+            response = await client.post(
+                "/chatbot/respond", json={"chatbot_id": chatbot_id, "message": message}, headers=headers
+            )
+            samples.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    metrics = httpx.get(f"{base_url}/metrics/chatbots/{chatbot_id}").json()
+    cache = metrics.get("response_cache") or {}
+    print(f"{requests} requests, concurrency {concurrency}, {distinct} distinct messages")
+    print(
+        f"throughput={requests / elapsed:8.1f} req/s  "
+        f"p50={percentile(samples, 50) * 1000:7.1f} ms  "
+        f"p99={percentile(samples, 99) * 1000:7.1f} ms  "
+        f"mean={statistics.mean(samples) * 1000:7.1f} ms  "
+        f"errors={errors}  "
+        f"response cache hit ratio={cache.get('hit_ratio', 0.0):.1%}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--chatbot-id", required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.chatbot_id, args.requests, args.concurrency, args.distinct))
@@ -44,11 +44,46 @@ export const createChatbot = async (data: CreateChatbotRequest): Promise<CreateC
   }
 }
 
+interface WidgetSession {
+  token: string
+  visitor_id: string
+  expires_at: number
+}
+
+// Signed widget session per chatbot: one visitor id for the page's lifetime,
+// and a token reused until shortly before it expires
+const widgetSessions = new Map<string, WidgetSession>()
+const pendingSessions = new Map<string, Promise<WidgetSession>>()
+
+const getWidgetSession = (chatbotId: string): Promise<WidgetSession> => {
+  const session = widgetSessions.get(chatbotId)
+  if (session && session.expires_at * 1000 - Date.now() > 30000) {
+    return Promise.resolve(session)
+  }
+  // Concurrent sends share one refresh
+  let pending = pendingSessions.get(chatbotId)
+  if (!pending) {
+    pending = apiClient
+      .post<WidgetSession>(`/chatbot/${chatbotId}/session`, { visitor_id: session?.visitor_id })
+      .then(response => {
+        widgetSessions.set(chatbotId, response.data)
+        return response.data
+      })
+      .finally(() => pendingSessions.delete(chatbotId))
+    pendingSessions.set(chatbotId, pending)
+  }
+  return pending
+}
+
 /**
  * Send a message to a chatbot and get a response
  */
 export const sendMessage = async (data: ChatRequest): Promise<ChatResponse> => {
-  const response = await apiClient.post<ChatResponse>('/chatbot/respond', data)
+  // Answers from the LLM need a signed widget session token
+  const session = await getWidgetSession(data.chatbot_id)
+  const response = await apiClient.post<ChatResponse>('/chatbot/respond', data, {
+    headers: { 'X-Widget-Token': session.token },
+  })
   return response.data
 }
 
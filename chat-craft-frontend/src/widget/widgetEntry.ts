@@ -24,6 +24,7 @@ class ChatbotWidget {
   private container: HTMLElement | null = null
   private chatWindow: HTMLElement | null = null
   private isLoading = false
+  private widgetToken: { token: string; visitorId: string; expiresAt: number } | null = null
 
   constructor(config: WidgetConfig) {
     this.config = {
@@ -356,6 +357,26 @@ class ChatbotWidget {
     }
   }
 
+  // Signed session token for /chatbot/respond, reused until shortly before it expires
+  private async getWidgetToken(): Promise<string> {
+    if (this.widgetToken && this.widgetToken.expiresAt * 1000 - Date.now() > 30000) {
+      return this.widgetToken.token
+    }
+    const response = await fetch(`${this.config.apiBaseUrl}/chatbot/${this.config.chatbotId}/session`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ visitor_id: this.widgetToken?.visitorId })
+    })
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`)
+    }
+    const data = await response.json()
+    this.widgetToken = { token: data.token, visitorId: data.visitor_id, expiresAt: data.expires_at }
+    return data.token
+  }
+
   public async sendMessage() {
     const input = document.getElementById(`chatbot-input-${this.config.chatbotId}`) as HTMLInputElement
     const messagesContainer = document.getElementById(`chatbot-messages-${this.config.chatbotId}`)
@@ -379,6 +400,7 @@ class ChatbotWidget {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Widget-Token': await this.getWidgetToken(),
         },
         body: JSON.stringify({
           chatbot_id: this.config.chatbotId,
@@ -0,0 +1,33 @@
+"""Index active user sessions by user and last activity
+
+Revision ID: 11da62cca1a7
+Revises: bd699f66b62a
+Create Date: 2026-10-17 00:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '11da62cca1a7'
+down_revision: Union[str, Sequence[str], None] = 'bd699f66b62a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_user_sessions_user_active_last_activity',
+        'user_sessions',
+        ['user_id', 'is_active', sa.text('last_activity DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_sessions_user_active_last_activity', table_name='user_sessions')
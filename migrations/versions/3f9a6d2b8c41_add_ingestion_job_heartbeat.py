@@ -0,0 +1,34 @@
+"""Add ingestion_jobs heartbeat
+
+Revision ID: 3f9a6d2b8c41
+Revises: f2b6c8d04a19
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6d2b8c41'
+down_revision: Union[str, Sequence[str], None] = 'f2b6c8d04a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingestion_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    # Unfinished jobs by heartbeat, for the stale job check
+    op.create_index(
+        'ix_ingestion_jobs_unfinished_heartbeat_at', 'ingestion_jobs', ['heartbeat_at'],
+        unique=False, postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ingestion_jobs_unfinished_heartbeat_at', table_name='ingestion_jobs')
+    op.drop_column('ingestion_jobs', 'heartbeat_at')
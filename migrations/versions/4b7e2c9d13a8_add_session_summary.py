@@ -0,0 +1,30 @@
+"""Add rolling conversation summary to user sessions
+
+Revision ID: 4b7e2c9d13a8
+Revises: 960caf7efc9f
+Create Date: 2026-10-17 01:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2c9d13a8'
+down_revision: Union[str, Sequence[str], None] = '960caf7efc9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('user_sessions', sa.Column('summary_through_id', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_sessions', 'summary_through_id')
+    op.drop_column('user_sessions', 'summary')
@@ -0,0 +1,43 @@
+"""Add user sessions archive and sweeper index
+
+Revision ID: 7c3a91e5f2d4
+Revises: 4b7e2c9d13a8
+Create Date: 2026-10-17 02:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3a91e5f2d4'
+down_revision: Union[str, Sequence[str], None] = '4b7e2c9d13a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_sessions_archive',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.Column('session_data', sa.JSON(), nullable=True),
+    sa.Column('context_data', sa.Text(), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('messages', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('last_activity', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_sessions_archive_user_id'), 'user_sessions_archive', ['user_id'], unique=False)
+    op.create_index('ix_user_sessions_is_active_last_activity', 'user_sessions', ['is_active', 'last_activity'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_sessions_is_active_last_activity', table_name='user_sessions')
+    op.drop_index(op.f('ix_user_sessions_archive_user_id'), table_name='user_sessions_archive')
+    op.drop_table('user_sessions_archive')
@@ -0,0 +1,50 @@
+"""Add append-only conversation messages
+
+Revision ID: 960caf7efc9f
+Revises: 11da62cca1a7
+Create Date: 2026-10-17 00:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '960caf7efc9f'
+down_revision: Union[str, Sequence[str], None] = '11da62cca1a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('conversation_messages',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('session_id', sa.String(), nullable=False),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['user_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_conversation_messages_session_id_id', 'conversation_messages', ['session_id', 'id'], unique=False)
+
+    # Split each legacy context_data blob into one message per non-empty line,
+    # keeping line order (ids are assigned in ORDER BY order)
+    op.execute(
+        "INSERT INTO conversation_messages (session_id, role, content, created_at) "
+        "SELECT s.id, 'user', t.line, COALESCE(s.last_activity, s.created_at, now()) "
+        "FROM user_sessions s, "
+        "LATERAL unnest(string_to_array(s.context_data, E'\\n')) WITH ORDINALITY AS t(line, n) "
+        "WHERE s.context_data IS NOT NULL AND btrim(t.line) <> '' "
+        "ORDER BY s.id, t.n"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # user_sessions.context_data is left untouched by upgrade, so nothing to restore
+    op.drop_index('ix_conversation_messages_session_id_id', table_name='conversation_messages')
+    op.drop_table('conversation_messages')
@@ -0,0 +1,47 @@
+"""Allow only one active session per user
+
+Revision ID: a2e8d4f61b07
+Revises: 7c3a91e5f2d4
+Create Date: 2026-10-17 02:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2e8d4f61b07'
+down_revision: Union[str, Sequence[str], None] = '7c3a91e5f2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the newest active session per user, deactivate the duplicates
+    op.execute(
+        """
+        UPDATE user_sessions SET is_active = false
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id
+                    ORDER BY last_activity DESC NULLS LAST, created_at DESC NULLS LAST, id DESC
+                ) AS rn
+                FROM user_sessions
+                WHERE is_active
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+    op.create_index('uq_user_sessions_active_user_id', 'user_sessions', ['user_id'], unique=True, postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_user_sessions_user_active_last_activity', table_name='user_sessions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_user_sessions_user_active_last_activity', 'user_sessions', ['user_id', 'is_active', sa.text('last_activity DESC')], unique=False)
+    op.drop_index('uq_user_sessions_active_user_id', table_name='user_sessions')
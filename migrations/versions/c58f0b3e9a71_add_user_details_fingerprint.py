@@ -0,0 +1,28 @@
+"""Add user details fingerprint
+
+Revision ID: c58f0b3e9a71
+Revises: a2e8d4f61b07
+Create Date: 2026-10-17 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58f0b3e9a71'
+down_revision: Union[str, Sequence[str], None] = 'a2e8d4f61b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('details_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'details_fingerprint')
@@ -0,0 +1,43 @@
+"""Hash API keys and index key_hash
+
+Revision ID: d11a87a62085
+Revises: 987180427bb0
+Create Date: 2026-10-16 23:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd11a87a62085'
+down_revision: Union[str, Sequence[str], None] = '987180427bb0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows hold the raw key; replace it with its SHA-256 hex digest
+    # (same value AuthService.hash_api_key computes for the X-API-Key header)
+    op.execute(
+        "UPDATE api_keys "
+        "SET key_hash = encode(sha256(convert_to(key_hash, 'UTF8')), 'hex')"
+    )
+    op.alter_column('api_keys', 'key_hash',
+               existing_type=sa.String(),
+               type_=sa.String(length=64),
+               existing_nullable=False)
+    op.create_index(op.f('ix_api_keys_key_hash'), 'api_keys', ['key_hash'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The digests are kept: raw keys cannot be recovered from them
+    op.drop_index(op.f('ix_api_keys_key_hash'), table_name='api_keys')
+    op.alter_column('api_keys', 'key_hash',
+               existing_type=sa.String(length=64),
+               type_=sa.String(),
+               existing_nullable=False)
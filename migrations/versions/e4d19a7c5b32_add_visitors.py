@@ -0,0 +1,56 @@
+"""Add visitors with their own sessions
+
+Revision ID: e4d19a7c5b32
+Revises: c58f0b3e9a71
+Create Date: 2026-10-17 04:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d19a7c5b32'
+down_revision: Union[str, Sequence[str], None] = 'c58f0b3e9a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('visitors',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('chatbot_id', sa.String(), nullable=False),
+    sa.Column('external_id', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('first_name', sa.String(), nullable=True),
+    sa.Column('last_name', sa.String(), nullable=True),
+    sa.Column('company', sa.String(), nullable=True),
+    sa.Column('role', sa.String(), nullable=True),
+    sa.Column('preferences', sa.JSON(), nullable=True),
+    sa.Column('profile_data', sa.Text(), nullable=True),
+    sa.Column('details_fingerprint', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_visitors_chatbot_id_external_id', 'visitors', ['chatbot_id', 'external_id'], unique=True)
+    op.add_column('user_sessions', sa.Column('visitor_id', sa.String(), nullable=True))
+    op.create_foreign_key('user_sessions_visitor_id_fkey', 'user_sessions', 'visitors', ['visitor_id'], ['id'])
+    op.create_index('uq_user_sessions_active_visitor_id', 'user_sessions', ['visitor_id'], unique=True, postgresql_where=sa.text('is_active'))
+    op.add_column('user_sessions_archive', sa.Column('visitor_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_user_sessions_archive_visitor_id'), 'user_sessions_archive', ['visitor_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_sessions_archive_visitor_id'), table_name='user_sessions_archive')
+    op.drop_column('user_sessions_archive', 'visitor_id')
+    op.drop_index('uq_user_sessions_active_visitor_id', table_name='user_sessions')
+    op.drop_constraint('user_sessions_visitor_id_fkey', 'user_sessions', type_='foreignkey')
+    op.drop_column('user_sessions', 'visitor_id')
+    op.drop_index('uq_visitors_chatbot_id_external_id', table_name='visitors')
+    op.drop_table('visitors')
@@ -0,0 +1,60 @@
+"""Add ingestion_jobs and knowledge_chunks
+
+Revision ID: f2b6c8d04a19
+Revises: e4d19a7c5b32
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c8d04a19'
+down_revision: Union[str, Sequence[str], None] = 'e4d19a7c5b32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('chatbot_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('files', sa.JSON(), nullable=True),
+    sa.Column('chunks', sa.Integer(), nullable=False),
+    sa.Column('bytes_read', sa.BigInteger(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingestion_jobs_chatbot_id'), 'ingestion_jobs', ['chatbot_id'], unique=False)
+    op.create_table('knowledge_chunks',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('chatbot_id', sa.String(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ),
+    sa.ForeignKeyConstraint(['job_id'], ['ingestion_jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_knowledge_chunks_chatbot_id_id', 'knowledge_chunks', ['chatbot_id', 'id'], unique=False)
+    op.create_index(op.f('ix_knowledge_chunks_job_id'), 'knowledge_chunks', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_knowledge_chunks_job_id'), table_name='knowledge_chunks')
+    op.drop_index('ix_knowledge_chunks_chatbot_id_id', table_name='knowledge_chunks')
+    op.drop_table('knowledge_chunks')
+    op.drop_index(op.f('ix_ingestion_jobs_chatbot_id'), table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
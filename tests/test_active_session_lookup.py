@@ -0,0 +1,78 @@
+from sqlalchemy import text
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.services.auth_service import AuthService
+from app.services.context_cache import user_context_cache
+
+
+async def _insert_session(conn, session_id, user_id, active, minutes_ago, messages=()):
+    await conn.execute(
+        text(
+            "INSERT INTO user_sessions (id, user_id, is_active, session_data, created_at, last_activity) "
+            "VALUES (:id, :user_id, :active, '{}', now(), now() - make_interval(mins => :ago))"
+        ),
+        {"id": session_id, "user_id": user_id, "active": active, "ago": minutes_ago},
+    )
+    for content in messages:
+        await conn.execute(
+            text("INSERT INTO conversation_messages (session_id, role, content, created_at) "
+                 "VALUES (:id, 'user', :content, now())"),
+            {"id": session_id, "content": content},
+        )
+
+
+async def _context(user_id):
+    user_context_cache.invalidate(user_id)
+    async with AsyncSessionLocal() as db:
+        return await AuthService.get_user_context_for_llm(user_id, db)
+
+
+def test_context_uses_the_active_session_not_the_newest(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await _insert_session(conn, f"{user_id}-old", user_id, True, 30, ["from the active session"])
+            await _insert_session(conn, f"{user_id}-closed", user_id, False, 1, ["from a closed session"])
+        return await _context(user_id)
+
+    context = run_db(scenario())
+    assert context["session_id"] == f"{user_id}-old"
+    assert context["conversation_context"] == "from the active session"
+
+
+def test_context_without_an_active_session(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await _insert_session(conn, f"{user_id}-closed", user_id, False, 1, ["old"])
+        return await _context(user_id), await _context("no-such-user")
+
+    context, missing = run_db(scenario())
+    assert context["user_id"] == user_id
+    assert context["session_id"] is None
+    assert context["session_data"] == {}
+    assert context["conversation_messages"] == []
+    assert missing == {}
+
+
+def test_only_one_session_per_user_can_be_active(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with engine.begin() as conn:
+            indexes = (await conn.execute(
+                text("SELECT indexdef FROM pg_indexes WHERE indexname = 'uq_user_sessions_active_user_id'")
+            )).scalar_one()
+            await _insert_session(conn, f"{user_id}-a", user_id, True, 5)
+        try:
+            async with engine.begin() as conn:
+                await _insert_session(conn, f"{user_id}-b", user_id, True, 1)
+        except Exception as e:
+            return indexes, e
+        return indexes, None
+
+    indexdef, error = run_db(scenario())
+    assert "UNIQUE" in indexdef and "WHERE is_active" in indexdef
+    assert error is not None and "uq_user_sessions_active_user_id" in str(error)
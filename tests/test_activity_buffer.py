@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import APIKey
+from app.services.activity_buffer import ActivityBuffer
+from app.services.auth_service import AuthService
+
+
+def test_touches_keep_only_the_newest_timestamp():
+    buffer = ActivityBuffer(max_pending=100)
+    now = datetime.utcnow()
+    buffer.touch_api_key(1, now)
+    buffer.touch_api_key(1, now - timedelta(minutes=5))
+    buffer.touch_api_key(2, now)
+
+    assert buffer.pending == 2
+    assert buffer._api_keys[1] == now
+    assert buffer.stats()["touches"] == 3
+
+
+def test_flush_writes_one_row_per_key(run_db, test_chatbot):
+    newest = datetime(2030, 1, 1, 12, 0, 0)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            api_key, _ = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+
+        buffer = ActivityBuffer()
+        buffer.touch_api_key(api_key.id, newest - timedelta(hours=1))
+        buffer.touch_api_key(api_key.id, newest)
+        assert await buffer.flush() == 1
+        assert buffer.pending == 0
+        assert await buffer.flush() == 0
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(APIKey.last_used).where(APIKey.id == api_key.id))
+            return result.scalar_one()
+
+    assert run_db(scenario()) == newest
@@ -0,0 +1,143 @@
+import asyncio
+
+from app.db.db_config import AsyncSessionLocal
+from app.services.auth_service import AuthService, api_key_cache
+from app.services.cache import TTLCache
+
+
+def test_ttl_cache_get_set_and_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=-1)  # Already expired
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert "a" in cache and "b" not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_cache_pop_and_disabled():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
+
+    disabled = TTLCache(maxsize=0)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+
+
+def test_revoked_key_is_dropped_from_cache(run_db, test_chatbot):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            api_key, raw_key = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+            key_hash = AuthService.hash_api_key(raw_key)
+
+            assert (await AuthService.validate_api_key(raw_key, db)).id == api_key.id
+            assert api_key_cache.get(key_hash) is not None
+
+            await AuthService.revoke_api_key(api_key.id, db)
+            assert api_key_cache.get(key_hash) is None
+            assert await AuthService.validate_api_key(raw_key, db) is None
+
+    run_db(scenario())
+
+
+def test_invalidation_drops_values_loaded_before_it():
+    cache = TTLCache(maxsize=10, ttl=60)
+    generation = cache.generation()
+    cache.invalidate("a")  # The row changed while "a" was being loaded
+    cache.set("a", "old row", since=generation)
+    cache.set("b", "row", since=generation)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "row"
+    assert cache.stale_sets == 1
+    cache.set("a", "new row", since=cache.generation())
+    assert cache.get("a") == "new row"
+
+
+def test_clear_and_forgotten_invalidations_drop_in_flight_values():
+    cache = TTLCache(maxsize=2, ttl=60)
+    generation = cache.generation()
+    cache.clear()
+    cache.set("a", 1, since=generation)
+    assert cache.get("a") is None
+
+    generation = cache.generation()
+    for key in ("b", "c", "d"):  # "b" falls out of the per-key memory
+        cache.invalidate(key)
+    cache.set("b", 1, since=generation)
+    assert cache.get("b") is None
+
+
+def test_revocation_during_lookup_is_not_cached(run_db, test_chatbot, monkeypatch):
+    async def scenario():
+        async with AsyncSessionLocal() as db, AsyncSessionLocal() as admin:
+            api_key, raw_key = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+            key_hash = AuthService.hash_api_key(raw_key)
+            execute = db.execute
+
+            async def revoke_while_in_flight(statement, *args, **kwargs):
+                result = await execute(statement, *args, **kwargs)
+                # The SELECT already read the live row: revoke before the cache write
+                await AuthService.revoke_api_key(api_key.id, admin)
+                return result
+
+            monkeypatch.setattr(db, "execute", revoke_while_in_flight)
+            await AuthService.validate_api_key(raw_key, db)
+            monkeypatch.undo()
+
+            assert api_key_cache.get(key_hash) is None
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.validate_api_key(raw_key, db) is None
+
+    run_db(scenario())
+
+
+def test_revocation_reaches_other_workers(run_db, test_chatbot):
+    from app.services.cache_invalidation import CacheInvalidationListener
+
+    async def scenario():
+        other_worker = TTLCache(maxsize=10, ttl=60)
+        listener = CacheInvalidationListener(channel="cache_invalidation_test")
+        listener.subscribe("api_key", other_worker.invalidate, other_worker.clear)
+        listener.start()
+        try:
+            for _ in range(100):
+                if listener.stats()["listening"]:
+                    break
+                await asyncio.sleep(0.02)
+            other_worker.set("k1", "cached")
+            other_worker.set("k2", "cached")
+            async with AsyncSessionLocal() as db:
+                await listener.publish(db, "api_key", "k1")
+                await db.commit()
+                await listener.publish(db, "api_key", "k2")
+                await db.rollback()  # Never sent
+            for _ in range(100):
+                if listener.received:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await listener.stop()
+
+        assert other_worker.get("k1") is None
+        assert other_worker.get("k2") == "cached"
+        assert listener.received == 1
+
+    run_db(scenario())
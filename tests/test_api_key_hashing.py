@@ -0,0 +1,28 @@
+import hashlib
+
+from sqlalchemy import select
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import APIKey
+from app.services.auth_service import AuthService
+
+
+def test_hash_api_key_is_sha256_hex():
+    digest = AuthService.hash_api_key("sample_api_key_123")
+    assert digest == hashlib.sha256(b"sample_api_key_123").hexdigest()
+    assert len(digest) == 64
+    assert AuthService.hash_api_key("sample_api_key_124") != digest
+
+
+def test_only_the_digest_is_stored_and_looked_up(run_db, test_chatbot):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            api_key, raw_key = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+            result = await db.execute(select(APIKey.key_hash).where(APIKey.id == api_key.id))
+            assert result.scalar_one() == AuthService.hash_api_key(raw_key) != raw_key
+
+            found = await AuthService.validate_api_key_with_chatbot(raw_key, db)
+            assert found is not None and found[0].id == api_key.id
+            assert await AuthService.validate_api_key_with_chatbot(raw_key + "x", db) is None
+
+    run_db(scenario())
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.db.models import Chatbot
+from app.services.chatbot_runtime import ChatbotRuntime, ChatbotRuntimeCache
+
+
+def _chatbot(chatbot_id="bot", updated_at=None, **config):
+    return Chatbot(
+        id=chatbot_id, name="shopbot", owner_id="owner", llm_endpoint_url=None,
+        chatbot_config=config, created_at=datetime(2024, 1, 1), updated_at=updated_at,
+    )
+
+
+def test_runtime_is_parsed_once_and_immutable():
+    runtime = ChatbotRuntime(_chatbot(
+        bot_display_name="  ", tone=" Formal ", faq_matcher="TFIDF", context_token_budget="300",
+        faqs=[{"q": " Opening   hours? ", "a": " 9 to 5 "}, {"q": "No answer", "a": ""}, "junk"],
+    ))
+
+    assert runtime.display_name == "shopbot"
+    assert runtime.tone == "formal"
+    assert runtime.faq_matcher == "tfidf"
+    assert runtime.context_token_budget == 300
+    assert runtime.faqs == (("Opening hours?", "9 to 5"),)
+    assert runtime.version == datetime(2024, 1, 1)
+    with pytest.raises(AttributeError):
+        runtime.tone = "casual"
+    with pytest.raises(TypeError):
+        runtime.config["tone"] = "casual"
+
+
+def test_put_reuses_the_runtime_of_an_unchanged_version():
+    cache = ChatbotRuntimeCache()
+    first = cache.put(_chatbot())
+
+    assert cache.put(_chatbot()) is first
+    changed = cache.put(_chatbot(updated_at=datetime(2024, 2, 1), tone="casual"))
+    assert changed is not first and changed.tone == "casual"
+
+
+def test_peek_serves_fresh_entries_and_stale_ones_only_on_request():
+    cache = ChatbotRuntimeCache(revalidate_after=60)
+    runtime = cache.put(_chatbot())
+    assert cache.peek("bot") is runtime
+    assert cache.peek("missing") is None
+
+    cache.revalidate_after = 0
+    assert cache.peek("bot") is None
+
+    async def stale():
+        cache._revalidate_later = lambda chatbot_id: None  # No DB here
+        return cache.peek("bot", stale_ok=True)
+
+    assert asyncio.run(stale()) is runtime
+    assert cache.stale_hits == 1
+
+
+def test_least_recently_used_runtimes_are_evicted():
+    cache = ChatbotRuntimeCache(maxsize=2)
+    for chatbot_id in ("a", "b"):
+        cache.put(_chatbot(chatbot_id))
+    cache.peek("a")
+    cache.put(_chatbot("c"))
+
+    assert cache.peek("b") is None
+    assert cache.peek("a") is not None
+    assert cache.evictions == 1
+
+
+def test_get_revalidates_on_the_config_version(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+
+    async def scenario():
+        cache = ChatbotRuntimeCache(revalidate_after=60)
+        async with AsyncSessionLocal() as db:
+            first = await cache.get(chatbot_id, db)
+            assert await cache.get(chatbot_id, db) is first
+            assert (cache.misses, cache.hits) == (1, 1)
+
+            # Past revalidate_after an unchanged row keeps the runtime
+            cache.revalidate_after = 0
+            assert await cache.get(chatbot_id, db) is first
+            assert cache.rebuilds == 0
+
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text("UPDATE chatbots SET chatbot_config = '{\"tone\": \"formal\"}', "
+                         "updated_at = now() + interval '1 second' WHERE id = :id"),
+                    {"id": chatbot_id},
+                )
+            changed = await cache.get(chatbot_id, db)
+            assert changed is not first and changed.tone == "formal"
+            assert cache.rebuilds == 1
+
+            assert await cache.get("missing", db) is None
+
+    run_db(scenario())
+
+
+def test_stale_peek_revalidates_in_the_background(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+
+    async def scenario():
+        cache = ChatbotRuntimeCache(revalidate_after=60)
+        async with AsyncSessionLocal() as db:
+            first = await cache.get(chatbot_id, db)
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("UPDATE chatbots SET chatbot_config = '{\"tone\": \"formal\"}', "
+                     "updated_at = now() + interval '1 second' WHERE id = :id"),
+                {"id": chatbot_id},
+            )
+        cache.revalidate_after = 0
+        assert cache.peek(chatbot_id, stale_ok=True) is first
+        await asyncio.gather(*cache._refreshing.values())
+        cache.revalidate_after = 60
+        return cache.peek(chatbot_id)
+
+    assert run_db(scenario()).tone == "formal"
@@ -0,0 +1,120 @@
+from sqlalchemy import select
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import UserSession
+from app.services import context_budget
+from app.services.auth_service import AuthService
+from app.services.context_budget import (
+    apply_token_budget,
+    estimate_tokens,
+    fold_into_summary,
+    should_summarize,
+    summarize_older_turns,
+    truncate_to_tokens,
+)
+
+
+def _context(messages, profile_data=None, summary=""):
+    return {
+        "user_profile": {"first_name": "Ada", "profile_data": profile_data},
+        "conversation_summary": summary,
+        "conversation_messages": [
+            {"id": i, "role": "user", "content": content} for i, content in enumerate(messages, 1)
+        ],
+        "conversation_context": "\n".join(messages),
+    }
+
+
+def test_token_estimate_counts_words_by_length_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi there!") == 4  # hi, ther-e, !
+    assert estimate_tokens("internationalization") == 5
+
+
+def test_token_estimates_are_cached_by_digest_not_text():
+    text = "word " * 10_000
+    assert estimate_tokens(text) == estimate_tokens(text) == 10_000
+    keys = list(context_budget._token_counts._data)
+    # Keys stay 16 bytes however long the text was
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in keys)
+
+
+def test_truncate_keeps_the_beginning():
+    text = "one two three four five six"
+    assert truncate_to_tokens(text, 100) == text
+    cut = truncate_to_tokens(text, 3)
+    assert cut == "one two …"  # "three" is two tokens
+
+
+def test_budget_keeps_the_newest_turns():
+    messages = [f"message number {i} " + "x" * 40 for i in range(10)]
+    budgeted, keep_from_id = apply_token_budget(_context(messages), budget=60)
+
+    kept = [m["content"] for m in budgeted["conversation_messages"]]
+    assert kept and kept == messages[-len(kept):]
+    assert len(kept) < len(messages)
+    assert keep_from_id == budgeted["conversation_messages"][0]["id"]
+    assert budgeted["conversation_context"] == "\n".join(kept)
+
+
+def test_budget_caps_profile_data_and_summary():
+    context = _context(
+        ["hello"],
+        profile_data="profile " * 500,
+        summary="\n".join(f"older line {i}" for i in range(200)),
+    )
+    budgeted, keep_from_id = apply_token_budget(context, budget=400)
+
+    assert estimate_tokens(budgeted["user_profile"]["profile_data"]) <= 101
+    assert estimate_tokens(budgeted["conversation_summary"]) <= 100
+    # The newest summary lines survive
+    assert budgeted["conversation_summary"].endswith("older line 199")
+    assert keep_from_id is None
+    # The input is left untouched
+    assert context["user_profile"]["profile_data"] == "profile " * 500
+
+
+def test_newest_turn_is_kept_even_over_budget():
+    budgeted, _ = apply_token_budget(_context(["x" * 4000]), budget=10)
+    assert len(budgeted["conversation_messages"]) == 1
+
+
+def test_fold_into_summary_appends_lead_sentences_within_limit():
+    summary = fold_into_summary("", ["Where is my order? It was due Monday.", "  ", "Can I return it?"])
+    assert summary == "Where is my order?\nCan I return it?"
+
+    long = fold_into_summary(summary, [f"Turn {i} here. More." for i in range(100)], max_tokens=20)
+    assert estimate_tokens(long) <= 20
+    assert long.endswith("Turn 99 here.")
+
+
+def test_summarization_is_debounced_per_session():
+    assert should_summarize("budget-test-session")
+    assert not should_summarize("budget-test-session")
+    assert not should_summarize(None)
+
+
+def test_older_turns_are_folded_into_the_session_summary(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.update_conversation_context(
+                user_id, "\n".join(f"Question {i}. Details." for i in range(5)), db
+            )
+            context = await AuthService.get_user_context_for_llm(user_id, db)
+            session_id = context["session_id"]
+            keep_from_id = context["conversation_messages"][3]["id"]
+
+        await summarize_older_turns(user_id, session_id, keep_from_id)
+        # A second pass with nothing new changes nothing
+        await summarize_older_turns(user_id, session_id, keep_from_id)
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(UserSession.summary, UserSession.summary_through_id).where(UserSession.id == session_id)
+            )).one()
+        return row, keep_from_id
+
+    (summary, through_id), keep_from_id = run_db(scenario())
+    assert summary == "Question 0.\nQuestion 1.\nQuestion 2."
+    assert through_id == keep_from_id - 1
@@ -0,0 +1,122 @@
+from app.db.db_config import AsyncSessionLocal
+from app.services.auth_service import AuthService
+from app.services.context_cache import UserContextCache, user_context_cache, window_messages
+
+
+def _context(messages=()):
+    return {
+        "user_id": "u1",
+        "user_profile": {"first_name": "Ada", "preferences": {}},
+        "session_id": "s1",
+        "conversation_summary": "",
+        "conversation_messages": list(messages),
+        "conversation_context": "\n".join(m["content"] for m in messages),
+        "timestamp": "then",
+    }
+
+
+def test_window_keeps_newest_messages_within_limits():
+    messages = [{"role": "user", "content": "x" * 10} for _ in range(5)]
+    assert len(window_messages(messages, max_messages=3, max_chars=1000)) == 3
+    assert len(window_messages(messages, max_messages=10, max_chars=25)) == 2
+    # The newest message is kept even if it alone is over the limit
+    assert window_messages(messages[:1], max_messages=10, max_chars=5) == messages[:1]
+
+
+def test_get_returns_a_copy_with_a_fresh_timestamp():
+    cache = UserContextCache()
+    cache.set("u1", "s1", _context())
+    first = cache.get("u1")
+    first["user_profile"]["first_name"] = "changed"
+
+    second = cache.get("u1")
+    assert second["user_profile"]["first_name"] == "Ada"
+    assert second["timestamp"] != "then"
+
+
+def test_append_message_writes_through_for_the_same_session():
+    cache = UserContextCache()
+    cache.set("u1", "s1", _context([{"id": 1, "role": "user", "content": "hi"}]))
+    cache.append_message("u1", "s1", {"id": 2, "role": "assistant", "content": "hello"})
+
+    context = cache.get("u1")
+    assert [m["content"] for m in context["conversation_messages"]] == ["hi", "hello"]
+    assert context["conversation_context"] == "hi\nhello"
+
+    # A turn for another session means the cached one is no longer active
+    cache.append_message("u1", "s2", {"id": 3, "role": "user", "content": "new"})
+    assert cache.get("u1") is None
+
+
+def test_profile_and_summary_write_through_and_invalidate():
+    cache = UserContextCache()
+    cache.set("u1", "s1", _context())
+    cache.update_profile("u1", {"first_name": "Grace", "preferences": None, "unknown": 1})
+    cache.update_summary("u1", "s1", "earlier turns")
+
+    context = cache.get("u1")
+    assert context["user_profile"] == {"first_name": "Grace", "preferences": {}}
+    assert context["conversation_summary"] == "earlier turns"
+
+    cache.invalidate("u1")
+    assert cache.get("u1") is None
+
+
+def test_cached_context_matches_the_database_after_writes(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        user_context_cache.invalidate(user_id)
+        async with AsyncSessionLocal() as db:
+            await AuthService.append_conversation_message(user_id, "first", db)
+            cached = await AuthService.get_user_context_for_llm(user_id, db)
+            await AuthService.append_conversation_message(user_id, "second", db, role="assistant")
+            await AuthService.save_user_details(user_id, {"first_name": "Ada"}, db)
+            from_cache = await AuthService.get_user_context_for_llm(user_id, db)
+
+            user_context_cache.invalidate(user_id)
+            from_db = await AuthService.get_user_context_for_llm(user_id, db)
+        return cached, from_cache, from_db
+
+    cached, from_cache, from_db = run_db(scenario())
+    assert [m["content"] for m in cached["conversation_messages"]] == ["first"]
+    for key in ("conversation_messages", "conversation_context", "session_id", "user_profile"):
+        assert from_cache[key] == from_db[key]
+    assert from_db["user_profile"]["first_name"] == "Ada"
+
+
+def test_a_context_loaded_before_a_write_is_not_cached():
+    cache = UserContextCache()
+    generation = cache.generation()
+    cache.invalidate("u1")  # A turn was appended while the context was loading
+    cache.set("u1", "s1", _context(), since=generation)
+
+    assert cache.get("u1") is None
+    cache.set("u1", "s1", _context(), since=cache.generation())
+    assert cache.get("u1") is not None
+
+
+def test_append_during_a_context_read_is_not_lost(run_db, test_chatbot, monkeypatch):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        user_context_cache.invalidate(user_id)
+        async with AsyncSessionLocal() as db, AsyncSessionLocal() as writer:
+            await AuthService.append_conversation_message(user_id, "first", db)
+            await db.commit()
+            execute = db.execute
+
+            async def append_while_in_flight(statement, *args, **kwargs):
+                result = await execute(statement, *args, **kwargs)
+                await AuthService.append_conversation_message(user_id, "second", writer)
+                return result
+
+            monkeypatch.setattr(db, "execute", append_while_in_flight)
+            stale = await AuthService.get_user_context_for_llm(user_id, db)
+            monkeypatch.undo()
+            fresh = await AuthService.get_user_context_for_llm(user_id, db)
+        return stale, fresh
+
+    stale, fresh = run_db(scenario())
+    assert [m["content"] for m in stale["conversation_messages"]] == ["first"]
+    assert [m["content"] for m in fresh["conversation_messages"]] == ["first", "second"]
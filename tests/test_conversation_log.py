@@ -0,0 +1,129 @@
+from sqlalchemy import event, select
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.db.models import ConversationMessage, UserSession
+from app.services.auth_service import AuthService, context_lines
+from app.services.context_cache import user_context_cache
+
+
+async def _rows(user_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ConversationMessage.id, ConversationMessage.role, ConversationMessage.content)
+            .join(UserSession, UserSession.id == ConversationMessage.session_id)
+            .where(UserSession.user_id == user_id, UserSession.is_active)
+            .order_by(ConversationMessage.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+class _Statements:
+    """SQL sent while the block runs"""
+
+    def __enter__(self):
+        self.sent = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.sent.append(statement.split(None, 1)[0].upper())
+
+
+def test_context_lines_skip_blank_lines():
+    assert context_lines("a\n\n  \nb\n") == ["a", "b"]
+    assert context_lines(None) == []
+
+
+def test_resent_conversation_only_appends_new_lines(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.update_conversation_context(user_id, "hi\nhours?", db)
+            before = await _rows(user_id)
+            await AuthService.append_conversation_message(user_id, "9 to 5", db, role="assistant")
+            with _Statements() as statements:
+                # The client resends its whole conversation plus one new line
+                assert await AuthService.update_conversation_context(user_id, "hi\nhours?\nreturns?", db)
+                assert await AuthService.update_conversation_context(user_id, "hi\nhours?\nreturns?", db)
+        return before, await _rows(user_id), statements.sent
+
+    before, after, statements = run_db(scenario())
+    # Stored rows keep their ids: nothing was deleted or rewritten
+    assert after[:2] == before
+    assert [(role, content) for _, role, content in after] == [
+        ("user", "hi"), ("user", "hours?"), ("assistant", "9 to 5"), ("user", "returns?"),
+    ]
+    assert "DELETE" not in statements
+    assert statements.count("INSERT") == 3  # Two session upserts, one row
+
+
+def test_a_window_of_the_conversation_overlaps_the_stored_tail(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.update_conversation_context(user_id, "one\ntwo\nthree", db)
+            await AuthService.update_conversation_context(user_id, "three\nfour", db)
+            # No overlap at all: everything is new
+            await AuthService.update_conversation_context(user_id, "five", db)
+        return [content for _, _, content in await _rows(user_id)]
+
+    assert run_db(scenario()) == ["one", "two", "three", "four", "five"]
+
+
+def test_reset_replaces_messages_and_summary(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.update_conversation_context(user_id, "old one\nold two", db)
+            session = (await db.execute(select(UserSession).where(UserSession.user_id == user_id))).scalar_one()
+            session.summary = "earlier turns"
+            await db.commit()
+            with _Statements() as statements:
+                await AuthService.update_conversation_context(user_id, "fresh", db, reset=True)
+            await db.refresh(session)
+        return session.summary, await _rows(user_id), statements.sent
+
+    summary, rows, statements = run_db(scenario())
+    assert summary is None
+    assert [content for _, _, content in rows] == ["fresh"]
+    assert "DELETE" in statements
+
+
+def test_appended_lines_write_through_to_the_context_cache(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        user_context_cache.invalidate(user_id)
+        async with AsyncSessionLocal() as db:
+            await AuthService.update_conversation_context(user_id, "a", db)
+            await AuthService.get_user_context_for_llm(user_id, db)
+            await AuthService.update_conversation_context(user_id, "a\nb", db)
+            cached = user_context_cache.get(user_id)
+            user_context_cache.invalidate(user_id)
+            from_db = await AuthService.get_user_context_for_llm(user_id, db)
+        return cached, from_db
+
+    cached, from_db = run_db(scenario())
+    assert cached is not None
+    assert cached["conversation_messages"] == from_db["conversation_messages"]
+    assert [m["content"] for m in from_db["conversation_messages"]] == ["a", "b"]
+
+
+def test_update_user_session_appends_unless_reset(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            session = await AuthService.create_user_session(user_id, context_data="a\nb", db=db)
+            await AuthService.update_user_session(session.id, context_data="a\nb\nc", db=db)
+            appended = [content for _, _, content in await _rows(user_id)]
+            await AuthService.update_user_session(session.id, context_data="x", db=db, reset=True)
+        return appended, [content for _, _, content in await _rows(user_id)]
+
+    assert run_db(scenario()) == (["a", "b", "c"], ["x"])
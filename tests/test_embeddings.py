@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingStore
+from app.services.vector_index import FlatEmbeddingIndex, HashingEmbedder
+
+TEXTS = [
+    "What are your opening hours?",
+    "Do you ship internationally?",
+    "How do I return an item?",
+    "Do you sell gift cards?",
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(root=str(tmp_path), embedder=HashingEmbedder(dim=64), revalidate_after=0)
+
+
+def _publish(store, ids, texts, version="v1", count=None):
+    build = store.begin("bot", "knowledge", version, len(texts) if count is None else count)
+    build.add(ids, texts)
+    build.publish()
+    return build
+
+
+def test_embeddings_are_deterministic_and_unit_length():
+    vectors = HashingEmbedder(dim=64).embed(TEXTS + ["", "the"])
+    again = HashingEmbedder(dim=64).embed(TEXTS)
+
+    assert vectors.dtype == np.float32 and vectors.shape == (6, 64)
+    np.testing.assert_array_equal(vectors[:4], again)
+    np.testing.assert_allclose(np.linalg.norm(vectors[:4], axis=1), 1.0, rtol=1e-5)
+    # No features (empty, stopwords only) -> zero row
+    assert not vectors[4:].any()
+
+
+def test_flat_search_ranks_the_matching_text_first():
+    embedder = HashingEmbedder(dim=64)
+    index = FlatEmbeddingIndex(embedder.embed(TEXTS), np.arange(10, 14), "v1")
+    results = index.search(embedder.embed(["return an item"])[0], top_k=2)
+
+    assert len(results) == 2
+    assert results[0][0] == 12
+    assert results[0][1] >= results[1][1]
+    assert FlatEmbeddingIndex(np.zeros((0, 64), np.float32), np.zeros(0, np.int64), "v0").search(
+        embedder.embed(["x"])[0]
+    ) == []
+
+
+def test_published_build_is_memory_mapped(store):
+    _publish(store, [10, 11, 12, 13], TEXTS)
+    index = store.open("bot", "knowledge")
+
+    assert isinstance(index.vectors, np.memmap)
+    assert index.version == "v1"
+    assert index.ids.tolist() == [10, 11, 12, 13]
+    np.testing.assert_array_equal(index.vectors, store.embedder.embed(TEXTS))
+    assert store.open("bot", "faqs") is None
+
+
+def test_republish_replaces_the_previous_build(store):
+    first = _publish(store, [1, 2, 3, 4], TEXTS)
+    assert store.open("bot", "knowledge").version == "v1"
+    second = _publish(store, [5, 6], TEXTS[:2], version="v2")
+
+    index = store.open("bot", "knowledge")
+    assert index.version == "v2"
+    assert index.ids.tolist() == [5, 6]
+    assert not os.path.exists(first.path)
+    assert os.path.exists(second.path)
+
+
+def test_short_build_keeps_only_written_rows(store):
+    # Rows deleted while streaming: fewer rows than counted
+    _publish(store, [1, 2], TEXTS[:2], count=4)
+    index = store.open("bot", "knowledge")
+
+    assert len(index) == 2
+    assert index.vectors.shape == (2, 64)
+
+
+def test_aborted_build_is_never_published(store):
+    build = store.begin("bot", "knowledge", "v1", 2)
+    build.add([1, 2], TEXTS[:2])
+    build.abort()
+
+    assert store.open("bot", "knowledge") is None
+    assert not os.path.exists(build.path)
+
+
+def test_open_indexes_are_kept_in_an_lru(tmp_path):
+    store = EmbeddingStore(root=str(tmp_path), embedder=HashingEmbedder(dim=16), maxsize=1, revalidate_after=60)
+    for chatbot_id in ("a", "b"):
+        build = store.begin(chatbot_id, "faqs", "v1", 1)
+        build.add([0], TEXTS[:1])
+        build.publish()
+
+    assert store.open("a", "faqs") is store.open("a", "faqs")
+    store.open("b", "faqs")
+    assert store.stats()["open"] == 1
+    assert store.evictions == 1
+    assert store.hits == 1
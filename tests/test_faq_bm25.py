@@ -0,0 +1,58 @@
+import heapq
+import random
+
+import pytest
+
+from app.services.faq_search import FAQIndex, tokenize
+
+FAQS = (
+    ("What are your opening hours?", "We are open 9am to 5pm, Monday to Friday."),
+    ("Do you ship internationally?", "Yes, we ship to over 40 countries."),
+    ("How do I return an item?", "Send it back within 30 days for a full refund."),
+    ("Is the lavender soap vegan?", "All our soaps are vegan and cruelty free."),
+)
+
+
+def _random_faqs(count, seed=7):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(300)]
+    common = ["soap", "ship", "order"]
+    return tuple(
+        (" ".join(rng.choices(words, k=6) + rng.choices(common, k=2)),
+         " ".join(rng.choices(words, k=12) + rng.choices(common, k=3)))
+        for _ in range(count)
+    )
+
+
+def _exhaustive(index, text, top_k):
+    scores = {}
+    for term in set(tokenize(text)):
+        for doc, weight in index._postings.get(term, {}).items():
+            scores[doc] = scores.get(doc, 0.0) + weight
+    return heapq.nlargest(top_k, scores.values())
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("What are your shipping options?") == ["ship", "option"]
+    assert tokenize("Shipped internationally") == ["ship", "international"]
+
+
+def test_best_match_and_confidence():
+    index = FAQIndex(FAQS)
+    match = index.best("when are you open? opening hours")
+    assert match.index == 0
+    assert 0 < match.confidence <= 1
+    assert index.best("international shipping").index == 1
+    assert index.best("completely unrelated xyzzy") is None
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_maxscore_matches_exhaustive_scoring(top_k):
+    faqs = _random_faqs(500)
+    index = FAQIndex(faqs)
+    rng = random.Random(1)
+    for _ in range(200):
+        question, answer = rng.choice(faqs)
+        text = " ".join(rng.sample((question + " " + answer).split(), 4) + ["soap", "order"])
+        scores = [match.score for match in index.search(text, top_k=top_k)]
+        assert scores == pytest.approx(_exhaustive(index, text, top_k))
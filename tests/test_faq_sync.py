@@ -0,0 +1,125 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+from app.db.models import Chatbot
+from app.services.chatbot_runtime import ChatbotRuntime
+from app.services.faq_search import FAQ_MATCHERS, FAQIndexCache
+
+TOPICS = [
+    "opening hours", "international shipping", "returns policy", "gift cards", "loyalty points",
+    "store locations", "payment methods", "order tracking", "warranty claims", "size guide",
+    "student discount", "price matching", "click and collect", "damaged parcels", "newsletter signup",
+    "account deletion", "invoice copies", "bulk orders", "careers page", "press contact",
+]
+FAQS = tuple((f"Where can I find {topic}?", f"See our {topic} page.") for topic in TOPICS)
+
+
+def _edited(faqs):
+    """Two FAQs removed, one edited, two added, the rest reordered"""
+    faqs = list(faqs)
+    del faqs[3], faqs[7]
+    faqs[0] = (faqs[0][0], "Open 9am to 5pm every day.")
+    faqs += [("Do you offer gift wrapping?", "Yes, at checkout."), ("Can I pay in instalments?", "Yes, over 3 months.")]
+    random.Random(4).shuffle(faqs)
+    return tuple(faqs)
+
+
+def _runtime(faqs, matcher="bm25", updated_at=None):
+    return ChatbotRuntime(Chatbot(
+        id="bot", name="bot", owner_id=1, llm_endpoint_url=None,
+        chatbot_config={"faq_matcher": matcher, "faqs": [{"q": q, "a": a} for q, a in faqs]},
+        created_at=datetime(2024, 1, 1), updated_at=updated_at,
+    ))
+
+
+@pytest.mark.parametrize("matcher", sorted(FAQ_MATCHERS))
+def test_synced_index_matches_a_rebuild(matcher):
+    edited = _edited(FAQS)
+    synced = FAQ_MATCHERS[matcher](FAQS)
+    assert synced.sync(edited)
+    rebuilt = FAQ_MATCHERS[matcher](edited)
+
+    assert len(synced) == len(rebuilt) == len(edited)
+    for question, answer in edited:
+        match = synced.best(question)
+        # Positions are remapped to the new tuple
+        assert match.index == rebuilt.best(question).index
+        assert edited[match.index] == (match.question, match.answer) == (question, answer)
+    if matcher == "trigram":
+        # Dice similarity has no corpus statistics: scores are identical
+        for question, _ in edited:
+            assert synced.best(question).score == pytest.approx(rebuilt.best(question).score)
+
+
+@pytest.mark.parametrize("matcher", sorted(FAQ_MATCHERS))
+def test_removed_faqs_are_never_returned(matcher):
+    edited = _edited(FAQS)
+    index = FAQ_MATCHERS[matcher](FAQS)
+    assert index.sync(edited)
+    removed = set(FAQS) - set(edited)
+
+    for question, answer in removed:
+        for match in index.search(question, top_k=len(FAQS)):
+            assert (match.question, match.answer) not in removed
+            assert edited[match.index] == (match.question, match.answer)
+    assert index.stale_ratio == pytest.approx(6 / (len(FAQS) + 3))
+
+
+@pytest.mark.parametrize("matcher", sorted(FAQ_MATCHERS))
+def test_large_changes_ask_for_a_rebuild(matcher):
+    index = FAQ_MATCHERS[matcher](FAQS)
+    replaced = tuple((f"{q} now", a) for q, a in FAQS[:15]) + FAQS[15:]
+
+    assert not index.sync(replaced)
+    # Untouched on refusal
+    assert index.faqs == list(FAQS)
+    assert index.best(FAQS[0][0]).index == 0
+
+
+def test_duplicate_faqs_keep_distinct_positions():
+    faqs = FAQS[:3] + FAQS[:1]
+    index = FAQ_MATCHERS["bm25"](FAQS[:3])
+    assert index.sync(faqs)
+
+    positions = {match.index for match in index.search(FAQS[0][0], top_k=4) if match.question == FAQS[0][0]}
+    assert positions == {0, 3}
+
+
+def test_cache_syncs_then_compacts_in_the_background():
+    cache = FAQIndexCache(compact_ratio=0.2)
+    first = _runtime(FAQS)
+    index = cache.get(first)
+    assert cache.get(first) is index and cache.hits == 1
+
+    small = _runtime(FAQS[1:], updated_at=datetime(2024, 1, 2))
+    assert cache.get(small) is index and cache.syncs == 1
+    assert index.stale_ratio < 0.2
+
+    async def edit():
+        edited = _runtime(_edited(FAQS), updated_at=datetime(2024, 1, 3))
+        synced = cache.get(edited)
+        assert synced is index
+        for _ in range(100):
+            if cache.compactions:
+                break
+            await asyncio.sleep(0.01)
+        return edited
+
+    edited = asyncio.run(edit())
+    assert cache.compactions == 1
+    compacted = cache.get(edited)
+    assert compacted is not index
+    assert compacted.stale_ratio == 0
+    assert compacted.faqs == list(edited.faqs)
+
+
+def test_cache_rebuilds_when_sync_refuses():
+    cache = FAQIndexCache()
+    index = cache.get(_runtime(FAQS, matcher="tfidf"))
+    replaced = _runtime(tuple((f"{q} now", a) for q, a in FAQS), matcher="tfidf", updated_at=datetime(2024, 1, 2))
+
+    assert cache.get(replaced) is not index
+    assert cache.builds == 2 and cache.syncs == 0
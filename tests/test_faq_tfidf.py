@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.faq_search import TfidfFAQIndex, _term_freqs
+
+FAQS = (
+    ("What are your opening hours?", "We are open 9am to 5pm, Monday to Friday."),
+    ("Do you ship internationally?", "Yes, we ship to over 40 countries."),
+    ("How do I return an item?", "Send it back within 30 days for a full refund."),
+)
+
+
+def _random_faqs(count, seed=3):
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(200)]
+    return tuple((" ".join(rng.choices(words, k=5)), " ".join(rng.choices(words, k=10))) for _ in range(count))
+
+
+def _dense(index):
+    """
+    (terms x slots) matrix rebuilt from the CSR arrays
+    """
+    matrix = np.zeros((len(index._vocabulary), len(index.faqs)), dtype=np.float32)
+    for term_id in range(len(index._vocabulary)):
+        start, end = index._indptr[term_id], index._indptr[term_id + 1]
+        matrix[term_id, index._docs[start:end]] = index._values[start:end]
+    return matrix
+
+
+def _expected_dense(index):
+    matrix = np.zeros((len(index._vocabulary), len(index.faqs)), dtype=np.float32)
+    for slot, faq in enumerate(index.faqs):
+        if faq is not None:
+            for term_id, weight in index._doc_weights(_term_freqs(*faq)).items():
+                matrix[term_id, slot] = weight
+    return matrix
+
+
+def test_best_match_is_cosine_similarity():
+    index = TfidfFAQIndex(FAQS)
+    match = index.best("can you ship my order internationally")
+    assert match.index == 1
+    assert match.confidence == pytest.approx(match.score)
+    assert 0 < match.score <= 1
+    assert index.best("xyzzy") is None
+
+
+def test_batch_scoring_matches_single_messages():
+    faqs = _random_faqs(300)
+    index = TfidfFAQIndex(faqs)
+    # Force several batch steps
+    index._BATCH_CELLS = 1000
+    rng = random.Random(5)
+    texts = [" ".join(rng.sample(question.split(), 3)) for question, _ in rng.sample(faqs, 40)]
+
+    batch = index.search_batch(texts, top_k=3)
+    for text, matches in zip(texts, batch):
+        single = index.search(text, top_k=3)
+        assert [m.index for m in matches] == [m.index for m in single]
+        assert [m.score for m in matches] == pytest.approx([m.score for m in single])
+
+
+def test_spliced_faqs_keep_the_csr_arrays_consistent():
+    faqs = _random_faqs(50)
+    index = TfidfFAQIndex(faqs)
+    edited = faqs[:45] + (
+        ("brand new question about gift cards", "gift cards never expire"),
+        (faqs[46][0] + " updated", faqs[46][1]),
+    ) + faqs[47:]
+    assert index.sync(edited)
+
+    assert np.all(np.diff(index._indptr) >= 0)
+    assert index._indptr[-1] == len(index._docs) == len(index._values)
+    np.testing.assert_allclose(_dense(index)[:, index._alive], _expected_dense(index)[:, index._alive], rtol=1e-5)
+
+    match = index.best("gift cards expire")
+    assert match.index == 45 and match.question == "brand new question about gift cards"
+    removed = index.best(faqs[45][0])
+    assert removed is None or removed.question != faqs[45][0]
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from app.services.faq_search import TrigramFAQIndex, _trigrams
+
+FAQS = (
+    ("What are your opening hours?", "9am to 5pm."),
+    ("Do you ship internationally?", "Yes."),
+    ("How do I return an item?", "Within 30 days."),
+    ("Do you sell gift cards?", "Yes, online and in store."),
+)
+
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def test_trigrams_are_padded_per_word_without_stopwords():
+    assert _trigrams("the Hours") == frozenset({" ho", "hou", "our", "urs", "rs "})
+
+
+def test_misspellings_find_their_faq():
+    index = TrigramFAQIndex(FAQS)
+    assert index.best("openign hours").index == 0
+    assert index.best("internatinal shiping").index == 1
+    assert index.best("gift crads").index == 3
+
+
+def test_scores_are_exact_dice_similarity():
+    index = TrigramFAQIndex(FAQS)
+    query = "retrun an itme"
+    for match in index.search(query, top_k=4):
+        expected = _dice(_trigrams(query), _trigrams(FAQS[match.index][0]))
+        assert match.score == pytest.approx(expected)
+        assert match.confidence == match.score
+
+
+def test_posting_budget_reranks_candidates_exactly():
+    rng = random.Random(11)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+    faqs = tuple((" ".join(rng.choices(words, k=4)) + f" item{i}", "") for i in range(2000))
+    unbounded = TrigramFAQIndex(faqs, posting_budget=10 ** 9)
+    budgeted = TrigramFAQIndex(faqs, max_candidates=64, posting_budget=200)
+
+    for i in rng.sample(range(len(faqs)), 50):
+        query = faqs[i][0].replace("a", "e", 1)
+        best = budgeted.best(query)
+        # Rare trigrams (the item number) are read first, so the FAQ is still found
+        assert best.index == unbounded.best(query).index == i
+        assert best.score == pytest.approx(_dice(_trigrams(query), _trigrams(faqs[i][0])))
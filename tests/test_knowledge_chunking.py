@@ -0,0 +1,80 @@
+import io
+import random
+
+from app.services.knowledge_ingestion import chunk, copy_upload, decode, normalize, read_blocks
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def _text(n=600, seed=2):
+    rng = random.Random(seed)
+    return " ".join(f"{rng.choice(WORDS)}{i}" for i in range(n))
+
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_decode_carries_characters_split_across_blocks():
+    data = "café ☕ naïve".encode("utf-8")
+    blocks = read_blocks(io.BytesIO(b"\xef\xbb\xbf" + data + b"\xff"), block_size=3)
+
+    assert "".join(decode(blocks)) == "café ☕ naïve�"
+
+
+def test_normalize_collapses_whitespace_across_pieces():
+    pieces = ["  one\t", "\n\ntwo\x00", " ", "  three  \x07", "\n"]
+    assert "".join(normalize(pieces)) == "one two three"
+
+
+def test_chunks_are_bounded_and_cut_at_spaces():
+    text = _text()
+    chunks = list(chunk(_pieces(text, 37), size=200, overlap=40))
+
+    assert len(chunks) > 10
+    for piece in chunks:
+        assert 0 < len(piece) <= 200
+    words = set(text.split())
+    assert all(word in words for piece in chunks for word in piece.split())
+
+
+def test_each_chunk_starts_with_whole_words_from_the_previous_one():
+    chunks = list(chunk(_pieces(_text(), 53), size=200, overlap=40))
+
+    for previous, current in zip(chunks, chunks[1:]):
+        tail = previous[-40:].split(" ", 1)[-1]
+        assert current.startswith(tail)
+        assert 0 < len(tail) <= 40
+
+
+def test_chunks_cover_the_text_whatever_the_piece_size():
+    text = _text()
+    for piece_size in (1, 7, 200, 5000):
+        chunks = list(chunk(_pieces(text, piece_size), size=200, overlap=40))
+        rebuilt = chunks[0]
+        for previous, current in zip(chunks, chunks[1:]):
+            tail = previous[-40:].split(" ", 1)[-1]
+            rebuilt += " " + current[len(tail):].lstrip()
+        assert rebuilt == text
+
+
+def test_without_overlap_chunks_partition_the_text():
+    text = _text()
+    chunks = list(chunk(_pieces(text, 64), size=150, overlap=0))
+
+    assert " ".join(chunks) == text
+
+
+def test_short_text_is_one_chunk():
+    assert list(chunk(["just a few words"], size=200, overlap=40)) == ["just a few words"]
+    assert list(chunk([], size=200, overlap=40)) == []
+
+
+def test_copy_upload_is_independent_and_rewound():
+    upload = io.BytesIO(b"x" * 100_000)
+    upload.read(10)
+    copy = copy_upload(upload, block_size=4096)
+    upload.close()
+
+    assert copy.read() == b"x" * 100_000
+    copy.close()
@@ -0,0 +1,107 @@
+import asyncio
+import io
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.db.db_config import engine
+from app.db.models import IngestionJob, KnowledgeChunk
+from app.services.knowledge_ingestion import KnowledgeIngestion
+
+
+class BrokenUpload(io.BytesIO):
+    """
+    An upload whose reads start failing part way through
+    """
+
+    def __init__(self, data, fail_after):
+        super().__init__(data)
+        self.fail_after = fail_after
+
+    def read(self, size=-1):
+        if self.tell() >= self.fail_after:
+            raise OSError("disk went away")
+        return super().read(size)
+
+
+async def _create_job(chatbot_id, status="queued", heartbeat_at=None, chunks=0):
+    job_id = str(uuid.uuid4())
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(IngestionJob).values(
+                id=job_id, chatbot_id=chatbot_id, status=status, heartbeat_at=heartbeat_at or datetime.utcnow()
+            )
+        )
+        if chunks:
+            await conn.execute(insert(KnowledgeChunk), [
+                {"chatbot_id": chatbot_id, "job_id": job_id, "source": "a.txt", "chunk_index": i, "content": f"c{i}"}
+                for i in range(chunks)
+            ])
+    return job_id
+
+
+async def _job(job_id):
+    async with engine.connect() as conn:
+        status = (await conn.execute(select(IngestionJob.status).where(IngestionJob.id == job_id))).scalar()
+        chunks = (await conn.execute(
+            select(func.count()).select_from(KnowledgeChunk).where(KnowledgeChunk.job_id == job_id)
+        )).scalar()
+    return status, chunks
+
+
+def test_a_job_that_fails_part_way_leaves_no_chunks(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+    ingestion = KnowledgeIngestion(workers=1, block_size=1024, insert_batch_size=1, heartbeat_interval=0)
+    upload = BrokenUpload(" ".join(f"word{i}" for i in range(4000)).encode(), fail_after=16 * 1024)
+
+    async def scenario():
+        job_id = await _create_job(chatbot_id)
+        ingestion.start()
+        ingestion.submit(job_id, chatbot_id, [("a.txt", "text/plain", upload)])
+        try:
+            for _ in range(200):
+                if ingestion.jobs_failed:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await ingestion.stop()
+        return await _job(job_id)
+
+    status, chunks = run_db(scenario())
+    assert status == "failed"
+    assert ingestion.chunks > 0
+    assert ingestion.chunks_discarded == ingestion.chunks
+    assert chunks == 0
+
+
+def test_failing_stale_jobs_deletes_their_chunks(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+    ingestion = KnowledgeIngestion(heartbeat_interval=0, stale_after=60)
+    long_ago = datetime.utcnow() - timedelta(minutes=10)
+
+    async def scenario():
+        stale = await _create_job(chatbot_id, status="running", heartbeat_at=long_ago, chunks=3)
+        live = await _create_job(chatbot_id, status="running", chunks=2)
+        done = await _create_job(chatbot_id, status="done", heartbeat_at=long_ago, chunks=2)
+        await ingestion.fail_stale_jobs()
+        return await _job(stale), await _job(live), await _job(done)
+
+    stale, live, done = run_db(scenario())
+    assert stale == ("failed", 0)
+    assert live == ("running", 2)
+    assert done == ("done", 2)
+    assert ingestion.chunks_discarded >= 3
+
+
+def test_shutdown_deletes_the_chunks_of_held_jobs(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+    ingestion = KnowledgeIngestion(heartbeat_interval=0)
+
+    async def scenario():
+        job_id = await _create_job(chatbot_id, status="running", chunks=2)
+        ingestion._held.add(job_id)
+        await ingestion.stop()
+        return await _job(job_id)
+
+    assert run_db(scenario()) == ("failed", 0)
@@ -0,0 +1,236 @@
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.db.models import Chatbot
+from app.services.chatbot_runtime import ChatbotRuntime
+from app.services.llm import (
+    FakeLLMProvider,
+    LLMError,
+    LLMProvider,
+    LLMService,
+    LLMTimeout,
+    OpenAICompatibleProvider,
+    build_messages,
+    build_system_prompt,
+)
+
+
+def _runtime(**config):
+    return ChatbotRuntime(Chatbot(
+        id="bot", name="shopbot", owner_id=1, llm_endpoint_url=None, chatbot_config=config,
+        created_at=datetime(2024, 1, 1),
+    ))
+
+
+class SlowProvider(LLMProvider):
+    name = "slow"
+
+    async def complete(self, client, system, messages, model, max_tokens, endpoint=None) -> str:
+        await asyncio.sleep(1)
+        return "too late"
+
+
+def _openai_service(handler):
+    service = LLMService({"fake": FakeLLMProvider(), "openai": OpenAICompatibleProvider("gpt", "http://llm")})
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+def test_provider_is_abstract():
+    with pytest.raises(TypeError):
+        LLMProvider("model")
+
+
+def test_fake_provider_echoes_the_last_user_turn():
+    service = LLMService({"fake": FakeLLMProvider()}, default_provider="missing")
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"},
+                {"role": "user", "content": "hours?"}]
+    reply = asyncio.run(service.complete(_runtime(), "system", messages))
+
+    assert service.default_provider == "fake"
+    assert reply.text == "You said: hours?"
+    assert (reply.provider, reply.model) == ("fake", "fake")
+    assert service.stats()["providers"]["fake"]["calls"] == 1
+
+
+def test_deadline_raises_llm_timeout():
+    service = LLMService({"fake": FakeLLMProvider(), "slow": SlowProvider("m")}, timeout=10)
+    chatbot = _runtime(llm_provider="slow")
+
+    with pytest.raises(LLMTimeout):
+        asyncio.run(service.complete(chatbot, "system", [], timeout=0.01))
+    assert service.stats()["providers"]["slow"]["timeouts"] == 1
+    # LLMTimeout is an LLMError, so callers can catch both at once
+    assert issubclass(LLMTimeout, LLMError)
+
+
+def test_http_and_payload_errors_map_to_llm_error():
+    async def call(handler):
+        service = _openai_service(handler)
+        try:
+            return await service.complete(_runtime(llm_provider="openai"), "system", [])
+        finally:
+            await service.aclose()
+
+    with pytest.raises(LLMError, match="openai call failed"):
+        asyncio.run(call(lambda request: httpx.Response(503)))
+    with pytest.raises(LLMError):
+        asyncio.run(call(lambda request: httpx.Response(200, json={"choices": []})))
+    with pytest.raises(LLMError):
+        asyncio.run(call(lambda request: httpx.Response(200, content=b"not json")))
+
+
+def test_openai_provider_sends_system_prompt_and_model():
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        seen["body"] = json.loads(request.read())
+        return httpx.Response(200, json={"choices": [{"message": {"content": "  Open 9 to 5. "}}]})
+
+    async def call():
+        service = _openai_service(handler)
+        try:
+            chatbot = _runtime(llm_provider="OpenAI", llm_model="gpt-small")
+            return await service.complete(chatbot, "Be brief", [{"role": "user", "content": "hours?"}])
+        finally:
+            await service.aclose()
+
+    reply = asyncio.run(call())
+    assert reply.text == "Open 9 to 5."
+    assert reply.model == "gpt-small"
+    assert seen["url"] == "http://llm/chat/completions"
+    assert seen["body"]["model"] == "gpt-small"
+    assert seen["body"]["messages"] == [
+        {"role": "system", "content": "Be brief"},
+        {"role": "user", "content": "hours?"},
+    ]
+
+
+def test_build_messages_does_not_repeat_the_logged_message():
+    context = {"conversation_messages": [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "system", "content": "ignored"},
+        {"role": "user", "content": "hours?"},
+    ]}
+
+    assert build_messages("hours?", context) == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "hours?"},
+    ]
+    assert build_messages("returns?", context)[-2:] == [
+        {"role": "user", "content": "hours?"},
+        {"role": "user", "content": "returns?"},
+    ]
+    assert build_messages("hi", None) == [{"role": "user", "content": "hi"}]
+
+
+def test_system_prompt_includes_persona_faqs_and_user():
+    chatbot = _runtime(bot_display_name="Shoppy", tone="Formal", description="Helps with orders.",
+                       faqs=[{"q": "Hours?", "a": "9 to 5."}])
+    prompt = build_system_prompt(chatbot, {
+        "user_profile": {"first_name": "Sam", "last_name": None},
+        "conversation_summary": "asked about returns",
+    })
+
+    assert prompt.splitlines()[0] == "You are Shoppy, a formal assistant."
+    assert "Helps with orders." in prompt
+    assert "Q: Hours?\nA: 9 to 5." in prompt
+    assert "You are talking to Sam." in prompt
+    assert "Earlier in this conversation: asked about returns" in prompt
+
+
+def test_malformed_replies_map_to_llm_error():
+    async def call(body):
+        service = _openai_service(lambda request: httpx.Response(200, json=body))
+        try:
+            return await service.complete(_runtime(llm_provider="openai"), "system", [])
+        finally:
+            await service.aclose()
+
+    for body in ({"choices": [{"message": None}]}, {"choices": "none"}, [],
+                 {"choices": [{"message": {"content": ["not", "text"]}}]}):
+        with pytest.raises(LLMError, match="openai call failed"):
+            asyncio.run(call(body))
+
+
+def _endpoint_runtime(url):
+    return ChatbotRuntime(Chatbot(
+        id="bot", name="shopbot", owner_id=1, llm_endpoint_url=url, chatbot_config={"llm_provider": "openai"},
+        created_at=datetime(2024, 1, 1),
+    ))
+
+
+def test_shared_key_only_goes_to_the_base_url():
+    seen = []
+
+    def handler(request):
+        seen.append((str(request.url), request.headers.get("authorization")))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    provider = OpenAICompatibleProvider(
+        "gpt", "http://llm/v1", api_key="shared", endpoints={"http://tenant/v1/": "tenant-key", "http://local": ""}
+    )
+
+    async def call(url):
+        service = LLMService({"fake": FakeLLMProvider(), "openai": provider})
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await service.complete(_endpoint_runtime(url), "system", [])
+        finally:
+            await service.aclose()
+
+    for url in (None, "http://llm/v1/", "http://tenant/v1", "http://local"):
+        asyncio.run(call(url))
+    with pytest.raises(LLMError, match="not in OPENAI_ENDPOINTS"):
+        asyncio.run(call("http://169.254.169.254/latest"))
+
+    assert seen == [
+        ("http://llm/v1/chat/completions", "Bearer shared"),
+        ("http://llm/v1/chat/completions", "Bearer shared"),
+        ("http://tenant/v1/chat/completions", "Bearer tenant-key"),
+        ("http://local/chat/completions", None),
+    ]
+
+
+def test_respond_without_a_token_falls_back_to_greeting_and_echo(run_db, test_chatbot, monkeypatch):
+    from app.main import app
+    from app.services.llm import LLMReply, llm_service
+
+    async def complete(chatbot, system, messages, timeout=None):
+        return LLMReply("from the llm", "fake", "fake", 0.0)
+
+    monkeypatch.setattr(llm_service, "complete", complete)
+    chatbot_id = test_chatbot["chatbot_id"]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def respond(message, token=None):
+                headers = {"X-Widget-Token": token} if token else {}
+                response = await client.post(
+                    "/chatbot/respond", headers=headers, json={"chatbot_id": chatbot_id, "message": message}
+                )
+                return response.status_code, response.json().get("reply")
+
+            session = await client.post(f"/chatbot/{chatbot_id}/session", json={"visitor_id": "v1"})
+            token = session.json()["token"]
+            return [
+                await respond("hello there"),
+                await respond("Where is my order?"),
+                # Not cached for token holders
+                await respond("Where is my order?", token),
+                await respond("Where is my order?", "not-a-token"),
+            ]
+
+    greeting, echo, answered, rejected = run_db(scenario())
+    assert greeting == (200, "Hello! I'm Test bot. How can I help you today?")
+    assert echo == (200, "You said: Where is my order?")
+    assert answered == (200, "from the llm")
+    assert rejected[0] == 401
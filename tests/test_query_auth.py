@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import Chatbot
+from app.services.auth_service import AuthService
+from app.services.chatbot_runtime import ChatbotRuntimeCache, chatbot_runtime_cache
+
+
+def _chatbot(chatbot_id="bot-1", updated_at=datetime(2026, 1, 1)):
+    return Chatbot(
+        id=chatbot_id, name="Bot", owner_id="owner", chatbot_config={"tone": "Formal"},
+        created_at=updated_at, updated_at=updated_at,
+    )
+
+
+def test_runtime_cache_put_and_peek():
+    cache = ChatbotRuntimeCache(maxsize=1, revalidate_after=30)
+    runtime = cache.put(_chatbot())
+
+    assert cache.peek("bot-1") is runtime
+    assert runtime.tone == "formal"
+    # Same version: the runtime object is reused
+    assert cache.put(_chatbot()) is runtime
+    assert cache.put(_chatbot(updated_at=datetime(2026, 2, 1))) is not runtime
+    # Bounded LRU
+    cache.put(_chatbot("bot-2"))
+    assert cache.peek("bot-1") is None
+    assert cache.evictions == 1
+
+
+def test_stale_entry_is_only_served_with_stale_ok(run_db, test_chatbot):
+    cache = ChatbotRuntimeCache(revalidate_after=30)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            runtime = await cache.get(test_chatbot["chatbot_id"], db)
+        cache._entries[test_chatbot["chatbot_id"]][1] -= 60
+
+        assert cache.peek(test_chatbot["chatbot_id"]) is None
+        assert cache.peek(test_chatbot["chatbot_id"], stale_ok=True) is runtime
+        # Revalidated in the background, fresh again afterwards
+        await asyncio.gather(*cache._refreshing.values())
+        assert cache.peek(test_chatbot["chatbot_id"]) is runtime
+        assert cache.stale_hits == 1 and cache.revalidations == 1
+
+    run_db(scenario())
+
+
+def test_key_and_chatbot_are_served_from_memory_after_first_lookup(run_db, test_chatbot):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            api_key, raw_key = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+            found_key, chatbot = await AuthService.validate_api_key_with_chatbot(raw_key, db)
+        assert found_key.id == api_key.id
+        assert chatbot.chatbot_id == test_chatbot["chatbot_id"]
+
+        # No session: any query would fail
+        again_key, again_chatbot = await AuthService.validate_api_key_with_chatbot(raw_key, None)
+        assert again_key.id == api_key.id and again_chatbot is chatbot
+
+        async with AsyncSessionLocal() as db:
+            await AuthService.revoke_api_key(api_key.id, db)
+            assert await AuthService.validate_api_key_with_chatbot(raw_key, db) is None
+        chatbot_runtime_cache.invalidate(test_chatbot["chatbot_id"])
+
+    run_db(scenario())
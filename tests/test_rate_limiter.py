@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.services import rate_limiter as rate_limiter_module
+from app.services.rate_limiter import (
+    InMemoryRateLimitBackend,
+    PostgresRateLimitBackend,
+    RateLimit,
+    RateLimiter,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_memory_bucket_allows_burst_then_denies(clock):
+    backend = InMemoryRateLimitBackend()
+    limit = RateLimit(rate=1.0, burst=3)
+
+    results = [asyncio.run(backend.hit("k", limit)) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert asyncio.run(backend.hit("k", limit)).allowed
+    assert not asyncio.run(backend.hit("k", limit)).allowed
+    # Other keys have their own bucket
+    assert asyncio.run(backend.hit("other", limit)).allowed
+
+
+def test_memory_backend_is_bounded(clock):
+    backend = InMemoryRateLimitBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        asyncio.run(backend.hit(key, RateLimit(rate=1.0, burst=1)))
+    assert list(backend._buckets) == ["b", "c"]
+
+
+class _BrokenBackend:
+    name = "broken"
+
+    async def hit(self, key, limit):
+        raise ConnectionError("down")
+
+
+def test_limiter_counts_and_fails_open(clock):
+    limiter = RateLimiter(InMemoryRateLimitBackend(), {"chatbot": RateLimit(rate=1.0, burst=1)})
+    assert asyncio.run(limiter.hit("chatbot", "c1")).allowed
+    assert not asyncio.run(limiter.hit("chatbot", "c1")).allowed
+    # Scopes without a limit are not limited
+    assert asyncio.run(limiter.hit("unknown", "c1")).allowed
+    assert limiter.stats()["allowed"]["chatbot"] == 1
+    assert limiter.stats()["limited"]["chatbot"] == 1
+
+    broken = RateLimiter(_BrokenBackend(), {"chatbot": RateLimit(rate=1.0, burst=1)})
+    assert asyncio.run(broken.hit("chatbot", "c1")).allowed
+    assert broken.errors == 1
+
+
+def test_postgres_gcra_allows_burst_then_denies(run_db):
+    backend = PostgresRateLimitBackend()
+    key = f"test:{uuid.uuid4()}"
+    limit = RateLimit(rate=0.1, burst=2)
+
+    async def scenario():
+        results = [await backend.hit(key, limit) for _ in range(3)]
+        # A bucket with a high rate refills within milliseconds
+        await backend.hit(f"{key}:fast", RateLimit(rate=1000.0, burst=1))
+        await asyncio.sleep(0.05)
+        purged = await backend.purge_expired(1000)
+        return results, purged
+
+    results, purged = run_db(scenario())
+    assert [r.allowed for r in results] == [True, True, False]
+    assert 0 < results[-1].retry_after <= 10.0
+    assert purged >= 1
+
+    # The slow bucket has not expired and still denies
+    assert not run_db(backend.hit(key, limit)).allowed
@@ -0,0 +1,58 @@
+import time
+
+from app.services.response_cache import ResponseCache, normalize_message
+
+
+def test_messages_are_normalized_before_keying():
+    assert normalize_message("  What are your HOURS?! ") == "what are your hours"
+    assert normalize_message("snake_case-word") == "snake case word"
+    cache = ResponseCache(max_message_chars=20)
+    assert cache.key("What are your HOURS?") == cache.key("what are your hours")
+    assert cache.key("?!...") is None
+    assert cache.key("x" * 21) is None
+
+
+def test_replies_are_cached_per_chatbot():
+    cache = ResponseCache()
+    cache.set("a", 1, "hours", {"reply": "9 to 5"})
+
+    assert cache.get("a", 1, "hours") == {"reply": "9 to 5"}
+    assert cache.get("b", 1, "hours") is None
+    assert cache.chatbot_stats("a")["hits"] == 1
+
+
+def test_a_new_config_version_drops_cached_replies():
+    cache = ResponseCache()
+    cache.set("a", 1, "hours", "old answer")
+    cache.get("a", 1, "hours")
+
+    assert cache.get("a", 2, "hours") is None
+    assert cache.invalidations == 1
+    # Counters survive the invalidation
+    assert cache.chatbot_stats("a")["hits"] == 1
+    cache.set("a", 2, "hours", "new answer")
+    assert cache.get("a", 2, "hours") == "new answer"
+    assert cache.invalidations == 1
+
+
+def test_replies_expire_after_ttl():
+    cache = ResponseCache(ttl=0.05)
+    cache.set("a", 1, "hours", "9 to 5")
+    time.sleep(0.1)
+
+    assert cache.get("a", 1, "hours") is None
+
+
+def test_least_recently_used_chatbots_are_evicted():
+    cache = ResponseCache(max_chatbots=2)
+    cache.set("a", 1, "k", "a")
+    cache.set("b", 1, "k", "b")
+    cache.get("a", 1, "k")
+    cache.set("c", 1, "k", "c")
+
+    assert cache.chatbot_stats("b") is None
+    assert cache.get("a", 1, "k") == "a"
+    assert cache.evictions == 1
+    stats = cache.stats(top=1)
+    assert stats["chatbots"] == 2
+    assert list(stats["by_chatbot"]) == ["a"]
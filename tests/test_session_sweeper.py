@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import ConversationMessage, UserSession, UserSessionArchive
+from app.services.auth_service import AuthService
+from app.services.session_sweeper import SessionSweeper
+
+# Only sessions idle since before this are touched by the test sweeps
+_ANCIENT = datetime(2000, 1, 1)
+
+
+def _older_than_ancient() -> float:
+    return (datetime.utcnow() - datetime(2001, 1, 1)).total_seconds()
+
+
+def test_idle_sessions_are_deactivated_then_archived(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    sweeper = SessionSweeper(
+        idle_timeout=_older_than_ancient(), archive_after=_older_than_ancient(), batch_size=1, max_batches=5
+    )
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.append_conversation_message(user_id, "hello", db)
+            await AuthService.append_conversation_message(user_id, "hi there", db, role="assistant")
+            await db.execute(
+                update(UserSession).where(UserSession.user_id == user_id).values(last_activity=_ANCIENT)
+            )
+            await db.commit()
+            session_id = (await db.execute(
+                select(UserSession.id).where(UserSession.user_id == user_id)
+            )).scalar_one()
+
+        first = await sweeper.sweep()
+        second = await sweeper.sweep()
+
+        async with AsyncSessionLocal() as db:
+            remaining = (await db.execute(
+                select(UserSession.id).where(UserSession.user_id == user_id)
+            )).all()
+            messages = (await db.execute(
+                select(ConversationMessage.id).where(ConversationMessage.session_id == session_id)
+            )).all()
+            archived = await db.get(UserSessionArchive, session_id)
+        return first, second, remaining, messages, archived
+
+    first, second, remaining, messages, archived = run_db(scenario())
+    # The first pass deactivates and, the session being idle long enough, archives it too
+    assert first["deactivated"] >= 1
+    assert first["archived"] >= 1
+    assert second["deactivated"] == 0
+    assert remaining == [] and messages == []
+    assert archived.user_id == user_id
+    assert [(m["role"], m["content"]) for m in archived.messages] == [("user", "hello"), ("assistant", "hi there")]
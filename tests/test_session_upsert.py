@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, text, update
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.db.models import ConversationMessage, UserSession
+from app.services.auth_service import AuthService
+
+
+async def _sessions(user_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(UserSession.id, UserSession.is_active, UserSession.last_activity)
+            .where(UserSession.user_id == user_id)
+        )
+        return result.all()
+
+
+def test_append_opens_the_active_session_in_the_same_statement(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def scenario():
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            async with AsyncSessionLocal() as db:
+                assert await AuthService.append_conversation_message(user_id, "hello", db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        return await _sessions(user_id)
+
+    sessions = run_db(scenario())
+    assert len(sessions) == 1 and sessions[0].is_active
+    writes = [s for s in statements if s.lstrip().upper().startswith(("INSERT", "WITH", "UPDATE"))]
+    assert len(writes) == 1
+    assert "ON CONFLICT" in writes[0]
+
+
+def test_concurrent_first_turns_share_one_session(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def append(content):
+        async with AsyncSessionLocal() as db:
+            return await AuthService.append_conversation_message(user_id, content, db)
+
+    async def scenario():
+        results = await asyncio.gather(*(append(f"turn {i}") for i in range(8)))
+        async with AsyncSessionLocal() as db:
+            count = (await db.execute(
+                select(ConversationMessage.id)
+                .join(UserSession, UserSession.id == ConversationMessage.session_id)
+                .where(UserSession.user_id == user_id)
+            )).all()
+        return results, await _sessions(user_id), len(count)
+
+    results, sessions, messages = run_db(scenario())
+    assert all(results)
+    assert len(sessions) == 1
+    assert messages == 8
+
+
+def test_last_activity_only_moves_forward(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    future = datetime.utcnow() + timedelta(days=1)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.append_conversation_message(user_id, "first", db)
+            before = (await _sessions(user_id))[0].last_activity
+            await AuthService.append_conversation_message(user_id, "second", db)
+            bumped = (await _sessions(user_id))[0].last_activity
+
+            await db.execute(update(UserSession).where(UserSession.user_id == user_id).values(last_activity=future))
+            await db.commit()
+            await AuthService.append_conversation_message(user_id, "third", db)
+        return before, bumped, (await _sessions(user_id))[0].last_activity
+
+    before, bumped, after = run_db(scenario())
+    assert bumped >= before
+    assert after == future
+
+
+def test_a_closed_session_is_replaced_by_a_new_one(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.append_conversation_message(user_id, "old", db)
+            async with engine.begin() as conn:
+                await conn.execute(text("UPDATE user_sessions SET is_active = false WHERE user_id = :id"),
+                                   {"id": user_id})
+            await AuthService.append_conversation_message(user_id, "new", db)
+        return await _sessions(user_id)
+
+    sessions = run_db(scenario())
+    assert sorted(s.is_active for s in sessions) == [False, True]
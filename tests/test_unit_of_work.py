@@ -0,0 +1,156 @@
+import pytest
+from sqlalchemy import select
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import ConversationMessage, User, UserSession
+from app.db.unit_of_work import UnitOfWork
+from app.services.auth_service import AuthService
+
+
+async def _messages(user_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ConversationMessage.role, ConversationMessage.content)
+            .join(UserSession, UserSession.id == ConversationMessage.session_id)
+            .where(UserSession.user_id == user_id, UserSession.is_active)
+            .order_by(ConversationMessage.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+def test_commit_applies_staged_writes_then_runs_callbacks(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    calls = []
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            uow = UnitOfWork(db)
+            assert await AuthService.save_user_details(user_id, {"company": "Acme"}, db, uow=uow)
+            assert await AuthService.update_conversation_context(user_id, "a\n\nb", db, uow=uow)
+            assert await AuthService.append_conversation_message(user_id, "c", db, uow=uow)
+            uow.after_commit(calls.append, "committed")
+            assert await _messages(user_id) == []
+            assert calls == []
+
+            await uow.commit()
+            assert calls == ["committed"]
+
+        async with AsyncSessionLocal() as db:
+            company = (await db.execute(select(User.company).where(User.id == user_id))).scalar_one()
+        return company, await _messages(user_id)
+
+    company, messages = run_db(scenario())
+    assert company == "Acme"
+    assert messages == [("user", "a"), ("user", "b"), ("user", "c")]
+
+
+def test_reset_drops_the_previous_conversation(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AuthService.append_conversation_message(user_id, "old", db)
+            await AuthService.update_conversation_context(user_id, "new one\nnew two", db, reset=True)
+        return await _messages(user_id)
+
+    assert run_db(scenario()) == [("user", "new one"), ("user", "new two")]
+
+
+def test_rollback_discards_writes_and_callbacks(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    calls = []
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            uow = UnitOfWork(db)
+            await AuthService.append_conversation_message(user_id, "lost", db, uow=uow)
+            uow.after_commit(calls.append, "committed")
+            await uow.rollback()
+            await uow.commit()
+        return await _messages(user_id)
+
+    assert run_db(scenario()) == []
+    assert calls == []
+
+
+def test_release_refuses_staged_writes(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            uow = UnitOfWork(db)
+            await AuthService.get_user_context_for_llm(user_id, db)
+            await uow.release()
+            assert not db.in_transaction()
+
+            await AuthService.append_conversation_message(user_id, "staged", db, uow=uow)
+            with pytest.raises(RuntimeError):
+                await uow.release()
+            await uow.commit()
+        return await _messages(user_id)
+
+    assert run_db(scenario()) == [("user", "staged")]
+
+
+def test_release_does_not_commit(run_db, test_chatbot):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            uow = UnitOfWork(db)
+            await AuthService.get_user_context_for_llm(test_chatbot["user_id"], db)
+            before = UnitOfWork.commits
+            await uow.release()
+            return UnitOfWork.commits - before
+
+    assert run_db(scenario()) == 0
+
+
+def test_query_commits_once_after_the_llm_call(run_db, test_chatbot, monkeypatch):
+    import httpx
+
+    from app.main import app
+    from app.services.llm import llm_service
+
+    user_id = test_chatbot["user_id"]
+    seen = {}
+    complete = llm_service.complete
+
+    async def complete_without_a_transaction(chatbot, system, messages, timeout=None):
+        seen["in_transaction"] = any(s.in_transaction() for s in sessions)
+        seen["messages"] = [m["content"] for m in messages]
+        seen["stored"] = await _messages(user_id)
+        return await complete(chatbot, system, messages, timeout)
+
+    sessions = []
+    original_init = AsyncSessionLocal.class_.__init__
+
+    def track(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        sessions.append(self)
+
+    monkeypatch.setattr(llm_service, "complete", complete_without_a_transaction)
+    monkeypatch.setattr(AsyncSessionLocal.class_, "__init__", track)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            _, raw_key = await AuthService.create_api_key(test_chatbot["chatbot_id"], db)
+        sessions.clear()
+        before = UnitOfWork.commits
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                f"/chatbot/{test_chatbot['chatbot_id']}/query",
+                headers={"X-API-Key": raw_key},
+                json={"message": "hours?", "context": "hi", "user_details": {"first_name": "Ada"}},
+            )
+        return response, UnitOfWork.commits - before, await _messages(user_id)
+
+    response, commits, messages = run_db(scenario())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["reply"] == "You said: hours?"
+    assert body["user_context"]["user_profile"]["first_name"] == "Ada"
+    assert [m["content"] for m in body["user_context"]["conversation_messages"]] == ["hi", "hours?"]
+    # Nothing written or held while the LLM ran; everything committed once after it
+    assert seen == {"in_transaction": False, "messages": ["hi", "hours?"], "stored": []}
+    assert commits == 1
+    assert messages == [("user", "hi"), ("user", "hours?"), ("assistant", "You said: hours?")]
@@ -0,0 +1,144 @@
+from sqlalchemy import event, select, update
+
+from app.db.db_config import AsyncSessionLocal, engine
+from app.db.models import User
+from app.services.auth_service import AuthService
+from app.services.details_fingerprint import UserDetailsFingerprints, user_details_fingerprints
+
+
+def test_changed_fields_compares_each_field():
+    fingerprints = UserDetailsFingerprints()
+    key = fingerprints.key("u1")
+    fingerprints.remember(key, {"first_name": "Ada", "preferences": {"tone": "short"}}, "f1")
+    known = fingerprints.known(key)
+    assert known["fingerprint"] == "f1"
+    assert fingerprints.changed_fields(known, {"first_name": "Ada", "preferences": {"tone": "short"}}) == {}
+    assert fingerprints.changed_fields(known, {"first_name": "Ada", "company": "Acme"}) == {"company": "Acme"}
+
+
+def test_users_and_visitors_are_kept_apart():
+    assert UserDetailsFingerprints.key("x") != UserDetailsFingerprints.key("x", visitor=True)
+
+
+def test_a_write_from_another_worker_drops_the_entry():
+    fingerprints = UserDetailsFingerprints()
+    key = fingerprints.key("u1")
+    fingerprints.remember(key, {"first_name": "Ada"}, "f1")
+    # This worker's own notification keeps it
+    fingerprints.written_elsewhere(f"{key}:f1")
+    assert fingerprints.known(key) is not None
+    fingerprints.written_elsewhere(f"{key}:f2")
+    assert fingerprints.known(key) is None
+
+
+def test_remember_is_dropped_when_the_row_changed_during_the_write():
+    fingerprints = UserDetailsFingerprints()
+    key = fingerprints.key("u1")
+    generation = fingerprints.generation()
+    fingerprints.remember(key, {"first_name": "Ada"}, "f0")
+    fingerprints.written_elsewhere(f"{key}:f2")
+    fingerprints.remember(key, {"first_name": "Ada"}, "f1", since=generation)
+    assert fingerprints.known(key) is None
+
+
+def _capture():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    return statements, record
+
+
+async def _user(user_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.first_name, User.company, User.details_fingerprint).where(User.id == user_id)
+        )
+        return result.one()
+
+
+def test_unchanged_payload_sends_no_statement(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    details = {"first_name": "Ada", "company": "Acme"}
+    statements, record = _capture()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.save_user_details(user_id, details, db)
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            async with AsyncSessionLocal() as db:
+                assert await AuthService.save_user_details(user_id, dict(details), db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        return await _user(user_id)
+
+    before = user_details_fingerprints.writes_skipped
+    row = run_db(scenario())
+    assert statements == []
+    assert user_details_fingerprints.writes_skipped == before + 1
+    assert (row.first_name, row.company) == ("Ada", "Acme")
+
+
+def test_changed_payload_writes_only_the_differing_fields(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+    statements, record = _capture()
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.save_user_details(user_id, {"first_name": "Ada", "company": "Acme"}, db)
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            async with AsyncSessionLocal() as db:
+                assert await AuthService.save_user_details(user_id, {"first_name": "Ada", "company": "Initech"}, db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        return await _user(user_id)
+
+    row = run_db(scenario())
+    updates = [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1
+    assert "company=" in updates[0] and "first_name=" not in updates[0]
+    assert (row.first_name, row.company) == ("Ada", "Initech")
+    assert row.details_fingerprint == UserDetailsFingerprints.fingerprint({"first_name": "Ada", "company": "Initech"})
+
+
+def test_falls_back_to_the_full_write_when_another_worker_wrote(run_db, test_chatbot):
+    user_id = test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.save_user_details(user_id, {"first_name": "Ada", "company": "Acme"}, db)
+        # Another worker's write this one has not heard about
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(User).where(User.id == user_id).values(first_name="Bob", details_fingerprint="elsewhere")
+            )
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.save_user_details(user_id, {"first_name": "Ada", "company": "Initech"}, db)
+        return await _user(user_id)
+
+    row = run_db(scenario())
+    assert (row.first_name, row.company) == ("Ada", "Initech")
+
+
+def test_failed_write_forgets_the_fingerprint(run_db, test_chatbot, monkeypatch):
+    user_id = test_chatbot["user_id"]
+    key = UserDetailsFingerprints.key(user_id)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            assert await AuthService.save_user_details(user_id, {"first_name": "Ada"}, db)
+        assert user_details_fingerprints.known(key) is not None
+
+        async def fail(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        async with AsyncSessionLocal() as db:
+            monkeypatch.setattr(db, "execute", fail)
+            assert not await AuthService.save_user_details(user_id, {"first_name": "Bob"}, db)
+
+    run_db(scenario())
+    assert user_details_fingerprints.known(key) is None
@@ -0,0 +1,92 @@
+import numpy as np
+
+from app.services.embeddings import EmbeddingStore
+from app.services.vector_index import (
+    FlatEmbeddingIndex,
+    HashingEmbedder,
+    IVFEmbeddingIndex,
+    build_ivf_lists,
+    train_kmeans,
+)
+
+
+def _clustered(n=4000, dim=32, clusters=40, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def _ivf(vectors, nlist, nprobe):
+    centroids, order, offsets = build_ivf_lists(vectors, nlist, batch_rows=1000)
+    ids = np.arange(len(vectors), dtype=np.int64)
+    return IVFEmbeddingIndex(vectors[order], ids[order], "v1", centroids, offsets, nprobe=nprobe)
+
+
+def _recall(index, flat, queries, top_k=10, **kwargs):
+    found = 0
+    for query in queries:
+        exact = {row for row, _ in flat.search(query, top_k)}
+        found += len(exact & {row for row, _ in index.search(query, top_k, **kwargs)})
+    return found / (top_k * len(queries))
+
+
+def test_kmeans_centroids_are_unit_vectors():
+    centroids = train_kmeans(_clustered(), nlist=16)
+
+    assert centroids.shape == (16, 32) and centroids.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+def test_ivf_lists_partition_every_row_once():
+    vectors = _clustered()
+    centroids, order, offsets = build_ivf_lists(vectors, 16, batch_rows=1000)
+
+    assert sorted(order.tolist()) == list(range(len(vectors)))
+    assert offsets[0] == 0 and offsets[-1] == len(vectors)
+    assert (np.diff(offsets) >= 0).all()
+    # Every row sits in the list of its nearest centroid
+    for l in range(16):
+        rows = order[offsets[l]:offsets[l + 1]]
+        assert (np.argmax(vectors[rows] @ centroids.T, axis=1) == l).all()
+
+
+def test_ivf_recall_against_flat_search():
+    vectors = _clustered()
+    flat = FlatEmbeddingIndex(vectors, np.arange(len(vectors)), "v1")
+    ivf = _ivf(vectors, nlist=64, nprobe=8)
+    queries = vectors[np.random.default_rng(5).choice(len(vectors), 50, replace=False)]
+
+    assert _recall(ivf, flat, queries) >= 0.9
+    # Probing every list is exact
+    assert _recall(ivf, flat, queries, nprobe=64) == 1.0
+    assert _recall(ivf, flat, queries, nprobe=1) <= _recall(ivf, flat, queries, nprobe=16)
+
+
+def test_ivf_scores_match_exact_cosine():
+    vectors = _clustered(n=500)
+    ivf = _ivf(vectors, nlist=8, nprobe=2)
+    query = vectors[42]
+    results = ivf.search(query, top_k=5)
+
+    assert results[0][0] == 42
+    for row, score in results:
+        assert abs(score - float(vectors[row] @ query)) < 1e-5
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_store_publishes_ivf_builds_above_threshold(tmp_path):
+    embedder = HashingEmbedder(dim=32)
+    store = EmbeddingStore(root=str(tmp_path), embedder=embedder, revalidate_after=0, ivf_threshold=200, ivf_nprobe=4)
+    texts = [f"product {i} colour {i % 7} size {i % 5}" for i in range(300)]
+    build = store.begin("bot", "knowledge", "v1", len(texts))
+    build.add(range(1000, 1300), texts)
+    build.publish()
+
+    index = store.open("bot", "knowledge")
+    assert isinstance(index, IVFEmbeddingIndex)
+    assert sorted(index.ids.tolist()) == list(range(1000, 1300))
+    # Rows were regrouped by list: ids still follow their vectors
+    np.testing.assert_array_equal(index.vectors, embedder.embed([texts[i - 1000] for i in index.ids]))
+    assert index.search(embedder.embed([texts[17]])[0], top_k=1, nprobe=len(index.centroids))[0][0] == 1017
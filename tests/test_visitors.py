@@ -0,0 +1,95 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.db.db_config import AsyncSessionLocal
+from app.db.models import UserSession, Visitor
+from app.db.unit_of_work import UnitOfWork
+from app.services.auth_service import AuthService, visitor_cache
+
+
+async def _visitor_count(chatbot_id, external_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(func.count()).select_from(Visitor)
+            .where(Visitor.chatbot_id == chatbot_id, Visitor.external_id == external_id)
+        )
+        return result.scalar()
+
+
+def test_get_or_create_visitor_is_idempotent(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            first = await AuthService.get_or_create_visitor(chatbot_id, "widget-a", db)
+            again = await AuthService.get_or_create_visitor(chatbot_id, "widget-a", db)
+            other = await AuthService.get_or_create_visitor(chatbot_id, "widget-b", db)
+        visitor_cache.clear()
+        async with AsyncSessionLocal() as db:
+            reloaded = await AuthService.get_or_create_visitor(chatbot_id, "widget-a", db)
+            found = await AuthService.find_visitor(chatbot_id, "widget-a", db)
+            unknown = await AuthService.find_visitor(chatbot_id, "widget-c", db)
+        return first, again, other, reloaded, found, unknown, await _visitor_count(chatbot_id, "widget-a")
+
+    first, again, other, reloaded, found, unknown, count = run_db(scenario())
+    assert first == again == reloaded == found
+    assert other != first
+    assert unknown is None
+    assert count == 1
+
+
+def test_concurrent_first_requests_share_one_visitor(run_db, test_chatbot):
+    chatbot_id = test_chatbot["chatbot_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as first_db, AsyncSessionLocal() as second_db:
+            uow = UnitOfWork(first_db)
+            first = await AuthService.get_or_create_visitor(chatbot_id, "widget-race", first_db, uow)
+            # The second insert waits on the first one's uncommitted row
+            second = asyncio.create_task(AuthService.get_or_create_visitor(chatbot_id, "widget-race", second_db))
+            await asyncio.sleep(0.2)
+            waited = not second.done()
+            await uow.commit()
+            return first, await second, waited, await _visitor_count(chatbot_id, "widget-race")
+
+    first, second, waited, count = run_db(scenario())
+    assert waited
+    assert first == second
+    assert count == 1
+
+
+def test_each_visitor_gets_its_own_session_and_context(run_db, test_chatbot):
+    chatbot_id, owner_id = test_chatbot["chatbot_id"], test_chatbot["user_id"]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            ada = await AuthService.get_or_create_visitor(chatbot_id, "widget-ada", db)
+            bob = await AuthService.get_or_create_visitor(chatbot_id, "widget-bob", db)
+            assert await AuthService.save_user_details(ada, {"first_name": "Ada"}, db, visitor=True)
+            assert await AuthService.append_conversation_message(ada, "hi from ada", db, visitor=True)
+            assert await AuthService.append_conversation_message(bob, "hi from bob", db, visitor=True)
+            assert await AuthService.append_conversation_message(owner_id, "hi from the owner", db)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(UserSession.user_id, UserSession.visitor_id)
+                .where((UserSession.user_id == owner_id) | UserSession.visitor_id.in_([ada, bob]))
+            )
+            sessions = result.all()
+            contexts = (
+                await AuthService.get_user_context_for_llm(ada, db, visitor=True),
+                await AuthService.get_user_context_for_llm(bob, db, visitor=True),
+                await AuthService.get_user_context_for_llm(owner_id, db),
+            )
+        return ada, bob, sessions, contexts
+
+    ada, bob, sessions, (ada_context, bob_context, owner_context) = run_db(scenario())
+    assert sorted(sessions, key=str) == sorted([(owner_id, None), (None, ada), (None, bob)], key=str)
+    assert ada_context["visitor_id"] == "widget-ada"
+    assert ada_context["user_profile"]["first_name"] == "Ada"
+    assert ada_context["conversation_context"] == "hi from ada"
+    assert bob_context["user_profile"]["first_name"] is None
+    assert bob_context["conversation_context"] == "hi from bob"
+    assert owner_context["visitor_id"] is None
+    assert owner_context["conversation_context"] == "hi from the owner"
+    assert len({ada_context["session_id"], bob_context["session_id"], owner_context["session_id"]}) == 3
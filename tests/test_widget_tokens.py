@@ -0,0 +1,36 @@
+import json
+
+from app.services.widget_tokens import _b64decode, _b64encode, issue_widget_token, verify_widget_token
+
+
+def test_round_trip():
+    token, expires_at = issue_widget_token("bot-1", "visitor-1", ttl=60)
+    claims = verify_widget_token(token, "bot-1")
+    assert claims == {"cid": "bot-1", "vid": "visitor-1", "exp": expires_at}
+    assert verify_widget_token(token) == claims
+
+
+def test_wrong_chatbot_is_rejected():
+    token, _ = issue_widget_token("bot-1", "visitor-1", ttl=60)
+    assert verify_widget_token(token, "bot-2") is None
+
+
+def test_expired_token_is_rejected():
+    token, _ = issue_widget_token("bot-1", "visitor-1", ttl=-1)
+    assert verify_widget_token(token, "bot-1") is None
+
+
+def test_tampered_claims_are_rejected():
+    token, _ = issue_widget_token("bot-1", "visitor-1", ttl=60)
+    payload, signature = token.split(".")
+    claims = json.loads(_b64decode(payload))
+    claims["cid"] = "bot-2"
+    forged = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+
+    assert verify_widget_token(f"{forged}.{signature}", "bot-2") is None
+    assert verify_widget_token(f"{payload}.{signature[:-2]}xx", "bot-1") is None
+
+
+def test_malformed_tokens_are_rejected():
+    for token in ("", "no-dot", "a.b", "!!!.???", None):
+        assert verify_widget_token(token, "bot-1") is None